@@ -1,7 +1,7 @@
 # blog/admin.py
 
 from django.contrib import admin
-from .models import BlogPost, Tag, Like, Comment
+from .models import BlogPost, Tag, Like, Comment, ImageBlob
 
 
 @admin.register(Tag)
@@ -32,6 +32,15 @@ class BlogPostAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(ImageBlob)
+class ImageBlobAdmin(admin.ModelAdmin):
+    """画像ファイル管理画面の設定"""
+
+    list_display = ["name", "size", "ref_count", "created_at"]
+    search_fields = ["name"]
+    readonly_fields = ["name", "size", "ref_count", "created_at"]
+
+
 @admin.register(Like)
 class LikeAdmin(admin.ModelAdmin):
     """いいね管理画面の設定"""
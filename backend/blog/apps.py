@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class BlogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blog'
+
+    def ready(self):
+        # シグナルハンドラを登録
+        from . import signals  # noqa: F401
+
+        # HEIFは初めて開くときにpillow_heifを読み込む（起動を速くするため）
+        from .images import register_lazy_heif_opener
+
+        register_lazy_heif_opener()
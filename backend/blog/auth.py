@@ -0,0 +1,137 @@
+# blog/auth.py
+
+import secrets
+import time
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.contrib.auth.backends import ModelBackend
+from django.core import signing
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+
+USER_CACHE_KEY = "blog:user:{pk}"
+REVOKED_TOKEN_CACHE_KEY = "blog:token:revoked:{jti}"
+TOKEN_SALT = "blog.auth.token"
+
+
+def invalidate_cached_user(pk):
+    """ユーザーのキャッシュを破棄（保存・削除時にsignalsから呼ぶ）"""
+    cache.delete(USER_CACHE_KEY.format(pk=pk))
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    セッションからのユーザー読み込みを短時間キャッシュする認証バックエンド
+    認証済みのリクエストごとのUser取得クエリを省く
+    保存・削除時に破棄し、それ以外（update()など）の変更もUSER_CACHE_TIMEOUT秒で反映される
+    """
+
+    def get_user(self, user_id):
+        key = USER_CACHE_KEY.format(pk=user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
+
+
+# AUTHENTICATION_BACKENDSから外したバックエンド（導入前のセッションに記録されている）
+LEGACY_BACKENDS = {"django.contrib.auth.backends.ModelBackend"}
+CACHED_BACKEND = f"{CachedModelBackend.__module__}.{CachedModelBackend.__qualname__}"
+
+
+class LegacySessionBackendMiddleware:
+    """
+    LEGACY_BACKENDSでログインしたセッションをCachedModelBackendに付け替える
+    （AuthenticationMiddlewareの前に置く。付け替えないとそのセッションはログアウト扱いになる）
+    ModelBackendをAUTHENTICATION_BACKENDSに残すと、ログインの失敗時に
+    パスワードのハッシュ計算が2回行われるため、こちらで引き継ぐ
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # セッションCookieがなければセッションを読み込まない
+        if settings.SESSION_COOKIE_NAME in request.COOKIES:
+            if request.session.get(BACKEND_SESSION_KEY) in LEGACY_BACKENDS:
+                request.session[BACKEND_SESSION_KEY] = CACHED_BACKEND
+        return self.get_response(request)
+
+
+def issue_token(user):
+    """
+    署名付きの有効期限つきトークンを発行し、(トークン, 有効期限のUNIX時刻)を返す
+    パスワードを変えると無効になるよう、セッションと同じ認証ハッシュの一部を含める
+    """
+    expires_at = int(time.time()) + settings.AUTH_TOKEN_MAX_AGE
+    claims = {
+        "uid": user.pk,
+        "jti": secrets.token_urlsafe(12),
+        "exp": expires_at,
+        "sh": user.get_session_auth_hash()[:16],
+    }
+    return signing.dumps(claims, salt=TOKEN_SALT), expires_at
+
+
+def verify_token(token):
+    """
+    署名（定数時間で比較）・有効期限・失効リストを確認してクレームを返す
+    DBは参照しない（不正ならAuthenticationFailed）
+    """
+    try:
+        claims = signing.loads(token, salt=TOKEN_SALT)
+    except signing.BadSignature:
+        raise exceptions.AuthenticationFailed("トークンが不正です")
+    if not isinstance(claims, dict) or not {"uid", "jti", "exp", "sh"} <= claims.keys():
+        raise exceptions.AuthenticationFailed("トークンが不正です")
+    if claims["exp"] <= time.time():
+        raise exceptions.AuthenticationFailed("トークンの有効期限が切れています")
+    if cache.get(REVOKED_TOKEN_CACHE_KEY.format(jti=claims["jti"])):
+        raise exceptions.AuthenticationFailed("トークンは失効しています")
+    return claims
+
+
+def revoke_token(claims):
+    """トークンを失効させる（有効期限まで失効リストに残す）"""
+    remaining = int(claims["exp"] - time.time())
+    if remaining > 0:
+        cache.set(REVOKED_TOKEN_CACHE_KEY.format(jti=claims["jti"]), True, remaining)
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """
+    Authorization: Bearer <トークン> による認証（トークンはlogin_viewで発行）
+    セッションのDB参照もパスワードのハッシュ計算もせず、ユーザーはCachedModelBackendの
+    キャッシュから読む。Cookieを使わないのでCSRFの確認はしない
+    """
+
+    keyword = "Bearer"
+
+    def authenticate(self, request):
+        header = get_authorization_header(request).split()
+        if not header or header[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(header) != 2:
+            raise exceptions.AuthenticationFailed("Authorizationヘッダーが不正です")
+        try:
+            token = header[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed("トークンが不正です")
+
+        claims = verify_token(token)
+        user = CachedModelBackend().get_user(claims["uid"])
+        if user is None:
+            raise exceptions.AuthenticationFailed("ユーザーが無効です")
+        # パスワードが変わっていれば無効（セッションと同じ）
+        if not constant_time_compare(claims["sh"], user.get_session_auth_hash()[:16]):
+            raise exceptions.AuthenticationFailed("トークンは失効しています")
+        return user, claims
+
+    def authenticate_header(self, request):
+        return f'{self.keyword} realm="api"'
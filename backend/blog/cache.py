@@ -0,0 +1,41 @@
+# blog/cache.py
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+
+from . import metrics
+
+_missing = object()
+
+
+class InstrumentedCacheMixin:
+    """キャッシュのヒット・ミスをメトリクスに記録する（CACHESのMETRICS_NAMEでラベルを指定）"""
+
+    def __init__(self, server, params):
+        self.metrics_name = params.get("METRICS_NAME", "default")
+        super().__init__(server, params)
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version)
+        hit = value is not _missing
+        metrics.CACHE_REQUESTS.inc(cache=self.metrics_name, result="hit" if hit else "miss")
+        return value if hit else default
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version)
+        if len(found):
+            metrics.CACHE_REQUESTS.inc(len(found), cache=self.metrics_name, result="hit")
+        if len(keys) - len(found):
+            metrics.CACHE_REQUESTS.inc(
+                len(keys) - len(found), cache=self.metrics_name, result="miss"
+            )
+        return found
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    pass
+
+
+class InstrumentedRedisCache(InstrumentedCacheMixin, RedisCache):
+    """全ワーカーで共有するキャッシュ（redisパッケージが必要）"""
@@ -0,0 +1,166 @@
+# blog/compression.py
+
+"""
+レスポンス圧縮のコーデック（gzipは標準、zstd・brotliはパッケージがあれば使う）
+CompressionMiddlewareとcompression_benchmarkコマンドから使う
+"""
+
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 圧縮するContent-Type（画像・動画・圧縮済みのファイルは対象外）
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+}
+
+
+def is_compressible(content_type):
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return (
+        media_type.startswith("text/")
+        or media_type in COMPRESSIBLE_TYPES
+        or media_type.endswith(("+json", "+xml"))
+    )
+
+
+class GzipCodec:
+    name = "gzip"
+    default_level = 6
+
+    def __init__(self, level=None):
+        self.level = self.default_level if level is None else level
+
+    def compress(self, data):
+        return zlib.compress(data, self.level, wbits=31)  # wbits=31でgzip形式
+
+    def compressor(self):
+        return _GzipStream(self.level)
+
+    def stream(self, chunks):
+        """チャンクごとにフラッシュして、届いた分をすぐ送れるようにする"""
+        compressor = self.compressor()
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+
+
+class _GzipStream:
+    def __init__(self, level):
+        self.compressobj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, chunk):
+        return self.compressobj.compress(chunk) + self.compressobj.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self):
+        return self.compressobj.flush()
+
+
+class ZstdCodec(GzipCodec):
+    name = "zstd"
+    default_level = 3
+
+    def compress(self, data):
+        return zstandard.ZstdCompressor(level=self.level).compress(data)
+
+    def compressor(self):
+        return _ZstdStream(self.level)
+
+
+class _ZstdStream:
+    def __init__(self, level):
+        self.compressobj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, chunk):
+        return self.compressobj.compress(chunk) + self.compressobj.flush(
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+    def finish(self):
+        return self.compressobj.flush()
+
+
+class BrotliCodec(GzipCodec):
+    name = "br"
+    default_level = 5
+
+    def compress(self, data):
+        return brotli.compress(data, quality=self.level)
+
+    def compressor(self):
+        return _BrotliStream(self.level)
+
+
+class _BrotliStream:
+    def __init__(self, level):
+        self.compressobj = brotli.Compressor(quality=level)
+
+    def compress(self, chunk):
+        return self.compressobj.process(chunk) + self.compressobj.flush()
+
+    def finish(self):
+        return self.compressobj.finish()
+
+
+CODECS = {"zstd": ZstdCodec, "br": BrotliCodec, "gzip": GzipCodec}
+
+
+def is_available(name):
+    if name == "zstd":
+        return zstandard is not None
+    if name == "br":
+        return brotli is not None
+    return name in CODECS
+
+
+def available_codecs(names, levels=None):
+    """namesの順（優先順）に、使えるコーデックを返す"""
+    levels = levels or {}
+    return [CODECS[name](levels.get(name)) for name in names if is_available(name)]
+
+
+def parse_accept_encoding(header):
+    """Accept-Encodingを{エンコーディング: q値}にする"""
+    encodings = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        encodings[name] = quality
+    return encodings
+
+
+def select_codec(codecs, header):
+    """クライアントが受け付けるコーデックのうち、q値が高く、同じならサーバーの優先順で選ぶ"""
+    encodings = parse_accept_encoding(header)
+    best = None
+    best_quality = 0.0
+    for codec in codecs:
+        quality = encodings.get(codec.name, encodings.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = codec, quality
+    return best
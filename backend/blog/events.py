@@ -0,0 +1,205 @@
+# blog/events.py
+
+import asyncio
+import functools
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection, connections
+
+logger = logging.getLogger(__name__)
+
+# LISTEN/NOTIFYで使用するチャンネル名
+CHANNEL = "blog_events"
+# 接続維持のためのコメント行を送る間隔（秒）
+HEARTBEAT_INTERVAL = 15
+# 購読者ごとのキューの上限（遅いクライアントはイベントを取りこぼす）
+QUEUE_SIZE = 32
+
+
+def format_event(event, data):
+    """SSEのフレーム形式にエンコード（購読者間で共有するため一度だけ作る）"""
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return f"event: {event}\ndata: {payload}\n\n".encode()
+
+
+def _offer(queue, message):
+    """イベントループのスレッド内でキューに追加"""
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        pass
+
+
+class LocalBroker:
+    """プロセス内のpub/sub：投稿ごとの購読キューへイベントを配信する"""
+
+    def __init__(self):
+        # post_id -> {queue: loop}
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, post_id):
+        """購読を開始してキューを返す（イベントループ内から呼ぶ）"""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(post_id, {})[queue] = loop
+        return queue
+
+    async def asubscribe(self, post_id):
+        """イベントループから購読を開始する（PostgresBrokerはLISTENの準備を待つ）"""
+        return self.subscribe(post_id)
+
+    def unsubscribe(self, post_id, queue):
+        """購読を終了"""
+        with self._lock:
+            subscribers = self._subscribers.get(post_id)
+            if subscribers is None:
+                return
+            subscribers.pop(queue, None)
+            if not subscribers:
+                del self._subscribers[post_id]
+
+    def subscriber_count(self, post_id=None):
+        """購読者数を取得"""
+        with self._lock:
+            if post_id is not None:
+                return len(self._subscribers.get(post_id, ()))
+            return sum(len(s) for s in self._subscribers.values())
+
+    def publish(self, post_id, event, data):
+        """イベントを発行（シグナルハンドラなど同期コードから呼ばれる）"""
+        self.dispatch(post_id, event, data)
+
+    def dispatch(self, post_id, event, data):
+        """このプロセスの購読者へ配信"""
+        with self._lock:
+            targets = list(self._subscribers.get(post_id, {}).items())
+        if not targets:
+            return
+        message = format_event(event, data)
+        for queue, loop in targets:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, message)
+            except RuntimeError:
+                # ループが既に閉じている
+                self.unsubscribe(post_id, queue)
+
+
+class PostgresBroker(LocalBroker):
+    """PostgreSQLのLISTEN/NOTIFYで複数ワーカー間にイベントを中継する"""
+
+    def __init__(self):
+        super().__init__()
+        # イベントループごとのLISTEN用接続
+        self._listeners = {}
+
+    def publish(self, post_id, event, data):
+        """NOTIFYを送信（自プロセスへの配信もLISTEN経由で行う）"""
+        payload = json.dumps({"post_id": post_id, "event": event, "data": data})
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, payload])
+
+    async def asubscribe(self, post_id):
+        queue = self.subscribe(post_id)
+        try:
+            await self._ensure_listener(asyncio.get_running_loop())
+        except BaseException:
+            self.unsubscribe(post_id, queue)
+            raise
+        return queue
+
+    async def _ensure_listener(self, loop):
+        """
+        ループごとに一度だけLISTEN用の専用接続を開く
+        接続とLISTENはブロッキングなので、イベントループを止めないようスレッドで行う
+        """
+        with self._lock:
+            if loop in self._listeners:
+                return
+            self._listeners[loop] = None
+
+        import psycopg2
+
+        try:
+            conn = await loop.run_in_executor(None, self._connect)
+        except psycopg2.Error:
+            logger.exception("LISTEN用の接続に失敗しました")
+            with self._lock:
+                self._listeners.pop(loop, None)
+            return
+
+        with self._lock:
+            self._listeners[loop] = conn
+        loop.add_reader(conn.fileno(), self._on_notify, loop, conn)
+
+    def _connect(self):
+        """LISTEN済みの接続を開く（ワーカースレッドで実行）"""
+        import psycopg2
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+        params = connections["default"].get_connection_params()
+        params.pop("cursor_factory", None)
+        conn = psycopg2.connect(**params)
+        try:
+            conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def _on_notify(self, loop, conn):
+        """通知を受け取り、ローカルの購読者へ配信"""
+        import psycopg2
+
+        try:
+            conn.poll()
+        except psycopg2.Error:
+            logger.exception("LISTEN用の接続が切断されました")
+            loop.remove_reader(conn.fileno())
+            with self._lock:
+                self._listeners.pop(loop, None)
+            conn.close()
+            return
+
+        while conn.notifies:
+            notify = conn.notifies.pop(0)
+            try:
+                message = json.loads(notify.payload)
+                self.dispatch(message["post_id"], message["event"], message["data"])
+            except (ValueError, KeyError):
+                logger.warning("不正な通知を無視しました: %s", notify.payload)
+
+
+BROKERS = {
+    "local": LocalBroker,
+    "postgres": PostgresBroker,
+}
+
+
+@functools.cache
+def get_broker():
+    """設定に応じたブローカーのシングルトンを取得"""
+    backend = getattr(settings, "BLOG_EVENTS_BACKEND", "local")
+    return BROKERS[backend]()
+
+
+async def stream(post_id):
+    """SSEレスポンス本体：購読キューから取り出して送り続ける"""
+    broker = get_broker()
+    queue = await broker.asubscribe(post_id)
+    try:
+        yield b"retry: 5000\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                message = b": keepalive\n\n"
+            yield message
+    finally:
+        broker.unsubscribe(post_id, queue)
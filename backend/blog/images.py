@@ -0,0 +1,96 @@
+# blog/images.py
+
+import os
+import time
+
+from PIL import Image, ImageOps
+
+# 出力フォーマットごとの拡張子
+EXTENSIONS = {"WEBP": "webp", "JPEG": "jpg", "PNG": "png"}
+
+# HEIF/HEICのftypボックスのブランド
+HEIF_BRANDS = {b"heic", b"heix", b"hevc", b"hevx", b"heim", b"heis", b"mif1", b"msf1"}
+HEIF_EXTENSIONS = [".heic", ".heics", ".heif", ".heifs", ".hif"]
+
+
+def register_codecs():
+    """HEIF/HEICを開けるようにする（libheifを読み込む）"""
+    import pillow_heif
+
+    pillow_heif.register_heif_opener()
+
+
+def _accept_heif(prefix):
+    return prefix[4:8] == b"ftyp" and prefix[8:12] in HEIF_BRANDS
+
+
+def _open_heif(fp, filename=None):
+    """初めてHEIFを開くときにpillow_heifを登録し、以降は本物のプラグインが使われる"""
+    register_codecs()
+    from pillow_heif.as_plugin import HeifImageFile
+
+    return HeifImageFile(fp, filename)
+
+
+def register_lazy_heif_opener():
+    """
+    HEIF用の軽量なプラグインだけを登録する
+    pillow_heif（libheif）の読み込みは実際にHEIF画像を開くまで遅らせる
+    """
+    Image.register_open("HEIF", _open_heif, _accept_heif)
+    Image.register_mime("HEIF", "image/heif")
+    Image.register_extensions("HEIF", HEIF_EXTENSIONS)
+
+
+def thumbnail_name(name, size, image_format):
+    """サムネイルの保存先（MEDIA_ROOTからの相対パス）"""
+    width, height = size
+    base = os.path.splitext(name)[0]
+    return f"thumbnails/{width}x{height}/{base}.{EXTENSIONS[image_format]}"
+
+
+def thumbnail_names(name, sizes, image_format):
+    """サイズ（"幅x高さ"）→サムネイルの保存先の辞書（APIのthumbnails）"""
+    return {
+        f"{width}x{height}": thumbnail_name(name, (width, height), image_format)
+        for width, height in sizes
+    }
+
+
+def render_thumbnails(media_root, name, sizes, image_format, quality):
+    """
+    元画像を一度だけデコードして各サイズのサムネイルを書き出す
+    Djangoに依存しないので、プロセスプールのワーカーからそのまま呼べる
+    戻り値: (出力ファイル数, 処理秒数)
+    """
+    started = time.perf_counter()
+    source = os.path.join(media_root, name)
+    sizes = sorted(sizes, reverse=True)
+
+    with Image.open(source) as img:
+        # JPEGは縮小デコードで大きい画像を速く読む
+        img.draft("RGB", sizes[0])
+        img = ImageOps.exif_transpose(img)
+        mode = "RGBA" if img.mode in ("RGBA", "LA", "P") and image_format != "JPEG" else "RGB"
+        img = img.convert(mode)
+
+        for size in sizes:
+            # 大きいサイズから順に縮小していくと毎回元画像から縮小するより速い
+            img.thumbnail(size, Image.Resampling.LANCZOS)
+            destination = os.path.join(media_root, thumbnail_name(name, size, image_format))
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            temp = destination + ".tmp"
+            img.save(temp, format=image_format, quality=quality)
+            os.replace(temp, destination)
+
+    return len(sizes), time.perf_counter() - started
+
+
+def render_thumbnails_job(args):
+    """プロセスプール用：1枚処理して(記事ID, ファイル名, 秒数, エラー)を返す"""
+    post_id, name, media_root, sizes, image_format, quality = args
+    try:
+        _, elapsed = render_thumbnails(media_root, name, sizes, image_format, quality)
+        return post_id, name, elapsed, None
+    except Exception as e:
+        return post_id, name, 0.0, f"{type(e).__name__}: {e}"
@@ -0,0 +1,161 @@
+# blog/management/commands/cleanup_media.py
+
+import os
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from blog.images import thumbnail_name
+from blog.models import BlogPost, ImageBlob
+
+
+class Command(BaseCommand):
+    help = 'どの記事からも参照されていないメディアファイルを削除（または隔離）します'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='削除せずに対象ファイルを表示する',
+        )
+        parser.add_argument(
+            '--quarantine', metavar='DIR',
+            help='削除せずに指定ディレクトリへ移動する',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=8,
+            help='走査・削除に使うスレッド数（デフォルト: 8）',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='1バッチで処理するファイル数（デフォルト: 500）',
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=3600,
+            help='更新からこの秒数が経っていないファイルは対象外（アップロード中の保護）',
+        )
+
+    def handle(self, *args, **options):
+        media_root = os.path.abspath(settings.MEDIA_ROOT)
+        quarantine = options['quarantine']
+        if quarantine:
+            quarantine = os.path.abspath(quarantine)
+        started = time.monotonic()
+
+        # 1. MEDIA_ROOTを並列に走査
+        files = self.scan(media_root, options['workers'], exclude=quarantine)
+        scanned = time.monotonic()
+        self.stdout.write(
+            f'走査: {len(files)}ファイル ({scanned - started:.2f}秒, '
+            f'{len(files) / max(scanned - started, 1e-6):.0f}ファイル/秒)'
+        )
+
+        # 2. 参照中のファイル名をまとめて取得（走査後に読むので新規アップロードも含まれる）
+        referenced = set(
+            BlogPost.objects.exclude(image='').exclude(image__isnull=True)
+            .values_list('image', flat=True).iterator(chunk_size=5000)
+        )
+        referenced.update(
+            ImageBlob.objects.filter(ref_count__gt=0)
+            .values_list('name', flat=True).iterator(chunk_size=5000)
+        )
+        # 参照中の画像から生成したサムネイルも残す
+        sizes = [tuple(size) for size in settings.BLOG_THUMBNAIL_SIZES]
+        referenced.update([
+            thumbnail_name(name, size, settings.BLOG_THUMBNAIL_FORMAT)
+            for name in referenced
+            for size in sizes
+        ])
+        self.stdout.write(f'参照中: {len(referenced)}ファイル')
+
+        # 3. 孤立ファイルを抽出
+        cutoff = time.time() - options['min_age']
+        orphans = [
+            (path, size) for path, size, mtime in files
+            if mtime < cutoff
+            and os.path.relpath(path, media_root).replace(os.sep, '/') not in referenced
+        ]
+        orphan_bytes = sum(size for _, size in orphans)
+        self.stdout.write(
+            f'孤立ファイル: {len(orphans)}件 ({orphan_bytes / 1024 / 1024:.1f}MB)'
+        )
+
+        if options['dry_run']:
+            for path, size in orphans:
+                self.stdout.write(f'  {os.path.relpath(path, media_root)} ({size}バイト)')
+            self.stdout.write(self.style.WARNING('ドライランのため削除していません'))
+            return
+
+        # 4. バッチごとに削除または隔離
+        removed = 0
+        failed = 0
+        batch_size = options['batch_size']
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for i in range(0, len(orphans), batch_size):
+                batch = orphans[i:i + batch_size]
+                futures = [
+                    executor.submit(self.remove, path, media_root, quarantine)
+                    for path, _ in batch
+                ]
+                for future in as_completed(futures):
+                    if future.result():
+                        removed += 1
+                    else:
+                        failed += 1
+                elapsed = time.monotonic() - scanned
+                self.stdout.write(
+                    f'  {removed + failed}/{len(orphans)} '
+                    f'({(removed + failed) / max(elapsed, 1e-6):.0f}ファイル/秒)'
+                )
+
+        action = '隔離' if quarantine else '削除'
+        self.stdout.write(self.style.SUCCESS(
+            f'{removed}ファイルを{action}しました（失敗: {failed}件, '
+            f'合計 {time.monotonic() - started:.2f}秒）'
+        ))
+
+    def scan(self, root, workers, exclude=None):
+        """os.scandirでディレクトリごとに並列走査し、(パス, サイズ, 更新時刻)を返す"""
+        files = []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = {executor.submit(self.scan_directory, root)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    entries, directories = future.result()
+                    files.extend(entries)
+                    pending.update(
+                        executor.submit(self.scan_directory, directory)
+                        for directory in directories
+                        if directory != exclude
+                    )
+        return files
+
+    def scan_directory(self, path):
+        entries = []
+        directories = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        directories.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        stat = entry.stat(follow_symlinks=False)
+                        entries.append((entry.path, stat.st_size, stat.st_mtime))
+        except OSError as e:
+            self.stderr.write(f'走査できません: {path} ({e})')
+        return entries, directories
+
+    def remove(self, path, media_root, quarantine):
+        try:
+            if quarantine:
+                destination = os.path.join(quarantine, os.path.relpath(path, media_root))
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                shutil.move(path, destination)
+            else:
+                os.remove(path)
+            return True
+        except OSError as e:
+            self.stderr.write(f'処理できません: {path} ({e})')
+            return False
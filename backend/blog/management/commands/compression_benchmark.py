@@ -0,0 +1,108 @@
+# blog/management/commands/compression_benchmark.py
+
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Q
+from rest_framework.renderers import JSONRenderer
+
+from blog import compression
+from blog.models import BlogPost, Comment
+from blog.serializers import (
+    BlogPostListSerializer,
+    CommentSerializer,
+    CompactBlogPostListSerializer,
+    Included,
+)
+
+# コーデックごとに比べる圧縮レベル
+LEVELS = {'gzip': [1, 6, 9], 'br': [1, 5, 11], 'zstd': [1, 3, 10]}
+
+
+class Command(BaseCommand):
+    help = '記事一覧・コメントのJSONで、圧縮方式ごとのCPU時間と削減バイト数を比べます'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--page-size', type=int, default=settings.REST_FRAMEWORK['PAGE_SIZE'],
+            help='記事一覧の件数（デフォルト: PAGE_SIZE）',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=200,
+            help='1つの組み合わせを圧縮する回数（デフォルト: 200）',
+        )
+
+    def handle(self, *args, **options):
+        payloads = self.build_payloads(options['page_size'])
+        if not payloads:
+            raise CommandError('記事がありません（create_sample_dataで作成してください）')
+
+        unavailable = [name for name in LEVELS if not compression.is_available(name)]
+        if unavailable:
+            self.stdout.write(self.style.WARNING(
+                f'未インストールのため省略: {", ".join(unavailable)}（zstandard / brotli）'
+            ))
+
+        self.stdout.write(
+            f'{"payload":18} {"encoding":8} {"level":>5} {"size":>9} {"compressed":>10} '
+            f'{"ratio":>6} {"us/resp":>9} {"MB/s":>7} {"saved/CPU-ms":>13}'
+        )
+        for label, body in payloads:
+            for name, levels in LEVELS.items():
+                if not compression.is_available(name):
+                    continue
+                for level in levels:
+                    codec = compression.CODECS[name](level)
+                    started = time.perf_counter()
+                    for _ in range(options['repeat']):
+                        compressed = codec.compress(body)
+                    elapsed = (time.perf_counter() - started) / options['repeat']
+                    saved = len(body) - len(compressed)
+                    self.stdout.write(
+                        f'{label:18} {name:8} {level:5} {len(body):9} {len(compressed):10} '
+                        f'{len(compressed) / len(body):6.1%} {elapsed * 1e6:9.1f} '
+                        f'{len(body) / elapsed / 1e6:7.1f} {saved / (elapsed * 1000):13.0f}'
+                    )
+
+    def build_payloads(self, page_size):
+        """APIと同じシリアライザーでレスポンスのJSONを作る"""
+        renderer = JSONRenderer()
+        anonymous = AnonymousUser()
+        posts = list(
+            BlogPost.objects.visible_to(anonymous).with_list_data(anonymous)[:page_size]
+        )
+        if not posts:
+            return []
+        payloads = [
+            ('post_list', renderer.render(
+                BlogPostListSerializer(posts, many=True, context={'request': None}).data
+            )),
+        ]
+
+        included = Included()
+        context = {'request': None, 'included': included}
+        results = CompactBlogPostListSerializer(posts, many=True, context=context).data
+        payloads.append(('post_list_compact', renderer.render(
+            {'results': results, 'included': included.to_representation(context)}
+        )))
+
+        # コメントが一番多い記事のスレッド
+        post = (
+            BlogPost.objects.annotate(
+                comments_total=Count('comments', filter=Q(comments__is_active=True))
+            )
+            .order_by('-comments_total')
+            .first()
+        )
+        comments = (
+            Comment.objects.filter(blog_post=post, parent__isnull=True, is_active=True)
+            .select_related('author')
+            .prefetch_related('replies__author')
+        )
+        if comments:
+            payloads.append(('comments', renderer.render(
+                CommentSerializer(comments, many=True).data
+            )))
+        return payloads
@@ -0,0 +1,443 @@
+# blog/management/commands/import_posts.py
+
+import csv
+import io
+import json
+import os
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils._os import safe_join
+from PIL import Image
+
+from blog.models import BlogPost, ImportJobCheckpoint, Tag
+from blog.tags import invalidate_tag_list
+from blog.uploadhandlers import HEADER_LIMIT, PILLOW_FORMATS, sniff_image_type
+
+# 判定した画像の種類ごとの拡張子（保存名に使う）
+IMAGE_EXTENSIONS = {
+    'jpeg': '.jpg', 'png': '.png', 'gif': '.gif', 'webp': '.webp', 'heif': '.heic',
+}
+TRUE_VALUES = {'1', 'true', 'yes', 'on', 't', 'y'}
+FALSE_VALUES = {'0', 'false', 'no', 'off', 'f', 'n', ''}
+
+
+class RecordError(Exception):
+    """1件の取り込みに失敗した（その記録だけ飛ばす）"""
+
+
+@dataclass
+class Entry:
+    position: int
+    raw: object
+    error: str = None
+    title: str = ''
+    description: str = ''
+    tags: list = field(default_factory=list)
+    author: str = None
+    is_published: bool = True
+    is_sold_out: bool = False
+    image: object = None  # 画像を取り込むFuture
+
+
+class LimitedContent:
+    """ContentAddressedStorage.write_temp用：読み済みの先頭と残りを上限サイズまで流す"""
+
+    def __init__(self, header, file, limit):
+        self.header = header
+        self.file = file
+        self.limit = limit
+
+    def chunks(self, chunk_size=64 * 1024):
+        size = len(self.header)
+        yield self.header
+        while chunk := self.file.read(chunk_size):
+            size += len(chunk)
+            if size > self.limit:
+                raise RecordError(f'画像サイズは{self.limit // (1024 * 1024)}MB以下にしてください')
+            yield chunk
+
+
+class Command(BaseCommand):
+    help = (
+        'JSON Lines・CSVから記事を一括で取り込みます'
+        '（画像はスレッドで並列に取得、バッチごとにコミットし中断しても再開可能）'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='取り込むファイル（.jsonl / .csv）')
+        parser.add_argument(
+            '--format', choices=['jsonl', 'csv'],
+            help='ファイル形式（デフォルト: 拡張子から判定）',
+        )
+        parser.add_argument(
+            '--author',
+            help='authorが空の記録に使うユーザー名',
+        )
+        parser.add_argument(
+            '--image-dir',
+            help='画像の相対パスの基準ディレクトリ（この外のファイルは読まない）',
+        )
+        parser.add_argument(
+            '--tag-separator', default=',',
+            help='CSVのtags列の区切り文字（デフォルト: ,）',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='1トランザクションで作成する記事数（デフォルト: 1000）',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=16,
+            help='画像を取得するスレッド数（デフォルト: 16）',
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=30,
+            help='画像URLの取得タイムアウト秒数（デフォルト: 30）',
+        )
+        parser.add_argument(
+            '--defer-rendering', action='store_true',
+            help='本文のHTML変換を省く（後でrender_descriptionsで並列に変換する）',
+        )
+        parser.add_argument(
+            '--error-file',
+            help='失敗した記録をJSON Linesで書き出すファイル（修正して再度取り込める）',
+        )
+        parser.add_argument(
+            '--job',
+            help='チェックポイントのジョブ名（デフォルト: import:ファイル名）',
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='チェックポイントを破棄して最初から取り込む',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.isfile(path):
+            raise CommandError(f'ファイルがありません: {path}')
+        file_format = options['format'] or os.path.splitext(path)[1].lower().lstrip('.')
+        if file_format == 'json':
+            file_format = 'jsonl'
+        if file_format not in ('jsonl', 'csv'):
+            raise CommandError('--formatでjsonlかcsvを指定してください')
+        if options['author'] and not User.objects.filter(username=options['author']).exists():
+            raise CommandError(f'ユーザーが見つかりません: {options["author"]}')
+
+        self.options = options
+        self.image_field = BlogPost._meta.get_field('image')
+        self.author_ids = {}
+        self.tag_ids = {}
+        self.error_file = (
+            open(options['error_file'], 'a', encoding='utf-8')
+            if options['error_file'] else None
+        )
+
+        job = options['job'] or f'import:{os.path.basename(path)}'[:100]
+        checkpoint, _ = ImportJobCheckpoint.objects.get_or_create(job=job)
+        if options['restart']:
+            checkpoint.last_position = 0
+            checkpoint.imported = 0
+            checkpoint.failed = 0
+            checkpoint.save()
+        elif checkpoint.last_position:
+            self.stdout.write(f'{checkpoint.last_position}件目の続きから再開します')
+        self.checkpoint = checkpoint
+
+        records = (
+            (position, raw)
+            for position, raw in self.read_records(path, file_format)
+            if position > checkpoint.last_position
+        )
+        self.created = self.failed = 0
+        started = time.monotonic()
+        try:
+            with ThreadPoolExecutor(max_workers=options['workers']) as self.executor:
+                self.run(records, started)
+        finally:
+            if self.error_file:
+                self.error_file.close()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{self.created}件の記事を作成しました（失敗: {self.failed}件, {elapsed:.1f}秒, '
+            f'{self.created / max(elapsed, 1e-6):.0f}件/秒）'
+        ))
+
+    def run(self, records, started):
+        """
+        次のバッチの画像を先に取りにいきながら、今のバッチをDBへ書き込む
+        （画像のダウンロードとDBへの挿入が重なるようにする）
+        """
+        current = self.prepare(records)
+        upcoming = []
+        try:
+            while current:
+                upcoming = self.prepare(records)
+                self.import_batch(current)
+                self.stdout.write(
+                    f'  {current[-1].position}件目まで: 作成 {self.created}件, '
+                    f'失敗 {self.failed}件 '
+                    f'({self.created / max(time.monotonic() - started, 1e-6):.0f}件/秒)'
+                )
+                current, upcoming = upcoming, []
+        except BaseException:
+            # 取得中の画像を止め、取得済みの一時ファイルを残さない
+            entries = (*current, *upcoming)
+            for entry in entries:
+                if isinstance(entry.image, Future):
+                    entry.image.cancel()
+            self.executor.shutdown(wait=True)
+            for entry in entries:
+                self.discard(entry)
+            raise
+
+    def read_records(self, path, file_format):
+        """(位置, 記録)を順に返す。位置はJSON Linesなら行番号、CSVならヘッダーを除いた行番号"""
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            if file_format == 'csv':
+                for position, row in enumerate(csv.DictReader(f), start=1):
+                    yield position, row
+                return
+            for position, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield position, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield position, RecordError(f'JSONとして読めません: {e}')
+
+    def prepare(self, records):
+        """次のバッチを読み込んで検証し、画像の取得をスレッドプールに投げる"""
+        batch = []
+        for position, raw in records:
+            entry = Entry(position=position, raw=raw)
+            try:
+                if isinstance(raw, RecordError):
+                    raise raw
+                self.parse(entry)
+            except RecordError as e:
+                entry.error = str(e)
+            batch.append(entry)
+            if len(batch) >= self.options['batch_size']:
+                break
+        return batch
+
+    def parse(self, entry):
+        raw = entry.raw
+        if not isinstance(raw, dict):
+            raise RecordError('記録はオブジェクトにしてください')
+
+        entry.title = str(raw.get('title') or '').strip()
+        if not entry.title:
+            raise RecordError('titleがありません')
+        max_length = BlogPost._meta.get_field('title').max_length
+        if len(entry.title) > max_length:
+            raise RecordError(f'titleは{max_length}文字以内にしてください')
+
+        entry.description = str(raw.get('description') or '')
+        if not entry.description.strip():
+            raise RecordError('descriptionがありません')
+
+        tags = raw.get('tags') or []
+        if isinstance(tags, str):
+            tags = tags.split(self.options['tag_separator'])
+        if not isinstance(tags, list):
+            raise RecordError('tagsはリストか区切り文字列にしてください')
+        entry.tags = list(dict.fromkeys(str(tag).strip() for tag in tags if str(tag).strip()))
+        max_length = Tag._meta.get_field('name').max_length
+        for tag in entry.tags:
+            if len(tag) > max_length:
+                raise RecordError(f'タグは{max_length}文字以内にしてください: {tag}')
+
+        entry.author = str(raw.get('author') or '').strip() or self.options['author']
+        if not entry.author:
+            raise RecordError('authorがありません（--authorで既定のユーザーを指定できます）')
+
+        entry.is_published = self.parse_bool(raw.get('is_published'), True)
+        entry.is_sold_out = self.parse_bool(raw.get('is_sold_out'), False)
+
+        source = str(raw.get('image') or '').strip()
+        if source:
+            entry.image = self.executor.submit(self.fetch_image, source)
+
+    def parse_bool(self, value, default):
+        if value is None:
+            return default
+        if isinstance(value, bool):
+            return value
+        text = str(value).strip().lower()
+        if text in TRUE_VALUES:
+            return True
+        if text in FALSE_VALUES:
+            return default if text == '' else False
+        raise RecordError(f'真偽値として読めません: {value}')
+
+    def fetch_image(self, source):
+        """
+        画像を取得して検査し、一時ファイルへ書き出す（スレッドで実行、DBには触れない）
+        戻り値: (一時ファイル, 保存名, サイズ)
+        """
+        try:
+            with self.open_image(source) as file:
+                header = file.read(HEADER_LIMIT)
+                extension = self.check_image(header)
+                name = self.image_field.generate_filename(None, f'import{extension}')
+                content = LimitedContent(header, file, settings.IMAGE_UPLOAD_MAX_SIZE)
+                return self.image_field.storage.write_temp(name, content)
+        except (OSError, SuspiciousFileOperation, ValueError) as e:
+            raise RecordError(f'画像を取得できません: {source}（{e}）')
+
+    def open_image(self, source):
+        parsed = urllib.parse.urlsplit(source)
+        scheme = parsed.scheme.lower()
+        if scheme in ('http', 'https'):
+            return urllib.request.urlopen(source, timeout=self.options['timeout'])
+        if scheme == 'file':
+            source = urllib.request.url2pathname(parsed.path)
+        elif len(scheme) > 1:  # 1文字はWindowsのドライブ名（C:）
+            raise RecordError(f'対応していないURLです: {source}')
+        if not self.options['image_dir']:
+            raise RecordError('ローカルの画像を読むには--image-dirを指定してください')
+        # --image-dirの外（../や絶対パス）は読まない
+        return open(safe_join(self.options['image_dir'], source), 'rb')
+
+    def check_image(self, header):
+        """アップロード時と同じ基準で形式と寸法を検査し、拡張子を返す"""
+        image_type = sniff_image_type(header)
+        if image_type is None:
+            raise RecordError('対応していない画像形式です')
+        max_dimension = settings.IMAGE_UPLOAD_MAX_DIMENSION
+        dimension_error = f'画像の縦横は{max_dimension}px以下にしてください'
+        if image_type != 'heif':
+            try:
+                with Image.open(io.BytesIO(header), formats=PILLOW_FORMATS) as img:
+                    width, height = img.size
+            except Image.DecompressionBombError:
+                # 画素数がPillowの上限を超える（OSErrorではないので別に捕まえる）
+                raise RecordError(dimension_error)
+            except (OSError, SyntaxError, ValueError, EOFError):
+                raise RecordError('画像ファイルを読み込めません')
+            if width > max_dimension or height > max_dimension:
+                raise RecordError(dimension_error)
+        return IMAGE_EXTENSIONS[image_type]
+
+    def import_batch(self, batch):
+        """1バッチを1トランザクションで作成し、同じトランザクションで進捗を保存する"""
+        rows = []
+        for entry in batch:
+            if entry.error is None and entry.image is not None:
+                try:
+                    entry.image = entry.image.result()
+                except RecordError as e:
+                    entry.error, entry.image = str(e), None
+            if entry.error is None:
+                rows.append(entry)
+        self.resolve_authors(rows)
+        failed = [entry for entry in batch if entry.error is not None]
+        rows = [entry for entry in rows if entry.error is None]
+
+        now = timezone.now()
+        posts = []
+        files = {}  # 保存名: [一時ファイル, サイズ, 参照数]
+        for entry in rows:
+            post = BlogPost(
+                author_id=self.author_ids[entry.author],
+                title=entry.title,
+                description=entry.description,
+                is_published=entry.is_published,
+                published_at=now if entry.is_published else None,
+                is_sold_out=entry.is_sold_out,
+            )
+            if entry.image is not None:
+                temp_path, name, size = entry.image
+                post.image = name
+                if name in files:
+                    files[name][2] += 1
+                else:
+                    files[name] = [temp_path, size, 1]
+            # bulk_createではsave()が呼ばれないので、ここで変換する
+            if not self.options['defer_rendering']:
+                post.render_description()
+            posts.append(post)
+
+        try:
+            with transaction.atomic():
+                self.resolve_tags({tag for entry in rows for tag in entry.tags})
+                BlogPost.objects.bulk_create(posts)
+                Through = BlogPost.tags.through
+                Through.objects.bulk_create([
+                    Through(blogpost_id=post.id, tag_id=self.tag_ids[tag])
+                    for entry, post in zip(rows, posts)
+                    for tag in entry.tags
+                ])
+                self.image_field.storage.add_references(
+                    {name: tuple(value) for name, value in files.items()}
+                )
+                # bulk_createではm2m_changedが発行されない
+                if any(entry.tags for entry in rows):
+                    transaction.on_commit(invalidate_tag_list)
+                ImportJobCheckpoint.objects.filter(pk=self.checkpoint.pk).update(
+                    last_position=batch[-1].position,
+                    imported=F('imported') + len(posts),
+                    failed=F('failed') + len(failed),
+                )
+        finally:
+            # 同じ内容の画像の2枚目以降や、保存済みだった画像の一時ファイルを消す
+            for entry in batch:
+                self.discard(entry)
+
+        for entry in failed:
+            self.record_failure(entry)
+        self.created += len(posts)
+        self.failed += len(failed)
+
+    def resolve_authors(self, entries):
+        """ユーザー名をIDにする（見つからない記録は失敗にする）"""
+        missing = {entry.author for entry in entries} - self.author_ids.keys()
+        if missing:
+            self.author_ids.update(
+                User.objects.filter(username__in=missing).values_list('username', 'id')
+            )
+        for entry in entries:
+            if entry.author not in self.author_ids:
+                entry.error = f'ユーザーが見つかりません: {entry.author}'
+                self.discard(entry)
+
+    def resolve_tags(self, names):
+        """タグ名をIDにする（ないタグはまとめて作成）"""
+        missing = names - self.tag_ids.keys()
+        if not missing:
+            return
+        Tag.objects.bulk_create([Tag(name=name) for name in missing], ignore_conflicts=True)
+        self.tag_ids.update(Tag.objects.filter(name__in=missing).values_list('name', 'id'))
+
+    def discard(self, entry):
+        """取り込まなかった画像の一時ファイルを消す"""
+        if isinstance(entry.image, tuple):
+            temp_path = entry.image[0]
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        elif entry.image is not None and entry.image.done() and not entry.image.cancelled():
+            if entry.image.exception() is None:
+                entry.image = entry.image.result()
+                self.discard(entry)
+
+    def record_failure(self, entry):
+        self.stderr.write(f'  {entry.position}件目: {entry.error}')
+        if self.error_file is None:
+            return
+        record = entry.raw if isinstance(entry.raw, dict) else {}
+        self.error_file.write(json.dumps(
+            {**record, '_position': entry.position, '_error': entry.error},
+            ensure_ascii=False,
+        ) + '\n')
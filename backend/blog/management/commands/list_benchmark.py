@@ -0,0 +1,132 @@
+# blog/management/commands/list_benchmark.py
+
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Q
+from django.test import Client, override_settings
+
+from blog.models import BlogPost, Tag
+
+
+class Command(BaseCommand):
+    help = (
+        '一覧APIをシリアライザーで作った場合とblog.projectionsで作った場合を比べ、'
+        'レスポンスが1バイトも違わないことと、1リクエストあたりのCPU時間を表示します'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=50,
+            help='1つのURLを計測する回数（デフォルト: 50）',
+        )
+        parser.add_argument(
+            '--username',
+            help='ログインして比べるユーザー（デフォルト: 記事が一番多いユーザー）',
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['username'])
+        cases = self.build_cases(user)
+        if not cases:
+            raise CommandError('記事がありません（create_sample_dataで作成してください）')
+
+        self.stdout.write(
+            f'{"case":34} {"bytes":>8} {"parity":>6} {"queries":>9} '
+            f'{"serializer(ms)":>15} {"fast(ms)":>9} {"speedup":>8}'
+        )
+        mismatches = []
+        # テストクライアントのホスト名（testserver）を許可する
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for label, url, login_user in cases:
+                client = Client()
+                if login_user is not None:
+                    client.force_login(login_user)
+                slow = self.measure(client, url, False, options['repeat'])
+                fast = self.measure(client, url, True, options['repeat'])
+                same = slow['content'] == fast['content']
+                if not same:
+                    mismatches.append((label, slow['content'], fast['content']))
+                line = (
+                    f'{label:34} {len(slow["content"]):8} {"OK" if same else "NG":>6} '
+                    f'{slow["queries"]:4}→{fast["queries"]:<4} '
+                    f'{slow["cpu"] * 1000:15.2f} {fast["cpu"] * 1000:9.2f} '
+                    f'{slow["cpu"] / max(fast["cpu"], 1e-9):7.1f}x'
+                )
+                self.stdout.write(line if same else self.style.ERROR(line))
+
+        for label, expected, actual in mismatches:
+            position = next(
+                (i for i, (a, b) in enumerate(zip(expected, actual)) if a != b),
+                min(len(expected), len(actual)),
+            )
+            self.stderr.write(f'{label}: {position}バイト目から異なります')
+            self.stderr.write(f'  serializer: {expected[max(position - 60, 0):position + 60]!r}')
+            self.stderr.write(f'  fast:       {actual[max(position - 60, 0):position + 60]!r}')
+        if mismatches:
+            raise CommandError(f'{len(mismatches)}件のレスポンスが一致しません')
+        self.stdout.write(self.style.SUCCESS('すべてのレスポンスが一致しました'))
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'ユーザーが見つかりません: {username}')
+        return (
+            User.objects.annotate(posts_total=Count('blog_posts'))
+            .order_by('-posts_total')
+            .first()
+        )
+
+    def build_cases(self, user):
+        """(表示名, URL, ログインするユーザー)の一覧"""
+        if not BlogPost.objects.exists():
+            return []
+        cases = [
+            ('posts', '/api/posts/', None),
+            ('posts page=2', '/api/posts/?page=2', None),
+            ('posts ordering=updated_at', '/api/posts/?ordering=updated_at', None),
+            ('feed', '/api/feed/', None),
+        ]
+        tag = Tag.objects.annotate(posts_total=Count('blog_posts')).order_by('-posts_total').first()
+        if tag is not None:
+            cases.append(('posts tag', f'/api/posts/?tag={tag.name}', None))
+        word = BlogPost.objects.filter(is_published=True).values_list('title', flat=True).first()
+        if word:
+            cases.append(('posts search', f'/api/posts/?search={word.split()[0]}', None))
+        # コメントが一番多い記事のスレッド
+        post = (
+            BlogPost.objects.annotate(
+                comments_total=Count('comments', filter=Q(comments__is_active=True))
+            )
+            .order_by('-comments_total')
+            .first()
+        )
+        cases.append(('comments', f'/api/posts/{post.id}/comments/', None))
+        if user is not None:
+            cases += [
+                (f'posts ({user.username})', '/api/posts/', user),
+                (f'feed ({user.username})', '/api/feed/', user),
+            ]
+        return cases
+
+    def measure(self, client, url, fast, repeat):
+        """レスポンスとクエリ数、1リクエストあたりのCPU時間（クエリ込み）"""
+        with override_settings(FAST_LIST_RESPONSES=fast):
+            # リクエストの開始時にconnection.queriesは消えるので、execute_wrapperで数える
+            queries = []
+            with connection.execute_wrapper(
+                lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)
+            ):
+                response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f'{url}: ステータス{response.status_code}')
+            started = time.process_time()
+            for _ in range(repeat):
+                client.get(url)
+            cpu = (time.process_time() - started) / repeat
+        return {'content': response.content, 'queries': len(queries), 'cpu': cpu}
@@ -0,0 +1,407 @@
+# blog/management/commands/load_test.py
+
+import asyncio
+import io
+import json
+import random
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlsplit
+
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+# シナリオと既定の重み（ホーム・詳細の閲覧が中心）
+DEFAULT_MIX = {
+    'feed': 35, 'tag': 10, 'search': 10, 'detail': 30, 'like': 6, 'comment': 5, 'upload': 4,
+}
+# ログインが必要なシナリオ（匿名ユーザーは選ばない）
+AUTH_SCENARIOS = {'like', 'comment', 'upload'}
+UNSAFE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+# 検索語の候補にする最短の単語長
+MIN_SEARCH_WORD = 2
+
+
+def percentile(values, q):
+    """ソート済みのリストのq分位点"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+class Recorder:
+    """ルートごとのレイテンシとステータスを集計する（ウォームアップ中は記録しない）"""
+
+    def __init__(self, record_from):
+        self.record_from = record_from
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    def add(self, route, status, elapsed):
+        if time.monotonic() < self.record_from:
+            return
+        self.latencies[route].append(elapsed)
+        self.statuses[route][status] += 1
+
+    def summary(self, duration):
+        rows = []
+        for route in sorted(self.latencies):
+            latencies = sorted(self.latencies[route])
+            statuses = self.statuses[route]
+            errors = sum(
+                count for status, count in statuses.items()
+                if not isinstance(status, int) or status >= 400
+            )
+            rows.append({
+                'route': route,
+                'requests': len(latencies),
+                'rps': len(latencies) / duration,
+                'error_rate': errors / len(latencies),
+                'p50_ms': percentile(latencies, 0.5) * 1000,
+                'p90_ms': percentile(latencies, 0.9) * 1000,
+                'p99_ms': percentile(latencies, 0.99) * 1000,
+                'max_ms': latencies[-1] * 1000,
+                'statuses': {str(status): count for status, count in sorted(
+                    statuses.items(), key=lambda item: str(item[0])
+                )},
+            })
+        return rows
+
+
+class VirtualUser:
+    """
+    1人分のクライアント（Cookieを持ち、フロントエンドと同じくcsrftokenを
+    X-CSRFTokenヘッダーで送る）。レスポンスを待ってから次のリクエストを送る
+    """
+
+    def __init__(self, client, recorder, catalog, rng, images):
+        self.client = client
+        self.recorder = recorder
+        self.catalog = catalog
+        self.rng = rng
+        self.images = images
+
+    async def request(self, route, method, url, expected=(), **kwargs):
+        """expectedのステータスは想定どおりなので記録しない"""
+        headers = kwargs.pop('headers', {})
+        if method in UNSAFE_METHODS:
+            token = self.client.cookies.get('csrftoken')
+            if token:
+                headers['X-CSRFToken'] = token
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=headers, **kwargs)
+        except httpx.HTTPError as e:
+            self.recorder.add(route, type(e).__name__, time.perf_counter() - started)
+            return None
+        if response.status_code not in expected:
+            self.recorder.add(route, response.status_code, time.perf_counter() - started)
+        return response
+
+    async def login(self, username, password, create):
+        data = {'username': username, 'password': password}
+        # ユーザーを作る場合、未登録による401はエラーとして数えない
+        response = await self.request(
+            'POST auth/login', 'POST', 'auth/login/', json=data,
+            expected=(401,) if create else (),
+        )
+        if response is not None and response.status_code == 401 and create:
+            response = await self.request('POST auth/signup', 'POST', 'auth/signup/', json={
+                **data, 'password2': password, 'email': f'{username}@example.com',
+            })
+        return response is not None and response.status_code < 400
+
+    def pick_post(self):
+        return self.rng.choice(self.catalog['posts'])
+
+    async def scenario_feed(self):
+        response = await self.request('GET feed', 'GET', 'feed/')
+        # 3割は次のページまでスクロールする
+        if response is not None and response.status_code == 200 and self.rng.random() < 0.3:
+            next_url = response.json().get('next')
+            if next_url:
+                await self.request('GET feed (next)', 'GET', next_url)
+
+    async def scenario_tag(self):
+        if self.catalog['tags']:
+            tag = self.rng.choice(self.catalog['tags'])
+            await self.request('GET posts?tag', 'GET', 'posts/', params={'tag': tag})
+
+    async def scenario_search(self):
+        if self.catalog['words']:
+            word = self.rng.choice(self.catalog['words'])
+            await self.request('GET posts?search', 'GET', 'posts/', params={'search': word})
+
+    async def scenario_detail(self):
+        post_id = self.pick_post()
+        await self.request('GET posts/:id', 'GET', f'posts/{post_id}/')
+        await self.request('GET posts/:id/comments', 'GET', f'posts/{post_id}/comments/')
+
+    async def scenario_like(self):
+        # いいねして取り消す（データを増やさない）
+        post_id = self.pick_post()
+        await self.request('POST posts/:id/like', 'POST', f'posts/{post_id}/like/')
+        await self.request('DELETE posts/:id/like', 'DELETE', f'posts/{post_id}/like/')
+
+    async def scenario_comment(self):
+        post_id = self.pick_post()
+        await self.request(
+            'POST posts/:id/comments', 'POST', f'posts/{post_id}/comments/',
+            json={'content': f'負荷試験のコメント {self.rng.randrange(10 ** 6)}'},
+        )
+
+    async def scenario_upload(self):
+        # 下書きとして画像付きで投稿し、削除する
+        response = await self.request(
+            'POST posts (image)', 'POST', 'posts/',
+            data={
+                'title': f'負荷試験 {self.rng.randrange(10 ** 6)}',
+                'description': '負荷試験で作成した下書きです',
+                'is_published': 'false',
+            },
+            files={'image': ('load-test.jpg', self.rng.choice(self.images), 'image/jpeg')},
+        )
+        if response is not None and response.status_code == 201:
+            post_id = response.json()['id']
+            await self.request('DELETE posts/:id', 'DELETE', f'posts/{post_id}/')
+
+
+class Command(BaseCommand):
+    help = (
+        '起動中のバックエンドに、閲覧・検索・いいね・コメント・画像投稿を混ぜた負荷をかけ、'
+        'ルートごとのスループット・レイテンシ・エラー率を表示します'
+        '（コメントは残るので本番には使わないでください）'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--base-url', default='http://localhost:8000/api',
+            help='APIのベースURL（デフォルト: http://localhost:8000/api）',
+        )
+        parser.add_argument(
+            '--users', type=int, default=20,
+            help='同時に動かす仮想ユーザー数（デフォルト: 20）',
+        )
+        parser.add_argument(
+            '--duration', type=float, default=60,
+            help='計測する秒数（デフォルト: 60）',
+        )
+        parser.add_argument(
+            '--warmup', type=float, default=5,
+            help='集計しない最初の秒数（デフォルト: 5）',
+        )
+        parser.add_argument(
+            '--ramp-up', type=float, default=5,
+            help='全員が動き出すまでの秒数（デフォルト: 5）',
+        )
+        parser.add_argument(
+            '--think-time', type=float, default=0.5,
+            help='操作の間隔の平均秒数（指数分布、0で待たない、デフォルト: 0.5）',
+        )
+        parser.add_argument(
+            '--mix',
+            help='シナリオの重み（例: feed=40,detail=30,like=10）。'
+                 f'シナリオ: {", ".join(DEFAULT_MIX)}',
+        )
+        parser.add_argument(
+            '--login-ratio', type=float, default=0.3,
+            help='ログインする仮想ユーザーの割合（デフォルト: 0.3）',
+        )
+        parser.add_argument(
+            '--username-prefix', default='loadtest',
+            help='ログインに使うユーザー名の接頭辞（loadtest0, loadtest1, ...）',
+        )
+        parser.add_argument(
+            '--password', default='load-test-password-2024',
+            help='ログインに使うパスワード',
+        )
+        parser.add_argument(
+            '--create-users', action='store_true',
+            help='ログインできないユーザーはサインアップAPIで作成する',
+        )
+        parser.add_argument(
+            '--catalog-pages', type=int, default=5,
+            help='対象にする記事を集める一覧のページ数（デフォルト: 5）',
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=10,
+            help='1リクエストのタイムアウト秒数（デフォルト: 10）',
+        )
+        parser.add_argument(
+            '--seed', type=int,
+            help='乱数のシード（同じ操作列を再現する）',
+        )
+        parser.add_argument(
+            '--output',
+            help='結果をJSONで書き出すファイル',
+        )
+
+    def handle(self, *args, **options):
+        mix = self.parse_mix(options['mix'])
+        if options['users'] < 1 or options['duration'] <= 0:
+            raise CommandError('--usersと--durationは正の値にしてください')
+        base_url = options['base_url'].rstrip('/') + '/'
+        parts = urlsplit(base_url)
+        if parts.scheme not in ('http', 'https'):
+            raise CommandError('--base-urlはhttp(s)のURLにしてください')
+        self.options = {**options, 'base_url': base_url}
+        self.mix = mix
+        # HTTPSではDjangoのCSRFチェックがRefererを確認する
+        self.referer = f'{parts.scheme}://{parts.netloc}/'
+
+        summary, duration = asyncio.run(self.main())
+        self.report(summary, duration)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(
+                    {'duration': duration, 'users': options['users'], 'mix': mix,
+                     'routes': summary},
+                    f, ensure_ascii=False, indent=2,
+                )
+
+    def parse_mix(self, value):
+        if not value:
+            return dict(DEFAULT_MIX)
+        mix = {}
+        for part in value.split(','):
+            name, _, weight = part.partition('=')
+            name = name.strip()
+            if name not in DEFAULT_MIX:
+                raise CommandError(f'不明なシナリオです: {name}')
+            try:
+                mix[name] = float(weight)
+            except ValueError:
+                raise CommandError(f'重みは数値で指定してください: {part}')
+        if not any(weight > 0 for weight in mix.values()):
+            raise CommandError('重みが正のシナリオがありません')
+        return mix
+
+    def client(self):
+        return httpx.AsyncClient(
+            base_url=self.options['base_url'],
+            timeout=self.options['timeout'],
+            headers={'Referer': self.referer},
+        )
+
+    async def main(self):
+        async with self.client() as client:
+            catalog = await self.load_catalog(client)
+        self.stdout.write(
+            f'記事{len(catalog["posts"])}件・タグ{len(catalog["tags"])}件を対象に、'
+            f'{self.options["users"]}ユーザーで{self.options["duration"]:.0f}秒計測します'
+        )
+
+        images = [self.make_image(i) for i in range(8)]
+        started = time.monotonic()
+        record_from = started + self.options['warmup']
+        deadline = record_from + self.options['duration']
+        recorder = Recorder(record_from)
+        await asyncio.gather(*(
+            self.run_user(index, catalog, images, recorder, started, deadline)
+            for index in range(self.options['users'])
+        ))
+        duration = min(time.monotonic(), deadline) - record_from
+        return recorder.summary(max(duration, 1e-6)), duration
+
+    async def load_catalog(self, client):
+        """対象にする記事ID・タグ名・検索語を集める"""
+        posts = []
+        url = 'posts/'
+        for _ in range(self.options['catalog_pages']):
+            response = await client.get(url)
+            if response.status_code != 200:
+                raise CommandError(
+                    f'記事一覧を取得できません（{response.status_code}）: {response.url}'
+                )
+            data = response.json()
+            posts.extend(data.get('results', []))
+            url = data.get('next')
+            if not url:
+                break
+        if not posts:
+            raise CommandError('記事がありません（create_sample_dataやimport_postsで作成してください）')
+
+        tags = (await client.get('tags/')).json()
+        if isinstance(tags, dict):
+            tags = tags.get('results', [])
+        words = sorted({
+            word for post in posts for word in post['title'].split()
+            if len(word) >= MIN_SEARCH_WORD
+        })
+        return {
+            'posts': [post['id'] for post in posts],
+            'tags': [tag['name'] for tag in tags],
+            'words': words,
+        }
+
+    def make_image(self, seed):
+        """アップロード用のJPEG（内容が違うので重複排除されない枚数を用意する）"""
+        rng = random.Random(seed)
+        size = (320, 240)
+        img = Image.frombytes('RGB', size, rng.randbytes(size[0] * size[1] * 3))
+        buffer = io.BytesIO()
+        img.save(buffer, format='JPEG', quality=85)
+        return buffer.getvalue()
+
+    async def run_user(self, index, catalog, images, recorder, started, deadline):
+        options = self.options
+        users = options['users']
+        # 少しずつ動き出す
+        await asyncio.sleep(options['ramp_up'] * index / users)
+        seed = None if options['seed'] is None else options['seed'] + index
+        rng = random.Random(seed)
+
+        async with self.client() as client:
+            user = VirtualUser(client, recorder, catalog, rng, images)
+            logged_in = False
+            anonymous_mix = {
+                name: weight for name, weight in self.mix.items()
+                if name not in AUTH_SCENARIOS and weight > 0
+            }
+            if index < round(users * options['login_ratio']) or not anonymous_mix:
+                logged_in = await user.login(
+                    f'{options["username_prefix"]}{index}',
+                    options['password'],
+                    options['create_users'],
+                )
+            mix = self.mix if logged_in else anonymous_mix
+            if not mix:
+                return
+            names = list(mix)
+            weights = [mix[name] for name in names]
+
+            while time.monotonic() < deadline:
+                name = rng.choices(names, weights)[0]
+                await getattr(user, f'scenario_{name}')()
+                if options['think_time'] > 0:
+                    await asyncio.sleep(
+                        min(rng.expovariate(1 / options['think_time']),
+                            max(deadline - time.monotonic(), 0))
+                    )
+
+    def report(self, summary, duration):
+        self.stdout.write(
+            f'{"route":28} {"reqs":>7} {"req/s":>8} {"err%":>6} '
+            f'{"p50(ms)":>8} {"p90(ms)":>8} {"p99(ms)":>8} {"max(ms)":>8}'
+        )
+        for row in summary:
+            line = (
+                f'{row["route"]:28} {row["requests"]:7} {row["rps"]:8.1f} '
+                f'{row["error_rate"]:6.1%} {row["p50_ms"]:8.1f} {row["p90_ms"]:8.1f} '
+                f'{row["p99_ms"]:8.1f} {row["max_ms"]:8.1f}'
+            )
+            self.stdout.write(self.style.ERROR(line) if row['error_rate'] else line)
+        total = sum(row['requests'] for row in summary)
+        errors = sum(row['requests'] * row['error_rate'] for row in summary)
+        self.stdout.write(self.style.SUCCESS(
+            f'合計 {total}リクエスト, {total / max(duration, 1e-6):.1f} req/s, '
+            f'エラー率 {errors / max(total, 1):.2%}（{duration:.1f}秒）'
+        ))
+        for row in summary:
+            failures = {
+                status: count for status, count in row['statuses'].items()
+                if not status.isdigit() or int(status) >= 400
+            }
+            if failures:
+                self.stdout.write(f'  {row["route"]}: {failures}')
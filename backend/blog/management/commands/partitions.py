@@ -0,0 +1,151 @@
+# blog/management/commands/partitions.py
+
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from blog import partitioning
+from blog.partitioning import PARTITIONED_MODELS
+
+
+class Command(BaseCommand):
+    help = 'Like・Commentテーブルの月単位パーティションを管理します（PostgreSQLのみ）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'action', choices=['status', 'convert', 'create', 'archive', 'benchmark'],
+            help=(
+                'status: パーティションの一覧 / convert: 既存テーブルをパーティション化 / '
+                'create: 先の月のパーティションを作成 / archive: 古いパーティションを切り離す / '
+                'benchmark: 通常のテーブルとのレイテンシ比較'
+            ),
+        )
+        parser.add_argument(
+            '--table', choices=sorted(PARTITIONED_MODELS), action='append',
+            help='対象テーブル（複数指定可、デフォルト: すべて）',
+        )
+        parser.add_argument(
+            '--months-ahead', type=int, default=3,
+            help='今月から何か月先までパーティションを作るか（デフォルト: 3）',
+        )
+        parser.add_argument(
+            '--keep-months', type=int, default=24,
+            help='archive: 今月を含めて残す月数（デフォルト: 24）',
+        )
+        parser.add_argument(
+            '--archive-schema', default='archive',
+            help='archive: 切り離したパーティションを移すスキーマ（デフォルト: archive）',
+        )
+        parser.add_argument(
+            '--drop', action='store_true',
+            help='archive: 切り離したパーティションを削除する',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='archive: 対象のパーティションを表示するだけにする',
+        )
+        parser.add_argument(
+            '--rows', type=int, default=1_000_000,
+            help='benchmark: 投入する行数（デフォルト: 1000000）',
+        )
+        parser.add_argument(
+            '--months', type=int, default=24,
+            help='benchmark: データを分散させる月数（デフォルト: 24）',
+        )
+        parser.add_argument(
+            '--samples', type=int, default=1000,
+            help='benchmark: 計測するINSERT・読み取りの回数（デフォルト: 1000）',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('パーティションはPostgreSQLでのみ使えます')
+
+        if options['action'] == 'benchmark':
+            return self.benchmark(options)
+
+        tables = [
+            PARTITIONED_MODELS[name]._meta.db_table
+            for name in options['table'] or sorted(PARTITIONED_MODELS)
+        ]
+        for table in tables:
+            self.stdout.write(self.style.MIGRATE_HEADING(table))
+            with connection.cursor() as cursor:
+                partitioned = partitioning.is_partitioned(cursor, table)
+            if options['action'] == 'convert':
+                if partitioned:
+                    self.stdout.write('  既にパーティションテーブルです')
+                    continue
+                try:
+                    total = partitioning.convert_table(
+                        table, options['months_ahead'], log=self.stdout.write
+                    )
+                except ValueError as e:
+                    raise CommandError(str(e))
+                self.stdout.write(self.style.SUCCESS(
+                    f'  {total}行を移行しました（元のテーブルは{table}_unpartitioned）'
+                ))
+            elif not partitioned:
+                self.stdout.write('  パーティションテーブルではありません（convertで変換します）')
+            elif options['action'] == 'status':
+                self.status(table)
+            elif options['action'] == 'create':
+                created = partitioning.ensure_partitions(table, options['months_ahead'])
+                for name in created:
+                    self.stdout.write(f'  作成: {name}')
+                self.stdout.write(self.style.SUCCESS(f'  {len(created)}個作成しました'))
+            elif options['action'] == 'archive':
+                self.archive(table, options)
+
+    def status(self, table):
+        with connection.cursor() as cursor:
+            partitions = partitioning.list_partitions(cursor, table)
+        for name, lower, upper, rows in partitions:
+            span = f'{lower:%Y-%m} 〜 {upper:%Y-%m}' if lower else 'DEFAULT'
+            self.stdout.write(f'  {name:40} {span:20} 約{rows}行')
+
+        current = partitioning.month_start(datetime.datetime.now(datetime.timezone.utc))
+        latest = max((upper for _, _, upper, _ in partitions if upper), default=None)
+        if latest is None or latest <= partitioning.add_months(current, 1):
+            self.stdout.write(self.style.WARNING(
+                '  来月以降のパーティションがありません（createを実行してください）'
+            ))
+
+    def archive(self, table, options):
+        current = partitioning.month_start(datetime.datetime.now(datetime.timezone.utc))
+        before = partitioning.add_months(current, -(options['keep_months'] - 1))
+        targets = partitioning.detach_partitions(
+            table, before,
+            archive_schema=None if options['drop'] else options['archive_schema'],
+            drop=options['drop'],
+            dry_run=options['dry_run'],
+        )
+        if options['dry_run']:
+            for name in targets:
+                self.stdout.write(f'  対象: {name}')
+            self.stdout.write(f'  {len(targets)}個（{before:%Y-%m}より前）')
+            return
+        destination = '削除' if options['drop'] else f'{options["archive_schema"]}へ移動'
+        for name in targets:
+            self.stdout.write(f'  {destination}: {name}')
+        self.stdout.write(self.style.SUCCESS(f'  {len(targets)}個を切り離しました'))
+
+    def benchmark(self, options):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{options["rows"]}行・{options["months"]}か月分で計測します'
+        ))
+        results = partitioning.benchmark(
+            options['rows'], options['months'], options['samples'], log=self.stdout.write
+        )
+        self.stdout.write(
+            f'{"":12} {"操作":12} {"p50(ms)":>9} {"p95(ms)":>9} {"p99(ms)":>9} {"平均(ms)":>9}'
+        )
+        for kind, result in results.items():
+            for operation in ('insert', 'recent_read'):
+                stats = result[operation]
+                self.stdout.write(
+                    f'{kind:12} {operation:12} {stats["p50"]:9.3f} {stats["p95"]:9.3f} '
+                    f'{stats["p99"]:9.3f} {stats["mean"]:9.3f}'
+                )
+            self.stdout.write(f'{kind:12} サイズ {result["size"] / 1024 / 1024:.1f}MB')
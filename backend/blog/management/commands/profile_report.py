@@ -0,0 +1,68 @@
+# blog/management/commands/profile_report.py
+
+import io
+import os
+import pstats
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from blog.middleware import issue_profile_token
+
+
+class Command(BaseCommand):
+    help = 'ProfilingMiddlewareが保存したプロファイルをビューごとに集計し、重い関数を表示します'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--view',
+            help='集計するビュー名（例: blog:blogpost-list）。省略時はすべて',
+        )
+        parser.add_argument(
+            '--top', type=int, default=20,
+            help='表示する関数の数（デフォルト: 20）',
+        )
+        parser.add_argument(
+            '--sort', default='tottime', choices=['tottime', 'cumulative', 'ncalls'],
+            help='並び順（デフォルト: tottime）',
+        )
+        parser.add_argument(
+            '--issue-token', action='store_true',
+            help='X-Profileヘッダー用の署名付きトークンを発行する',
+        )
+
+    def handle(self, *args, **options):
+        if options['issue_token']:
+            self.stdout.write(issue_profile_token())
+            return
+
+        root = settings.PROFILE_DIR
+        if not root or not os.path.isdir(root):
+            raise CommandError(f'プロファイルがありません: {root}')
+
+        views = sorted(os.listdir(root))
+        if options['view']:
+            views = [v for v in views if v == options['view'].replace(':', '_')]
+            if not views:
+                raise CommandError(f'ビュー {options["view"]} のプロファイルがありません')
+
+        for view in views:
+            directory = os.path.join(root, view)
+            files = sorted(
+                os.path.join(directory, name)
+                for name in os.listdir(directory) if name.endswith('.prof')
+            )
+            if not files:
+                continue
+
+            # 複数リクエストのプロファイルを合算
+            output = io.StringIO()
+            stats = pstats.Stats(files[0], stream=output)
+            for path in files[1:]:
+                stats.add(path)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{view}: {len(files)}リクエスト, 合計 {stats.total_tt * 1000:.0f}ms, '
+                f'平均 {stats.total_tt * 1000 / len(files):.1f}ms'
+            ))
+            stats.strip_dirs().sort_stats(options['sort']).print_stats(options['top'])
+            self.stdout.write(output.getvalue())
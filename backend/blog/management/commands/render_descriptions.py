@@ -0,0 +1,105 @@
+# blog/management/commands/render_descriptions.py
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from blog.models import BlogPost
+from blog.rendering import description_hash, render_batch
+
+
+class Command(BaseCommand):
+    help = '既存の記事本文（Markdown）をHTMLと抜粋に並列で変換します（変更のない記事は飛ばす）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='プロセス数（デフォルト: CPU数）',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='1プロセスにまとめて渡す記事数（デフォルト: 500）',
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='ハッシュが一致する記事も変換し直す',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        posts = (
+            BlogPost.objects.order_by('id')
+            .values_list('id', 'description', 'description_hash')
+            .iterator(chunk_size=batch_size)
+        )
+
+        scanned = rendered = skipped = 0
+        started = time.monotonic()
+        # DB接続を子プロセスに引き継がないようspawnで起動する
+        with ProcessPoolExecutor(
+            max_workers=options['workers'],
+            mp_context=multiprocessing.get_context('spawn'),
+        ) as executor:
+            pending = {}
+            batch = []
+            for post_id, description, current_hash in posts:
+                scanned += 1
+                if not options['force'] and current_hash == description_hash(description):
+                    continue
+                batch.append((post_id, description, current_hash))
+                if len(batch) >= batch_size:
+                    pending[self.submit(executor, batch)] = batch
+                    batch = []
+                # 実行中のバッチはプロセス数の2倍まで（メモリを使いすぎないように）
+                while len(pending) >= options['workers'] * 2:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        saved = self.save(pending.pop(future), future.result())
+                        rendered += saved
+                        skipped += len(future.result()) - saved
+            if batch:
+                pending[self.submit(executor, batch)] = batch
+            for future in list(pending):
+                saved = self.save(pending.pop(future), future.result())
+                rendered += saved
+                skipped += len(future.result()) - saved
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{scanned}件中{rendered}件を変換しました'
+            f'（変換中に編集された記事: {skipped}件, {elapsed:.1f}秒）'
+        ))
+
+    def submit(self, executor, batch):
+        return executor.submit(
+            render_batch, [(post_id, description) for post_id, description, _ in batch]
+        )
+
+    def save(self, batch, results):
+        """変換中に本文が編集されていない記事だけをまとめて更新し、更新件数を返す"""
+        read_hashes = {post_id: current_hash for post_id, _, current_hash in batch}
+        with transaction.atomic():
+            unchanged = {
+                post_id
+                for post_id, current_hash in BlogPost.objects.select_for_update()
+                .filter(id__in=read_hashes)
+                .values_list('id', 'description_hash')
+                if current_hash == read_hashes[post_id]
+            }
+            posts = [
+                BlogPost(
+                    id=post_id,
+                    description_html=html,
+                    description_excerpt=excerpt,
+                    description_hash=content_hash,
+                )
+                for post_id, html, excerpt, content_hash in results
+                if post_id in unchanged
+            ]
+            BlogPost.objects.bulk_update(
+                posts, BlogPost.RENDERED_FIELDS, batch_size=len(posts) or None
+            )
+        return len(posts)
@@ -0,0 +1,114 @@
+# blog/management/commands/reprocess_images.py
+
+import multiprocessing
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from blog import metrics
+from blog.images import register_codecs, render_thumbnails_job
+from blog.models import BlogPost, ImageJobCheckpoint
+
+
+class Command(BaseCommand):
+    help = '既存の記事画像からサムネイルを並列に再生成します（中断しても再開可能）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='プロセス数（デフォルト: CPU数）',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=200,
+            help='チェックポイントを保存する間隔（デフォルト: 200）',
+        )
+        parser.add_argument(
+            '--job', default='thumbnails',
+            help='チェックポイントのジョブ名（デフォルト: thumbnails）',
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='チェックポイントを破棄して最初から処理する',
+        )
+
+    def handle(self, *args, **options):
+        checkpoint, _ = ImageJobCheckpoint.objects.get_or_create(job=options['job'])
+        if options['restart']:
+            checkpoint.last_post_id = 0
+            checkpoint.processed = 0
+            checkpoint.failed = 0
+            checkpoint.save()
+        elif checkpoint.last_post_id:
+            self.stdout.write(f'記事ID {checkpoint.last_post_id} の続きから再開します')
+
+        media_root = settings.MEDIA_ROOT
+        sizes = [tuple(size) for size in settings.BLOG_THUMBNAIL_SIZES]
+        image_format = settings.BLOG_THUMBNAIL_FORMAT
+        quality = settings.BLOG_THUMBNAIL_QUALITY
+        batch_size = options['batch_size']
+
+        posts = (
+            BlogPost.objects.filter(id__gt=checkpoint.last_post_id)
+            .exclude(image='').exclude(image__isnull=True)
+            .order_by('id')
+            .values_list('id', 'image')
+            .iterator(chunk_size=batch_size)
+        )
+
+        timings = []
+        failed = 0
+        started = time.monotonic()
+        # DB接続を子プロセスに引き継がないようspawnで起動する
+        with ProcessPoolExecutor(
+            max_workers=options['workers'],
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=register_codecs,
+        ) as executor:
+            while True:
+                batch = list(islice(posts, batch_size))
+                if not batch:
+                    break
+                work = [
+                    (post_id, name, media_root, sizes, image_format, quality)
+                    for post_id, name in batch
+                ]
+                batch_failed = 0
+                results = executor.map(render_thumbnails_job, work)
+                for post_id, name, elapsed, error in results:
+                    if error:
+                        batch_failed += 1
+                        self.stderr.write(f'  #{post_id} {name}: {error}')
+                    else:
+                        timings.append(elapsed)
+                        metrics.IMAGE_PROCESSING.observe(elapsed, operation='thumbnails')
+                        self.stdout.write(f'  #{post_id} {name}: {elapsed * 1000:.0f}ms')
+
+                # バッチがすべて終わってから進捗を保存
+                ImageJobCheckpoint.objects.filter(pk=checkpoint.pk).update(
+                    last_post_id=batch[-1][0],
+                    processed=F('processed') + len(batch) - batch_failed,
+                    failed=F('failed') + batch_failed,
+                )
+                failed += batch_failed
+                metrics.registry.flush()
+
+        metrics.registry.flush(force=True)
+        elapsed = time.monotonic() - started
+        total = len(timings) + failed
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(timings)}枚を処理しました（失敗: {failed}件, {elapsed:.1f}秒, '
+            f'{total / max(elapsed, 1e-6):.1f}枚/秒）'
+        ))
+        if timings:
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            self.stdout.write(
+                f'1枚あたり: 平均 {statistics.mean(timings) * 1000:.0f}ms, '
+                f'中央値 {statistics.median(timings) * 1000:.0f}ms, '
+                f'p95 {p95 * 1000:.0f}ms, 最大 {timings[-1] * 1000:.0f}ms'
+            )
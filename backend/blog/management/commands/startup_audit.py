@@ -0,0 +1,100 @@
+# blog/management/commands/startup_audit.py
+
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# 計測対象：ワーカー起動時と同じくWSGIアプリケーションを読み込むまで
+TARGETS = {
+    'wsgi': 'import config.wsgi',
+    'asgi': 'import config.asgi',
+    'setup': 'import django; django.setup()',
+}
+BENCHMARK_CODE = '''
+import time
+started = time.perf_counter()
+{target}
+print(time.perf_counter() - started)
+'''
+
+
+class Command(BaseCommand):
+    help = 'モジュールごとのimport時間（-X importtime）と起動時間のベンチマークを表示します'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', default='wsgi', choices=sorted(TARGETS),
+            help='計測する起動処理（デフォルト: wsgi）',
+        )
+        parser.add_argument(
+            '--top', type=int, default=25,
+            help='表示するモジュール数（デフォルト: 25）',
+        )
+        parser.add_argument(
+            '--runs', type=int, default=5,
+            help='起動ベンチマークの実行回数（デフォルト: 5）',
+        )
+        parser.add_argument(
+            '--sort', default='cumulative', choices=['cumulative', 'self'],
+            help='並び順（デフォルト: cumulative）',
+        )
+
+    def handle(self, *args, **options):
+        target = TARGETS[options['target']]
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get(
+            'DJANGO_SETTINGS_MODULE', 'config.settings'
+        )}
+
+        # 1. import時間（新しいプロセスで-X importtimeを使う）
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', target],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+        modules = self.parse_importtime(result.stderr)
+        key = 1 if options['sort'] == 'cumulative' else 0
+        modules.sort(key=lambda m: m[key], reverse=True)
+
+        total = sum(self_us for self_us, _, _ in modules)
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'import時間: {len(modules)}モジュール, 合計 {total / 1000:.1f}ms'
+        ))
+        self.stdout.write(f'{"self(ms)":>10} {"cumulative(ms)":>15}  module')
+        for self_us, cumulative_us, name in modules[:options['top']]:
+            self.stdout.write(f'{self_us / 1000:10.1f} {cumulative_us / 1000:15.1f}  {name}')
+
+        # 2. 起動時間のベンチマーク
+        timings = []
+        for _ in range(options['runs']):
+            result = subprocess.run(
+                [sys.executable, '-c', BENCHMARK_CODE.format(target=target)],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+            if result.returncode != 0:
+                raise CommandError(result.stderr.strip().splitlines()[-1])
+            timings.append(float(result.stdout.strip().splitlines()[-1]))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'起動時間（{options["target"]}, {len(timings)}回）: '
+            f'最小 {min(timings) * 1000:.0f}ms, '
+            f'中央値 {statistics.median(timings) * 1000:.0f}ms, '
+            f'最大 {max(timings) * 1000:.0f}ms'
+        ))
+
+    def parse_importtime(self, output):
+        """'import time: self [us] | cumulative | imported package' の行を解析"""
+        modules = []
+        for line in output.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            try:
+                self_us, cumulative_us, name = line[len('import time:'):].split('|')
+                modules.append((int(self_us), int(cumulative_us), name.strip()))
+            except ValueError:
+                continue
+        return modules
@@ -0,0 +1,153 @@
+# blog/media.py
+
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+# ファイル名にコンテンツハッシュ（16桁以上の16進数）を含むものは内容が変わらない
+HASHED_NAME_RE = re.compile(r"(?:^|[._-])[0-9a-f]{16,}(?:\.[^/]*)?$")
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DEFAULT_CACHE_CONTROL = "public, max-age=3600"
+
+
+class RangeFile:
+    """
+    ファイルの一部だけを読むためのラッパー
+    fileno()とtell()を公開しているので、gunicornなどのwsgi.file_wrapperは
+    Content-Lengthの範囲だけをos.sendfileで送信できる
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.name = file.name
+        self.remaining = length
+        file.seek(start)
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """Rangeヘッダーを(開始, 終了)に変換。複数範囲は無視して全体を返す"""
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # bytes=-500 は末尾500バイト
+        length = int(end)
+        if length == 0:
+            raise ValueError("unsatisfiable range")
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start > end or start >= size:
+        raise ValueError("unsatisfiable range")
+    return start, end
+
+
+def cache_control_for(path):
+    """ハッシュ付きファイル名は永続キャッシュ可能"""
+    if HASHED_NAME_RE.search(os.path.basename(path)):
+        return IMMUTABLE_CACHE_CONTROL
+    return DEFAULT_CACHE_CONTROL
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    本番用のメディア配信ビュー
+    MEDIA_SERVE_MODEに応じて転送をフロントのプロキシに任せる
+      - "x-accel": nginxのX-Accel-Redirect
+      - "x-sendfile": Apache/lighttpdのX-Sendfile
+      - "sendfile": Django内で配信（Range対応、wsgi.file_wrapper経由でsendfile）
+    """
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        stat = os.stat(fullpath)
+    except OSError:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+
+    last_modified = http_date(stat.st_mtime)
+    if not was_modified_since(request.META.get("HTTP_IF_MODIFIED_SINCE"), stat.st_mtime):
+        response = HttpResponseNotModified()
+        response["Cache-Control"] = cache_control_for(path)
+        return response
+
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    content_type = content_type or "application/octet-stream"
+    mode = settings.MEDIA_SERVE_MODE
+
+    if mode == "x-accel":
+        response = HttpResponse(content_type=content_type)
+        # ヘッダーはASCIIのみ（DjangoはMIMEエンコードしてしまう）。nginxはURLデコードして探す
+        response["X-Accel-Redirect"] = quote(settings.MEDIA_ACCEL_PREFIX + path)
+    elif mode == "x-sendfile":
+        response = HttpResponse(content_type=content_type)
+        # mod_xsendfile（XSendFileUnescape On、0.10以降の既定）もlighttpdもURLデコードする
+        response["X-Sendfile"] = quote(os.fsencode(fullpath))
+    else:
+        response = _file_response(request, fullpath, stat.st_size, last_modified, content_type)
+
+    response["Last-Modified"] = last_modified
+    response["Cache-Control"] = cache_control_for(path)
+    if encoding:
+        response["Content-Encoding"] = encoding
+    return response
+
+
+def _file_response(request, fullpath, size, last_modified, content_type):
+    """Range対応のFileResponseを作成"""
+    byte_range = None
+    range_header = request.META.get("HTTP_RANGE")
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if range_header and (not if_range or if_range == last_modified):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+    file = open(fullpath, "rb")
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = FileResponse(RangeFile(file, start, length), content_type=content_type, status=206)
+        response["Content-Length"] = str(length)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Accept-Ranges"] = "bytes"
+    return response
@@ -0,0 +1,311 @@
+# blog/metrics.py
+
+import fcntl
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+# gunicornなど複数プロセスで動かす場合は共有ディレクトリを指定する
+# （各プロセスが自分の値をファイルに書き出し、/metricsで合算する）
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+# ファイルへの書き出し間隔（秒）
+FLUSH_INTERVAL = 1.0
+# 終了したプロセスの値をまとめるファイル（カウンターが減らないように残す）
+ARCHIVE_FILE = "metrics-archive.json"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class Metric:
+    """ラベルの組ごとに値を持つメトリクスの基底クラス"""
+
+    kind = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = registry.lock
+        registry.register(self)
+
+    def key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def merge(self, values, key, value):
+        """別プロセスの値を合算する"""
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def merge(self, values, key, value):
+        values[key] = values.get(key, 0) + value
+
+    def render(self, values):
+        for key, value in values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets) + (float("inf"),)
+        super().__init__(registry, name, documentation, labelnames)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            # [各バケットの件数..., 合計, 件数]
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def time(self, **labels):
+        """with文で処理時間を計測する"""
+        return _Timer(self, labels)
+
+    def merge(self, values, key, value):
+        state = values.get(key)
+        if state is None:
+            values[key] = list(value)
+        else:
+            for i, v in enumerate(value):
+                state[i] += v
+
+    def render(self, values):
+        for key, state in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(state[-2])}"
+            yield f"{self.name}_count{labels} {state[-1]}"
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+class Registry:
+    """プロセス内のメトリクス一覧とテキスト形式への出力"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.last_flush = 0.0
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                name: [[list(key), value] for key, value in metric.values.items()]
+                for name, metric in self.metrics.items()
+            }
+
+    def flush(self, force=False):
+        """マルチプロセスモードならこのプロセスの値をファイルに書き出す"""
+        directory = os.environ.get(MULTIPROC_DIR_ENV)
+        if not directory:
+            return
+        now = time.monotonic()
+        if not force and now - self.last_flush < FLUSH_INTERVAL:
+            return
+        self.last_flush = now
+        os.makedirs(directory, exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=directory, prefix=".metrics-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(temp, os.path.join(directory, f"metrics-{os.getpid()}.json"))
+
+    def collect(self):
+        """全プロセス分（シングルプロセスなら自分の分）を合算した値"""
+        directory = os.environ.get(MULTIPROC_DIR_ENV)
+        if not directory:
+            snapshots = [self.snapshot()]
+        else:
+            self.flush(force=True)
+            self.archive_dead(directory)
+            snapshots = [
+                snapshot
+                for path in glob.glob(os.path.join(directory, "metrics-*.json"))
+                if (snapshot := _load_snapshot(path)) is not None
+            ]
+        return self.merge(snapshots)
+
+    def archive_dead(self, directory):
+        """
+        終了したプロセスのファイルをARCHIVE_FILEへ合算して削除する
+        pidで生死を見るので、ディレクトリはホスト（コンテナ）ごとに分ける
+        """
+        dead = []
+        for path in glob.glob(os.path.join(directory, "metrics-*.json")):
+            pid = os.path.basename(path)[len("metrics-") : -len(".json")]
+            if pid.isdigit() and not _pid_alive(int(pid)):
+                dead.append(path)
+        if not dead:
+            return
+
+        # 複数のプロセスが同時に合算しないようにロックする
+        with open(os.path.join(directory, ".archive.lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            archive = os.path.join(directory, ARCHIVE_FILE)
+            snapshots = [_load_snapshot(archive) or {}]
+            # 他のプロセスが先に合算して削除したものは除く
+            dead = [path for path in dead if os.path.exists(path)]
+            snapshots += [_load_snapshot(path) or {} for path in dead]
+            merged = self.merge(snapshots)
+            fd, temp = tempfile.mkstemp(dir=directory, prefix=".metrics-")
+            with os.fdopen(fd, "w") as f:
+                json.dump(
+                    {
+                        name: [[list(key), value] for key, value in values.items()]
+                        for name, values in merged.items()
+                    },
+                    f,
+                )
+            os.replace(temp, archive)
+            for path in dead:
+                os.remove(path)
+
+    def merge(self, snapshots):
+        """スナップショット（snapshot()の形式）を合算する"""
+        merged = {name: {} for name in self.metrics}
+        for snapshot in snapshots:
+            for name, entries in snapshot.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue
+                for key, value in entries:
+                    metric.merge(merged[name], tuple(key), value)
+        return merged
+
+    def render(self):
+        lines = []
+        for name, values in self.collect().items():
+            metric = self.metrics[name]
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.render(values))
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_LATENCY = Histogram(
+    registry, "blog_http_request_duration_seconds",
+    "リクエストの処理時間", ["view", "method", "status"],
+)
+RESPONSE_SIZE = Histogram(
+    registry, "blog_http_response_size_bytes",
+    "レスポンスのサイズ", ["view"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+DB_QUERIES = Histogram(
+    registry, "blog_db_queries_per_request",
+    "リクエストあたりのクエリ数", ["view"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+DB_TIME = Histogram(
+    registry, "blog_db_time_per_request_seconds",
+    "リクエストあたりのクエリ実行時間", ["view"],
+)
+CACHE_REQUESTS = Counter(
+    registry, "blog_cache_requests_total",
+    "キャッシュの参照数（result=hit/miss）", ["cache", "result"],
+)
+LOAD_SHED = Counter(
+    registry, "blog_load_shed_total",
+    "過負荷で断ったリクエスト数（reason=in_flight/in_flight_writes/db_latency）", ["reason"],
+)
+IMAGE_PROCESSING = Histogram(
+    registry, "blog_image_processing_seconds",
+    "画像処理の時間", ["operation"],
+)
+
+
+def _load_snapshot(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # 別のユーザーのプロセスとして存在する
+        return True
+    return True
+
+
+def metrics_view(request):
+    """
+    Prometheusのテキスト形式でメトリクスを返す
+    METRICS_TOKENが未設定なら公開しない（403）
+    """
+    token = getattr(settings, "METRICS_TOKEN", "")
+    expected = f"Bearer {token}"
+    if not token or not constant_time_compare(
+        request.headers.get("Authorization", ""), expected
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,443 @@
+# blog/middleware.py
+
+import cProfile
+import logging
+import os
+import random
+import re
+import threading
+import time
+import traceback
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+
+from . import compression, metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    """クエリ数の上限超過、または同じ形のクエリの繰り返し（N+1）を検出した"""
+
+
+# SQLの正規化用（値を取り除き、INの要素数の違いをまとめる）
+IN_LIST_RE = re.compile(r"IN \((?:%s, )*%s\)")
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r"\b\d+\b")
+
+
+def normalize_sql(sql):
+    """値の違いを無視して同じ形のクエリをまとめるためのキー"""
+    sql = STRING_RE.sub("?", sql)
+    sql = NUMBER_RE.sub("?", sql)
+    return IN_LIST_RE.sub("IN (...)", sql)
+
+
+def find_call_site():
+    """
+    クエリを発行したコード位置
+    プロジェクト内のフレームを優先し、なければORM外の最も内側のフレームを返す
+    （シリアライザーの遅延読み込みなどはDRF内のフレームになる）
+    """
+    base_dir = str(settings.BASE_DIR)
+    fallback = None
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        filename = frame.filename
+        if filename.endswith(os.path.join("blog", "middleware.py")):
+            continue
+        if filename.startswith(base_dir) and "site-packages" not in filename:
+            return f"{os.path.relpath(filename, base_dir)}:{frame.lineno} in {frame.name}"
+        if fallback is None and os.path.join("django", "db") not in filename:
+            library_path = filename.rsplit("site-packages" + os.sep, 1)[-1]
+            fallback = f"{library_path}:{frame.lineno} in {frame.name}"
+    return fallback or "unknown"
+
+
+class QueryRecorder:
+    """connection.execute_wrapperに渡してリクエスト中のクエリを記録する"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started, find_call_site()))
+
+
+class QueryInspectionMiddleware:
+    """
+    開発・CI用：リクエストごとのクエリを記録し、N+1と予算超過を検出する
+    ビューにquery_budget（整数）またはquery_budgets（アクション名→整数）を宣言すると
+    その数を超えたときに警告する。QUERY_INSPECTOR_RAISE=Trueなら例外を送出する（テスト用）
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "QUERY_INSPECTOR_ENABLED", settings.DEBUG):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        response["X-Query-Count"] = str(len(recorder.queries))
+        self.inspect(request, recorder.queries)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = self.get_budget(request, view_func)
+        # as_view()が返す関数の__qualname__はどのビューでも同じなので、URLの名前を使う
+        request.query_view_name = request.resolver_match.view_name
+        return None
+
+    def get_budget(self, request, view_func):
+        """ビュー（DRFのビューセットならアクション）ごとのクエリ予算を取得"""
+        # 関数ビューはquery_budget属性で宣言する
+        if getattr(view_func, "query_budget", None) is not None:
+            return view_func.query_budget
+        view_class = getattr(view_func, "cls", None) or getattr(
+            view_func, "view_class", None
+        )
+        if view_class is None:
+            return None
+        actions = getattr(view_func, "actions", None) or {}
+        action = actions.get(request.method.lower())
+        budgets = getattr(view_class, "query_budgets", {})
+        if action in budgets:
+            return budgets[action]
+        if request.method.lower() in budgets:
+            return budgets[request.method.lower()]
+        return getattr(view_class, "query_budget", None)
+
+    def inspect(self, request, queries):
+        problems = []
+
+        threshold = getattr(settings, "QUERY_INSPECTOR_REPEAT_THRESHOLD", 5)
+        shapes = Counter()
+        sites = defaultdict(Counter)
+        for sql, _, site in queries:
+            shape = normalize_sql(sql)
+            shapes[shape] += 1
+            sites[shape][site] += 1
+        for shape, count in shapes.most_common():
+            if count <= threshold:
+                break
+            site, _ = sites[shape].most_common(1)[0]
+            problems.append(f"同じ形のクエリが{count}回実行されました（{site}）: {shape[:200]}")
+
+        budget = getattr(request, "query_budget", None)
+        if budget is not None and len(queries) > budget:
+            problems.append(f"クエリ数{len(queries)}が予算{budget}を超えました")
+
+        if not problems:
+            return
+        total_ms = sum(duration for _, duration, _ in queries) * 1000
+        message = (
+            f"{request.method} {request.path} "
+            f"({getattr(request, 'query_view_name', '?')}, {len(queries)}クエリ, "
+            f"{total_ms:.1f}ms)\n  " + "\n  ".join(problems)
+        )
+        if getattr(settings, "QUERY_INSPECTOR_RAISE", False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+# プロファイル用トークンの署名に使うsalt
+PROFILE_TOKEN_SALT = "blog.profile"
+VIEW_NAME_RE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def issue_profile_token():
+    """X-Profileヘッダーに付ける署名付きトークンを発行"""
+    return signing.dumps("profile", salt=PROFILE_TOKEN_SALT)
+
+
+class ProfilingMiddleware:
+    """
+    リクエストをcProfileで計測し、ビューごとにpstatsファイルを書き出す
+    計測するのは次のいずれかの場合のみ
+      - X-Profileヘッダーに有効な署名付きトークンがある
+      - スタッフユーザーが?profile=1を付けた
+      - PROFILE_SAMPLE_RATEの確率で選ばれた
+    X-Profile-Idヘッダーはトークンかスタッフの場合だけ返す（サンプリングされたことは知らせない）
+    ファイルはビューごとにPROFILE_MAX_FILES件を超えたら古いものから削除する
+    集計はmanage.py profile_reportで行う
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PROFILE_DIR", None):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.max_files = getattr(settings, "PROFILE_MAX_FILES", 200)
+
+    def __call__(self, request):
+        reason = self.profile_reason(request)
+        if reason is None:
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        path = self.dump(request, profiler, elapsed_ms)
+        user = getattr(request, "user", None)
+        if reason != "sample" or (user is not None and user.is_staff):
+            response["X-Profile-Id"] = os.path.basename(path)
+        return response
+
+    def profile_reason(self, request):
+        """計測する理由（"token"・"staff"・"sample"）。計測しないならNone"""
+        token = request.headers.get("X-Profile")
+        if token:
+            try:
+                signing.loads(
+                    token,
+                    salt=PROFILE_TOKEN_SALT,
+                    max_age=getattr(settings, "PROFILE_TOKEN_MAX_AGE", 3600),
+                )
+                return "token"
+            except signing.BadSignature:
+                pass
+        if request.GET.get("profile") == "1":
+            user = getattr(request, "user", None)
+            if user is not None and user.is_staff:
+                return "staff"
+        if random.random() < getattr(settings, "PROFILE_SAMPLE_RATE", 0):
+            return "sample"
+        return None
+
+    def dump(self, request, profiler, elapsed_ms):
+        """PROFILE_DIR/<ビュー名>/<時刻>-<pid>-<処理時間>ms.prof に保存"""
+        match = getattr(request, "resolver_match", None)
+        view_name = match.view_name if match else "unresolved"
+        directory = os.path.join(
+            settings.PROFILE_DIR, VIEW_NAME_RE.sub("_", view_name) or "unknown"
+        )
+        os.makedirs(directory, exist_ok=True)
+        filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{elapsed_ms:.0f}ms.prof"
+        path = os.path.join(directory, filename)
+        profiler.dump_stats(path)
+        self.prune(directory)
+        return path
+
+    def prune(self, directory):
+        """max_filesを超えた古いファイルを削除（ファイル名は時刻順に並ぶ）"""
+        files = sorted(name for name in os.listdir(directory) if name.endswith(".prof"))
+        for name in files[: max(len(files) - self.max_files, 0)]:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                # 他のプロセスが先に削除した
+                pass
+
+
+class DatabaseTimer:
+    """execute_wrapper用：クエリ数と実行時間だけを数える（呼び出し元は記録しない）"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """ビューごとのレイテンシ・レスポンスサイズ・DBクエリ数と時間を記録する"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = DatabaseTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, "resolver_match", None)
+        # 未解決のURLはラベルの種類が増えないようにまとめる
+        view = match.view_name if match else "unresolved"
+        metrics.REQUEST_LATENCY.observe(
+            elapsed, view=view, method=request.method, status=response.status_code
+        )
+        if not response.streaming:
+            metrics.RESPONSE_SIZE.observe(len(response.content), view=view)
+        metrics.DB_QUERIES.observe(timer.count, view=view)
+        metrics.DB_TIME.observe(timer.duration, view=view)
+        metrics.registry.flush()
+        return response
+
+
+class LoadSheddingMiddleware:
+    """
+    処理中のリクエスト数とDBの混み具合がしきい値を超えたら、ビューを呼ばずに
+    503（Retry-After付き）を返す。書き込みは低いしきい値で先に断り、読み取りのレイテンシを守る
+    DBはコネクションプールを使っていない（待ち時間を測れない）ので、
+    最近のクエリ1件あたりの時間の指数移動平均を混み具合とみなす
+    数はプロセスごと（スレッドで並行に処理するワーカー向け）
+    """
+
+    SAFE_METHODS = ("GET", "HEAD", "OPTIONS", "TRACE")
+    # クエリ時間の移動平均の重み（新しいリクエストの割合）
+    DB_LATENCY_WEIGHT = 0.2
+
+    def __init__(self, get_response):
+        if not getattr(settings, "LOAD_SHED_ENABLED", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.max_in_flight = getattr(settings, "LOAD_SHED_MAX_IN_FLIGHT", 64)
+        self.max_in_flight_writes = getattr(settings, "LOAD_SHED_MAX_IN_FLIGHT_WRITES", 16)
+        self.db_latency_threshold = getattr(settings, "LOAD_SHED_DB_LATENCY", 0.1)
+        self.retry_after = getattr(settings, "LOAD_SHED_RETRY_AFTER", 5)
+        self.exempt_paths = tuple(getattr(settings, "LOAD_SHED_EXEMPT_PATHS", ()))
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.in_flight_writes = 0
+        self.db_latency = 0.0
+        self.db_latency_updated = 0.0
+
+    def __call__(self, request):
+        if request.path.startswith(self.exempt_paths):
+            return self.get_response(request)
+        write = request.method not in self.SAFE_METHODS
+        with self.lock:
+            reason = self.overload_reason(write)
+            if reason is None:
+                self.in_flight += 1
+                self.in_flight_writes += write
+        if reason is not None:
+            metrics.LOAD_SHED.inc(reason=reason)
+            logger.warning("過負荷のため%s %sを断りました（%s）", request.method, request.path, reason)
+            return self.reject()
+
+        timer = DatabaseTimer()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timer))
+                return self.get_response(request)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+                self.in_flight_writes -= write
+                if timer.count:
+                    latency = timer.duration / timer.count
+                    self.db_latency += self.DB_LATENCY_WEIGHT * (latency - self.db_latency)
+                    self.db_latency_updated = time.monotonic()
+
+    def overload_reason(self, write):
+        """断る理由（断らないならNone）。lockを取って呼ぶ"""
+        if self.in_flight >= self.max_in_flight:
+            return "in_flight"
+        if not write:
+            return None
+        if self.in_flight_writes >= self.max_in_flight_writes:
+            return "in_flight_writes"
+        # 書き込みを断っている間も読み取りで更新されるが、
+        # 止まったままにならないよう、Retry-Afterの間クエリがなければ回復したとみなす
+        if time.monotonic() - self.db_latency_updated > self.retry_after:
+            self.db_latency = 0.0
+        if self.db_latency >= self.db_latency_threshold:
+            return "db_latency"
+        return None
+
+    def reject(self):
+        response = JsonResponse(
+            {"detail": "サーバーが混み合っています。しばらくしてから再度お試しください。"},
+            status=503,
+        )
+        response["Retry-After"] = str(self.retry_after)
+        return response
+
+
+class CompressionMiddleware:
+    """
+    Accept-Encodingに応じてレスポンスを圧縮する（COMPRESSION_ENCODINGSの順に優先）
+    COMPRESSION_MIN_SIZE未満の小さなレスポンスや、画像など圧縮済みの形式はそのまま返す
+    StreamingHttpResponseはチャンクごとに圧縮・フラッシュする（SSEも届いた分ずつ送られる）
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.codecs = compression.available_codecs(
+            getattr(settings, "COMPRESSION_ENCODINGS", ["zstd", "br", "gzip"]),
+            getattr(settings, "COMPRESSION_LEVELS", None),
+        )
+        self.min_size = getattr(settings, "COMPRESSION_MIN_SIZE", 1024)
+        if not self.codecs:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            response.has_header("Content-Encoding")
+            or response.status_code == 206
+            or not compression.is_compressible(response.get("Content-Type", ""))
+        ):
+            return response
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        codec = compression.select_codec(
+            self.codecs, request.META.get("HTTP_ACCEPT_ENCODING", "")
+        )
+        if codec is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = self.stream_async(
+                    codec, response.streaming_content
+                )
+            else:
+                response.streaming_content = codec.stream(response.streaming_content)
+            response.headers.pop("Content-Length", None)
+        else:
+            compressed = codec.compress(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response["Content-Length"] = str(len(compressed))
+
+        # 圧縮後のバイト列は元と異なるので、強いETagは弱いETagにする
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        response["Content-Encoding"] = codec.name
+        return response
+
+    async def stream_async(self, codec, chunks):
+        """非同期イテレーター版（チャンクごとに圧縮・フラッシュする）"""
+        compressor = codec.compressor()
+        async for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.3 on 2026-10-19 15:25
+
+import blog.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0003_blogpost_is_sold_out"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImageBlob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        max_length=255, unique=True, verbose_name="ファイル名"
+                    ),
+                ),
+                ("size", models.PositiveBigIntegerField(verbose_name="サイズ")),
+                (
+                    "ref_count",
+                    models.PositiveIntegerField(default=0, verbose_name="参照数"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="作成日時"),
+                ),
+            ],
+            options={
+                "verbose_name": "画像ファイル",
+                "verbose_name_plural": "画像ファイル",
+            },
+        ),
+        migrations.AlterField(
+            model_name="blogpost",
+            name="image",
+            field=models.ImageField(
+                blank=True,
+                null=True,
+                storage=blog.storage.ContentAddressedStorage(),
+                upload_to="blog_images/",
+                verbose_name="画像",
+            ),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.3 on 2026-10-19 15:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0004_imageblob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImageJobCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "job",
+                    models.CharField(
+                        max_length=100, unique=True, verbose_name="ジョブ名"
+                    ),
+                ),
+                (
+                    "last_post_id",
+                    models.BigIntegerField(
+                        default=0, verbose_name="処理済みの最終記事ID"
+                    ),
+                ),
+                (
+                    "processed",
+                    models.PositiveIntegerField(default=0, verbose_name="処理件数"),
+                ),
+                (
+                    "failed",
+                    models.PositiveIntegerField(default=0, verbose_name="失敗件数"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="更新日時"),
+                ),
+            ],
+            options={
+                "verbose_name": "画像処理チェックポイント",
+                "verbose_name_plural": "画像処理チェックポイント",
+            },
+        ),
+    ]
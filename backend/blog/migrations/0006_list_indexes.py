@@ -0,0 +1,27 @@
+# Generated by Django 5.2.3 on 2026-10-19 15:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0005_imagejobcheckpoint"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="blogpost",
+            index=models.Index(
+                fields=["author", "-created_at"], name="blog_blogpo_author__61fe3f_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="like",
+            index=models.Index(
+                fields=["user", "-created_at"], name="blog_like_user_id_9d7549_idx"
+            ),
+        ),
+    ]
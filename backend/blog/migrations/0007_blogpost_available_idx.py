@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-19 15:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0006_list_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="blogpost",
+            index=models.Index(
+                condition=models.Q(("is_published", True), ("is_sold_out", False)),
+                fields=["-created_at"],
+                name="blog_post_available_idx",
+            ),
+        ),
+    ]
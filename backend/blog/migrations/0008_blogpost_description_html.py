@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-19 15:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0007_blogpost_available_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="blogpost",
+            name="description_excerpt",
+            field=models.CharField(
+                blank=True, editable=False, max_length=200, verbose_name="本文の抜粋"
+            ),
+        ),
+        migrations.AddField(
+            model_name="blogpost",
+            name="description_hash",
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="blogpost",
+            name="description_html",
+            field=models.TextField(blank=True, editable=False, verbose_name="本文HTML"),
+        ),
+    ]
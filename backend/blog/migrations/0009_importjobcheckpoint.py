@@ -0,0 +1,75 @@
+# Generated by Django 5.2.3 on 2026-10-19 16:14
+
+from django.db import migrations, models
+
+
+def move_import_checkpoints(apps, schema_editor):
+    """import_postsがImageJobCheckpointに記録していた進捗（既定のジョブ名import:...）を移す"""
+    ImageJobCheckpoint = apps.get_model("blog", "ImageJobCheckpoint")
+    ImportJobCheckpoint = apps.get_model("blog", "ImportJobCheckpoint")
+    old = ImageJobCheckpoint.objects.filter(job__startswith="import:")
+    ImportJobCheckpoint.objects.bulk_create(
+        [
+            ImportJobCheckpoint(
+                job=checkpoint.job,
+                last_position=checkpoint.last_post_id,
+                imported=checkpoint.processed,
+                failed=checkpoint.failed,
+            )
+            for checkpoint in old
+        ]
+    )
+    old.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0008_blogpost_description_html"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportJobCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "job",
+                    models.CharField(
+                        max_length=100, unique=True, verbose_name="ジョブ名"
+                    ),
+                ),
+                (
+                    "last_position",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="処理済みの最終位置（入力の何件目か）"
+                    ),
+                ),
+                (
+                    "imported",
+                    models.PositiveIntegerField(default=0, verbose_name="作成件数"),
+                ),
+                (
+                    "failed",
+                    models.PositiveIntegerField(default=0, verbose_name="失敗件数"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="更新日時"),
+                ),
+            ],
+            options={
+                "verbose_name": "取り込みチェックポイント",
+                "verbose_name_plural": "取り込みチェックポイント",
+            },
+        ),
+        migrations.RunPython(move_import_checkpoints, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,12 @@
 # blog/models.py
 
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.validators import MinLengthValidator
+from .rendering import description_hash, render_description
+from .storage import ContentAddressedStorage
 
 
 class Tag(models.Model):
@@ -21,6 +24,94 @@ class Tag(models.Model):
         return self.name
 
 
+class BlogPostQuerySet(models.QuerySet):
+    """ブログ記事のクエリセット"""
+
+    def visible_to(self, user):
+        """閲覧できる記事：未認証なら公開記事のみ、認証済みなら公開記事と自分の下書き"""
+        if not user.is_authenticated:
+            return self.filter(is_published=True)
+        return self.filter(
+            models.Q(is_published=True) | models.Q(author=user, is_published=False)
+        )
+
+    def available(self):
+        """購入できる記事（公開中で売り切れていない）：部分インデックスを使う条件"""
+        return self.filter(is_published=True, is_sold_out=False)
+
+    def with_comments_count(self):
+        """有効なコメント数（返信を含む）をサブクエリで取得"""
+        comments = (
+            Comment.objects.filter(blog_post=models.OuterRef("pk"), is_active=True)
+            .order_by()
+            .values("blog_post")
+            .annotate(count=models.Count("pk"))
+            .values("count")
+        )
+        return self.annotate(
+            comments_count=Coalesce(
+                models.Subquery(comments, output_field=models.IntegerField()), 0
+            )
+        )
+
+    def with_list_data(self, user):
+        """
+        一覧表示用のデータをまとめて取得
+        著者はJOIN、タグはprefetch、いいね数といいね済みかはアノテーションで取得する
+        """
+        return self.select_related("author").prefetch_related("tags").with_likes(user)
+
+    def with_likes(self, user):
+        """いいね数と、ログイン中ならいいね済みかをアノテーション"""
+        queryset = self.annotate(likes_count=models.Count("likes", distinct=True))
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                is_liked=models.Exists(
+                    Like.objects.filter(blog_post=models.OuterRef("pk"), user=user)
+                )
+            )
+        return queryset
+
+    def set_sold_out(self, author, ids, is_sold_out):
+        """
+        著者の記事の販売状況を1回のUPDATEでまとめて変更し、変更した記事のIDを返す
+        すでに同じ状態の記事は書き換えない（UPDATE ... RETURNINGを使う）
+        このクエリセットの絞り込みも条件に含める
+        """
+        if not ids:
+            return []
+        queryset = (
+            self.filter(author=author, pk__in=ids)
+            .exclude(is_sold_out=is_sold_out)
+            .order_by()
+            .values("pk")
+        )
+        connection = connections[self.db]
+        now = timezone.now()
+        if not connection.features.can_return_columns_from_insert:
+            # RETURNING非対応（SQLite 3.35未満など）：行をロックして読んでから更新する
+            with transaction.atomic(using=self.db):
+                updated = list(
+                    queryset.select_for_update().values_list("pk", flat=True)
+                )
+                self.model._base_manager.using(self.db).filter(pk__in=updated).update(
+                    is_sold_out=is_sold_out, updated_at=now
+                )
+            return sorted(updated)
+
+        subquery, subparams = queryset.query.get_compiler(self.db).as_sql()
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        pk = connection.ops.quote_name(self.model._meta.pk.column)
+        sql = (
+            f"UPDATE {table} SET is_sold_out = %s, updated_at = %s "
+            f"WHERE {pk} IN ({subquery}) RETURNING {pk}"
+        )
+        params = [is_sold_out, now, *subparams]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return sorted(row[0] for row in cursor.fetchall())
+
+
 class BlogPost(models.Model):
     """ブログ記事モデル：メインとなるブログ投稿"""
 
@@ -35,9 +126,23 @@ class BlogPost(models.Model):
     # 記事の基本情報
     title = models.CharField(max_length=200, verbose_name="タイトル")
     description = models.TextField(verbose_name="説明・本文")
+    # 保存時にMarkdownから変換したHTMLと一覧用の抜粋（blog.rendering）
+    description_html = models.TextField(blank=True, editable=False, verbose_name="本文HTML")
+    description_excerpt = models.CharField(
+        max_length=200, blank=True, editable=False, verbose_name="本文の抜粋"
+    )
+    # 変換元の本文のハッシュ（本文が変わったときだけ変換し直す）
+    description_hash = models.CharField(max_length=64, blank=True, editable=False)
 
     # 画像（画像は'blog_images/'フォルダに保存される）
-    image = models.ImageField(upload_to="blog_images/", blank=True, null=True, verbose_name="画像")
+    # 同じ内容の画像は一度だけ保存される（ContentAddressedStorage）
+    image = models.ImageField(
+        upload_to="blog_images/",
+        storage=ContentAddressedStorage(),
+        blank=True,
+        null=True,
+        verbose_name="画像",
+    )
 
     # タグ（多対多の関係：1つの記事に複数のタグ、1つのタグは複数の記事に使える）
     tags = models.ManyToManyField(Tag, related_name="blog_posts", blank=True, verbose_name="タグ")
@@ -53,10 +158,25 @@ class BlogPost(models.Model):
     is_published = models.BooleanField(default=True, verbose_name="公開設定")
     published_at = models.DateTimeField(blank=True, null=True, verbose_name="公開日時")
 
+    objects = BlogPostQuerySet.as_manager()
+
+    # render_description()で更新するフィールド
+    RENDERED_FIELDS = ("description_html", "description_excerpt", "description_hash")
+
     class Meta:
         verbose_name = "ブログ記事"
         verbose_name_plural = "ブログ記事"
         ordering = ["-created_at"]  # 新しい記事から順に表示
+        indexes = [
+            # 自分の投稿一覧（my_posts）
+            models.Index(fields=["author", "-created_at"]),
+            # 購入できる記事の一覧（?available=true）
+            models.Index(
+                fields=["-created_at"],
+                name="blog_post_available_idx",
+                condition=models.Q(is_published=True, is_sold_out=False),
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -65,13 +185,81 @@ class BlogPost(models.Model):
         """保存時の処理：公開設定がTrueで公開日時が未設定なら現在時刻を設定"""
         if self.is_published and not self.published_at:
             self.published_at = timezone.now()
+        update_fields = kwargs.get("update_fields")
+        if self.render_description(update_fields) and update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, *self.RENDERED_FIELDS}
         super().save(*args, **kwargs)
 
+    def render_description(self, update_fields=None):
+        """本文が変わっていればHTMLと抜粋を作り直す（作り直したらTrue）"""
+        if update_fields is not None and "description" not in update_fields:
+            return False
+        if self.description_hash == description_hash(self.description):
+            return False
+        (
+            self.description_html,
+            self.description_excerpt,
+            self.description_hash,
+        ) = render_description(self.description)
+        return True
+
     def get_likes_count(self):
         """いいねの数を取得するメソッド"""
         return self.likes.count()
 
 
+class ImageBlob(models.Model):
+    """画像ファイルの実体：内容のハッシュ名で1つだけ保存し、参照数を管理する"""
+
+    name = models.CharField(max_length=255, unique=True, verbose_name="ファイル名")
+    size = models.PositiveBigIntegerField(verbose_name="サイズ")
+    ref_count = models.PositiveIntegerField(default=0, verbose_name="参照数")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="作成日時")
+
+    class Meta:
+        verbose_name = "画像ファイル"
+        verbose_name_plural = "画像ファイル"
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count})"
+
+
+class ImageJobCheckpoint(models.Model):
+    """画像一括処理の進捗：中断しても続きから再開できるようにする"""
+
+    job = models.CharField(max_length=100, unique=True, verbose_name="ジョブ名")
+    last_post_id = models.BigIntegerField(default=0, verbose_name="処理済みの最終記事ID")
+    processed = models.PositiveIntegerField(default=0, verbose_name="処理件数")
+    failed = models.PositiveIntegerField(default=0, verbose_name="失敗件数")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
+
+    class Meta:
+        verbose_name = "画像処理チェックポイント"
+        verbose_name_plural = "画像処理チェックポイント"
+
+    def __str__(self):
+        return f"{self.job}: {self.last_post_id}"
+
+
+class ImportJobCheckpoint(models.Model):
+    """記事の一括取り込み（import_posts）の進捗：入力ファイルの何件目まで取り込んだか"""
+
+    job = models.CharField(max_length=100, unique=True, verbose_name="ジョブ名")
+    last_position = models.PositiveIntegerField(
+        default=0, verbose_name="処理済みの最終位置（入力の何件目か）"
+    )
+    imported = models.PositiveIntegerField(default=0, verbose_name="作成件数")
+    failed = models.PositiveIntegerField(default=0, verbose_name="失敗件数")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
+
+    class Meta:
+        verbose_name = "取り込みチェックポイント"
+        verbose_name_plural = "取り込みチェックポイント"
+
+    def __str__(self):
+        return f"{self.job}: {self.last_position}"
+
+
 class Like(models.Model):
     """いいねモデル：ユーザーが記事にいいねする機能"""
 
@@ -92,6 +280,10 @@ class Like(models.Model):
         # 同じユーザーが同じ記事に複数回いいねできないようにする
         unique_together = ("user", "blog_post")
         ordering = ["-created_at"]
+        indexes = [
+            # いいねした記事一覧（liked_posts）をいいねした順に取得
+            models.Index(fields=["user", "-created_at"]),
+        ]
 
     def __str__(self):
         return f"{self.user.username} が {self.blog_post.title} にいいね"
@@ -147,7 +339,9 @@ class Comment(models.Model):
 
     @property
     def reply_count(self):
-        """返信数を取得"""
+        """返信数を取得（prefetch_related("replies")済みなら読み込んだ返信から数える）"""
+        if "replies" in getattr(self, "_prefetched_objects_cache", {}):
+            return sum(1 for reply in self.replies.all() if reply.is_active)
         return self.replies.filter(is_active=True).count()
 
     def get_thread(self):
@@ -0,0 +1,452 @@
+# blog/partitioning.py
+
+"""
+Like・Commentテーブルの月単位レンジパーティション（PostgreSQL 13以降のみ、任意）
+
+manage.py partitions convert で既存テーブルをパーティションテーブルに置き換え、
+以後は manage.py partitions create を定期的に（cronなどで月1回）実行して先の月を作っておく。
+
+パーティションテーブルの制約：
+- 主キーにパーティションキーが必要なため、主キーは(id, created_at)になる
+- パーティションをまたぐ一意制約は作れないため、一意インデックス（Likeのuser・blog_post）は
+  通常のインデックスとトリガーで一意性を保つ（違反時はunique_violationなのでIntegrityErrorになる）
+- 自分自身への外部キー（Comment.parent）はDBの制約としては持てないため外す
+  （削除時のCASCADEはDjangoが行うので動作は変わらない）
+- パーティションの絞り込み（pruning）が効くのはcreated_atで範囲を指定したクエリだけ。
+  idでの取得やLikeの(user, blog_post)での検索は全パーティションのインデックスを引くので、
+  パーティションの数だけ遅くなる（古いパーティションは切り離して数を抑える）
+- 範囲外の行はDEFAULTパーティションに入る。その月のパーティションを後から作るときは、
+  ensure_partitionsがDEFAULTを切り離して該当する行を移し、付け直す
+"""
+
+import datetime
+import re
+import statistics
+import time
+
+from django.db import connection, transaction
+
+from .models import Comment, Like
+
+PARTITION_COLUMN = "created_at"
+# 対象テーブル（コマンドの--tableで指定する名前→モデル）
+PARTITIONED_MODELS = {"like": Like, "comment": Comment}
+
+BOUND_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def quote(name):
+    return connection.ops.quote_name(name)
+
+
+def month_start(value):
+    return datetime.date(value.year, value.month, 1)
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y_%m}"
+
+
+def month_bound(month):
+    """パーティションの境界（UTCの月初）"""
+    return f"{month:%Y-%m-%d} 00:00:00+00"
+
+
+def is_partitioned(cursor, table):
+    cursor.execute(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+        "JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = %s AND pg_table_is_visible(c.oid))",
+        [table],
+    )
+    return cursor.fetchone()[0]
+
+
+def list_partitions(cursor, table):
+    """[(パーティション名, 開始月, 終了月, 行数の推定)]（DEFAULTパーティションは月がNone）"""
+    cursor.execute(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples "
+        "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = %s::regclass ORDER BY c.relname",
+        [table],
+    )
+    partitions = []
+    for name, bound, rows in cursor.fetchall():
+        match = BOUND_RE.search(bound)
+        if match:
+            lower, upper = (
+                month_start(datetime.date.fromisoformat(value[:10]))
+                for value in match.groups()
+            )
+        else:
+            lower = upper = None
+        partitions.append((name, lower, upper, max(int(rows), 0)))
+    return partitions
+
+
+def create_partition(cursor, table, month, parent=None):
+    """monthの1か月分のパーティションを作る（既にあれば何もしない）"""
+    name = partition_name(table, month)
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {quote(name)} PARTITION OF {quote(parent or table)} "
+        f"FOR VALUES FROM (%s) TO (%s)",
+        [month_bound(month), month_bound(add_months(month, 1))],
+    )
+    return name
+
+
+def ensure_partitions(table, months_ahead, today=None):
+    """今月からmonths_ahead か月先までのパーティションを作り、作ったものを返す"""
+    current = month_start(today or datetime.datetime.now(datetime.timezone.utc))
+    with connection.cursor() as cursor:
+        partitions = list_partitions(cursor, table)
+        existing = {name for name, *_ in partitions}
+        default = next((name for name, lower, *_ in partitions if lower is None), None)
+        created = []
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            if partition_name(table, month) not in existing:
+                with transaction.atomic():
+                    created.append(
+                        _create_partition_with_default(cursor, table, month, default)
+                    )
+    return created
+
+
+def _create_partition_with_default(cursor, table, month, default):
+    """
+    DEFAULTパーティションにその月の行があると、範囲が重なるためパーティションを作れない
+    その場合はDEFAULTを切り離してパーティションを作り、行を移してから付け直す
+    """
+    bounds = [month_bound(month), month_bound(add_months(month, 1))]
+    if default is not None:
+        cursor.execute(
+            f"SELECT EXISTS (SELECT 1 FROM {quote(default)} "
+            f"WHERE {quote(PARTITION_COLUMN)} >= %s AND {quote(PARTITION_COLUMN)} < %s)",
+            bounds,
+        )
+        if not cursor.fetchone()[0]:
+            default = None
+    if default is None:
+        return create_partition(cursor, table, month)
+
+    cursor.execute(f"ALTER TABLE {quote(table)} DETACH PARTITION {quote(default)}")
+    name = create_partition(cursor, table, month)
+    cursor.execute(
+        f"WITH moved AS (DELETE FROM {quote(default)} "
+        f"WHERE {quote(PARTITION_COLUMN)} >= %s AND {quote(PARTITION_COLUMN)} < %s "
+        f"RETURNING *) INSERT INTO {quote(name)} SELECT * FROM moved",
+        bounds,
+    )
+    cursor.execute(
+        f"ALTER TABLE {quote(table)} ATTACH PARTITION {quote(default)} DEFAULT"
+    )
+    return name
+
+
+def detach_partitions(table, before, archive_schema=None, drop=False, dry_run=False):
+    """
+    before（月初の日付）より前のパーティションを切り離す
+    archive_schemaを指定すればそのスキーマへ移し、dropなら削除する
+    """
+    with connection.cursor() as cursor:
+        targets = [
+            name
+            for name, lower, upper, _ in list_partitions(cursor, table)
+            if upper is not None and upper <= before
+        ]
+        if dry_run:
+            return targets
+        if archive_schema:
+            cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {quote(archive_schema)}")
+        for name in targets:
+            with transaction.atomic():
+                cursor.execute(
+                    f"ALTER TABLE {quote(table)} DETACH PARTITION {quote(name)}"
+                )
+                if drop:
+                    cursor.execute(f"DROP TABLE {quote(name)}")
+                elif archive_schema:
+                    cursor.execute(
+                        f"ALTER TABLE {quote(name)} SET SCHEMA {quote(archive_schema)}"
+                    )
+    return targets
+
+
+def _unique_trigger_sql(table, index_name, columns):
+    """パーティションをまたいだ一意性をアドバイザリロックと存在確認で保つトリガー"""
+    function = f"{index_name}_check"
+    key = " || ':' || ".join(f"NEW.{quote(column)}" for column in columns)
+    match = " AND ".join(f"{quote(column)} = NEW.{quote(column)}" for column in columns)
+    return [
+        f"""
+        CREATE OR REPLACE FUNCTION {quote(function)}() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_advisory_xact_lock(hashtextextended('{table}:' || {key}, 0));
+            IF EXISTS (
+                SELECT 1 FROM {quote(table)}
+                WHERE {match} AND NOT (id = NEW.id AND {PARTITION_COLUMN} = NEW.{PARTITION_COLUMN})
+            ) THEN
+                RAISE unique_violation USING MESSAGE =
+                    'duplicate key value violates unique constraint "{index_name}"';
+            END IF;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+        f"CREATE TRIGGER {quote(function)} BEFORE INSERT OR UPDATE OF "
+        f"{', '.join(quote(column) for column in columns)} ON {quote(table)} "
+        f"FOR EACH ROW EXECUTE FUNCTION {quote(function)}()",
+    ]
+
+
+def convert_table(table, months_ahead=3, log=print):
+    """
+    既存のテーブルを同じ名前のパーティションテーブルに置き換える
+    コピー中は書き込みを止める（SHARE MODEのロックなので読み取りはできる）
+    元のテーブルは <table>_unpartitioned として残す（確認後に手動で削除する）
+    """
+    new = f"{table}_partitioned"
+    backup = f"{table}_unpartitioned"
+    with transaction.atomic(), connection.cursor() as cursor:
+        if is_partitioned(cursor, table):
+            raise ValueError(f"{table}は既にパーティションテーブルです")
+        cursor.execute(
+            "SELECT conrelid::regclass::text FROM pg_constraint "
+            "WHERE contype = 'f' AND confrelid = %s::regclass AND conrelid <> confrelid",
+            [table],
+        )
+        referencing = [row[0] for row in cursor.fetchall()]
+        if referencing:
+            raise ValueError(
+                f"{table}を参照する外部キーがあるため変換できません: {', '.join(referencing)}"
+            )
+
+        cursor.execute(f"LOCK TABLE {quote(table)} IN SHARE MODE")
+        cursor.execute(f"SELECT min({PARTITION_COLUMN}), count(*) FROM {quote(table)}")
+        oldest, total = cursor.fetchone()
+        now = datetime.datetime.now(datetime.timezone.utc)
+        first_month = month_start(
+            oldest.astimezone(datetime.timezone.utc) if oldest else now
+        )
+
+        # 1. 同じ列構成のパーティションテーブル（主キーは(id, created_at)）
+        cursor.execute(
+            f"CREATE TABLE {quote(new)} (LIKE {quote(table)} INCLUDING DEFAULTS) "
+            f"PARTITION BY RANGE ({quote(PARTITION_COLUMN)})"
+        )
+        cursor.execute(
+            f"CREATE SEQUENCE {quote(new + '_id_seq')} OWNED BY {quote(new)}.id"
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote(new)} ALTER COLUMN id "
+            f"SET DEFAULT nextval('{new}_id_seq'::regclass)"
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote(new)} ADD CONSTRAINT {quote(new + '_pkey')} "
+            f"PRIMARY KEY (id, {quote(PARTITION_COLUMN)})"
+        )
+
+        # 2. 最古の月から months_ahead か月先までのパーティションと、範囲外用のDEFAULT
+        month = first_month
+        last_month = add_months(month_start(now), months_ahead)
+        while month <= last_month:
+            create_partition(cursor, table, month, parent=new)
+            month = add_months(month, 1)
+        cursor.execute(
+            f"CREATE TABLE {quote(table + '_pdefault')} PARTITION OF {quote(new)} DEFAULT"
+        )
+
+        # 3. インデックス（一意インデックスは通常のインデックス＋トリガーにする）
+        cursor.execute(
+            "SELECT i.relname, pg_get_indexdef(i.oid), x.indisunique, "
+            "ARRAY(SELECT a.attname FROM unnest(x.indkey) k "
+            "JOIN pg_attribute a ON a.attrelid = x.indrelid AND a.attnum = k) "
+            "FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid "
+            "WHERE x.indrelid = %s::regclass AND NOT x.indisprimary",
+            [table],
+        )
+        indexes = []
+        unique_indexes = []
+        for number, (name, definition, unique, columns) in enumerate(cursor.fetchall()):
+            temporary = f"{new}_{number}_idx"
+            method = definition.split(" USING ", 1)[1]
+            cursor.execute(
+                f"CREATE INDEX {quote(temporary)} ON {quote(new)} USING {method}"
+            )
+            indexes.append((name, temporary))
+            if unique:
+                unique_indexes.append((name, columns))
+
+        # 4. 外部キー（自分自身への参照は持てないので外す）
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid), confrelid = conrelid "
+            "FROM pg_constraint WHERE contype = 'f' AND conrelid = %s::regclass",
+            [table],
+        )
+        for name, definition, self_reference in cursor.fetchall():
+            if self_reference:
+                log(f"  自己参照の外部キー {name} はDBの制約から外します")
+                continue
+            cursor.execute(
+                f"ALTER TABLE {quote(new)} ADD CONSTRAINT {quote(name)} {definition}"
+            )
+
+        # 5. データをコピーして、IDの採番を引き継ぐ
+        started = time.monotonic()
+        cursor.execute(f"INSERT INTO {quote(new)} SELECT * FROM {quote(table)}")
+        log(f"  {total}行をコピーしました ({time.monotonic() - started:.1f}秒)")
+        cursor.execute(
+            f"SELECT setval('{new}_id_seq', COALESCE((SELECT max(id) FROM {quote(new)}), 0) + 1, false)"
+        )
+
+        # 6. 入れ替え（インデックス名・制約名・シーケンス名は元の名前にそろえる）
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        old_sequence = cursor.fetchone()[0]
+        cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(backup)}")
+        cursor.execute(
+            f"ALTER TABLE {quote(backup)} RENAME CONSTRAINT {quote(table + '_pkey')} "
+            f"TO {quote(backup + '_pkey')}"
+        )
+        for number, (name, temporary) in enumerate(indexes):
+            cursor.execute(
+                f"ALTER INDEX {quote(name)} RENAME TO {quote(f'{backup}_{number}_idx')}"
+            )
+            cursor.execute(f"ALTER INDEX {quote(temporary)} RENAME TO {quote(name)}")
+        if old_sequence:
+            cursor.execute(
+                f"ALTER SEQUENCE {old_sequence} RENAME TO {quote(backup + '_id_seq')}"
+            )
+        cursor.execute(f"ALTER TABLE {quote(new)} RENAME TO {quote(table)}")
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} RENAME CONSTRAINT {quote(new + '_pkey')} "
+            f"TO {quote(table + '_pkey')}"
+        )
+        cursor.execute(
+            f"ALTER SEQUENCE {quote(new + '_id_seq')} RENAME TO {quote(table + '_id_seq')}"
+        )
+        for name, columns in unique_indexes:
+            for sql in _unique_trigger_sql(table, name, columns):
+                cursor.execute(sql)
+            log(f"  一意インデックス {name} はトリガーで一意性を保ちます")
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"ANALYZE {quote(table)}")
+    return total
+
+
+BENCH_SCHEMA = "blog_partition_bench"
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+
+    def pick(q):
+        return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+    return {
+        "p50": pick(0.50) * 1000,
+        "p95": pick(0.95) * 1000,
+        "p99": pick(0.99) * 1000,
+        "mean": statistics.fmean(samples) * 1000,
+    }
+
+
+def benchmark(rows, months, samples, log=print):
+    """
+    専用スキーマに通常のテーブルと月単位のパーティションテーブルを作り、
+    rows行ずつ投入して、1行INSERTと最新20件の読み取りのレイテンシを比べる
+    （Likeと同じ形：user_id・blog_post_id・created_at、(user_id, created_at DESC)のインデックス）
+    """
+    results = {}
+    now = datetime.datetime.now(datetime.timezone.utc)
+    # 投入する行の日時はパーティションを作った範囲（monthsか月前の月初から今まで）に収める
+    first_month = add_months(month_start(now), -months)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+        cursor.execute(f"CREATE SCHEMA {BENCH_SCHEMA}")
+        try:
+            for kind in ("plain", "partitioned"):
+                table = f"{BENCH_SCHEMA}.{kind}"
+                columns = (
+                    "id bigserial, user_id integer NOT NULL, "
+                    "blog_post_id integer NOT NULL, created_at timestamptz NOT NULL"
+                )
+                if kind == "plain":
+                    cursor.execute(
+                        f"CREATE TABLE {table} ({columns}, PRIMARY KEY (id))"
+                    )
+                else:
+                    cursor.execute(
+                        f"CREATE TABLE {table} ({columns}, PRIMARY KEY (id, created_at)) "
+                        f"PARTITION BY RANGE (created_at)"
+                    )
+                    month = first_month
+                    while month <= add_months(month_start(now), 1):
+                        cursor.execute(
+                            f"CREATE TABLE {BENCH_SCHEMA}.p{month:%Y_%m} PARTITION OF {table} "
+                            f"FOR VALUES FROM (%s) TO (%s)",
+                            [month_bound(month), month_bound(add_months(month, 1))],
+                        )
+                        month = add_months(month, 1)
+                    # convert_tableで作るテーブルと同じく範囲外用のDEFAULTも付ける
+                    cursor.execute(
+                        f"CREATE TABLE {BENCH_SCHEMA}.pdefault PARTITION OF {table} DEFAULT"
+                    )
+                cursor.execute(f"CREATE INDEX ON {table} (user_id, created_at DESC)")
+                cursor.execute(f"CREATE INDEX ON {table} (blog_post_id)")
+
+                started = time.monotonic()
+                cursor.execute(
+                    f"INSERT INTO {table} (user_id, blog_post_id, created_at) "
+                    f"SELECT (random() * 100000)::int, (random() * 1000000)::int, "
+                    f"now() - random() * (now() - %s::timestamptz) "
+                    f"FROM generate_series(1, %s)",
+                    [month_bound(first_month), rows],
+                )
+                cursor.execute(f"ANALYZE {table}")
+                log(f"  {kind}: {rows}行を投入 ({time.monotonic() - started:.1f}秒)")
+
+                inserts = []
+                for i in range(samples):
+                    started = time.perf_counter()
+                    cursor.execute(
+                        f"INSERT INTO {table} (user_id, blog_post_id, created_at) "
+                        f"VALUES (%s, %s, now())",
+                        [i % 100000, i],
+                    )
+                    inserts.append(time.perf_counter() - started)
+
+                reads = []
+                for i in range(samples):
+                    started = time.perf_counter()
+                    cursor.execute(
+                        f"SELECT id, blog_post_id FROM {table} WHERE user_id = %s "
+                        f"ORDER BY created_at DESC LIMIT 20",
+                        [(i * 7919) % 100000],
+                    )
+                    cursor.fetchall()
+                    reads.append(time.perf_counter() - started)
+
+                cursor.execute("SELECT pg_total_relation_size(%s::regclass)", [table])
+                size = cursor.fetchone()[0]
+                if kind == "partitioned":
+                    cursor.execute(
+                        "SELECT coalesce(sum(pg_total_relation_size(inhrelid)), 0) "
+                        "FROM pg_inherits WHERE inhparent = %s::regclass",
+                        [table],
+                    )
+                    size = cursor.fetchone()[0]
+                results[kind] = {
+                    "insert": _percentiles(inserts),
+                    "recent_read": _percentiles(reads),
+                    "size": size,
+                }
+        finally:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+    return results
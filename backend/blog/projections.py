@@ -0,0 +1,204 @@
+# blog/projections.py
+
+"""
+読み取り専用の一覧レスポンスを、シリアライザーを通さずに組み立てる
+.values()で必要な列だけを読み、辞書を直接作る（モデル・フィールドのインスタンスを作らない）
+出力はBlogPostListSerializer・FeedPostSerializer・CommentSerializerと同じで、
+blog.testsのProjectionParityTestsとlist_benchmarkコマンドで一致を確認する
+"""
+
+from django.conf import settings
+from rest_framework import serializers
+
+from .images import thumbnail_names
+from .models import BlogPost, Comment, Tag
+
+# 日時はDRFのDateTimeFieldと同じ表現にする（タイムゾーン変換・ISO 8601・UTCは"Z"）
+format_datetime = serializers.DateTimeField().to_representation
+
+POST_LIST_FIELDS = (
+    "id",
+    "title",
+    "description_excerpt",
+    "image",
+    "is_sold_out",
+    "created_at",
+    "updated_at",
+    "is_published",
+    "author_id",
+    "author__username",
+    "author__email",
+    "likes_count",
+)
+COMMENT_FIELDS = (
+    "id",
+    "content",
+    "parent_id",
+    "created_at",
+    "updated_at",
+    "author_id",
+    "author__username",
+    "author__first_name",
+    "author__last_name",
+)
+
+
+def post_list_values(queryset, user, comments_count=False):
+    """
+    記事一覧用の.values()クエリセット（ページネーションにそのまま渡せる）
+    いいね数・いいね済み・コメント数はアノテーションで取る
+    """
+    fields = list(POST_LIST_FIELDS)
+    queryset = queryset.prefetch_related(None).with_likes(user)
+    if user.is_authenticated:
+        fields.append("is_liked")
+    if comments_count:
+        queryset = queryset.with_comments_count()
+        fields.append("comments_count")
+    return queryset.values(*fields)
+
+
+def post_list_data(rows, request, comments_count=False):
+    """post_list_valuesの行から、BlogPostListSerializer（FeedPostSerializer）と同じ辞書を作る"""
+    tags = tags_by_post([row["id"] for row in rows])
+    image_url = _image_url(request)
+    thumbnails = _thumbnail_urls(image_url)
+    authenticated = request is not None and request.user.is_authenticated
+    data = []
+    for row in rows:
+        post = {
+            "id": row["id"],
+            "title": row["title"],
+            "description_excerpt": row["description_excerpt"],
+            "image": image_url(row["image"]),
+            "thumbnails": thumbnails(row["image"]),
+            "author": {
+                "id": row["author_id"],
+                "username": row["author__username"],
+                "email": row["author__email"],
+            },
+            "tags": tags.get(row["id"], []),
+            "is_sold_out": row["is_sold_out"],
+            "likes_count": row["likes_count"],
+            "is_liked": authenticated and row["is_liked"],
+            "created_at": format_datetime(row["created_at"]),
+            "updated_at": format_datetime(row["updated_at"]),
+            "is_published": row["is_published"],
+        }
+        if comments_count:
+            post["comments_count"] = row["comments_count"]
+        data.append(post)
+    return data
+
+
+def tags_by_post(post_ids):
+    """記事ID→タグの辞書のリスト（prefetch_related("tags")と同じ並び順）"""
+    if not post_ids:
+        return {}
+    ordering = [
+        f"-tag__{field[1:]}" if field.startswith("-") else f"tag__{field}"
+        for field in Tag._meta.ordering
+    ]
+    rows = (
+        BlogPost.tags.through.objects.filter(blogpost_id__in=post_ids)
+        .order_by(*ordering)
+        .values_list("blogpost_id", "tag_id", "tag__name", "tag__created_at")
+    )
+    tags = {}
+    result = {}
+    for post_id, tag_id, name, created_at in rows:
+        # 同じタグの辞書は記事間で使い回す
+        if tag_id not in tags:
+            tags[tag_id] = {
+                "id": tag_id,
+                "name": name,
+                "created_at": format_datetime(created_at),
+            }
+        result.setdefault(post_id, []).append(tags[tag_id])
+    return result
+
+
+def comment_list_values(queryset):
+    """コメント一覧用の.values()クエリセット（返信はcomment_list_dataでまとめて読む）"""
+    return queryset.select_related(None).prefetch_related(None).values(*COMMENT_FIELDS)
+
+
+def comment_list_data(rows):
+    """comment_list_valuesの行から、CommentSerializerと同じ辞書を作る"""
+    replies = {}
+    reply_counts = {}
+    reply_rows = (
+        Comment.objects.filter(parent_id__in=[row["id"] for row in rows])
+        .order_by(*Comment._meta.ordering)
+        .values(*COMMENT_FIELDS, "is_active")
+    )
+    for row in reply_rows:
+        # prefetch_related("replies")と同じく、無効な返信も並べる（reply_countは有効なものだけ）
+        replies.setdefault(row["parent_id"], []).append(_comment(row))
+        if row["is_active"]:
+            reply_counts[row["parent_id"]] = reply_counts.get(row["parent_id"], 0) + 1
+
+    data = []
+    for row in rows:
+        comment = _comment(row)
+        data.append(
+            {
+                "id": comment["id"],
+                "content": comment["content"],
+                "author": comment["author"],
+                "parent": row["parent_id"],
+                "replies": replies.get(row["id"], []),
+                "reply_count": reply_counts.get(row["id"], 0),
+                "is_reply": row["parent_id"] is not None,
+                "created_at": comment["created_at"],
+                "updated_at": comment["updated_at"],
+            }
+        )
+    return data
+
+
+def _comment(row):
+    """CommentReplySerializerと同じ辞書"""
+    return {
+        "id": row["id"],
+        "content": row["content"],
+        "author": {
+            "id": row["author_id"],
+            "username": row["author__username"],
+            "first_name": row["author__first_name"],
+            "last_name": row["author__last_name"],
+        },
+        "created_at": format_datetime(row["created_at"]),
+        "updated_at": format_datetime(row["updated_at"]),
+    }
+
+
+def _image_url(request):
+    """ImageFieldのシリアライズと同じURL（リクエストがあれば絶対URL）"""
+    storage = BlogPost._meta.get_field("image").storage
+
+    def image_url(name):
+        if not name:
+            return None
+        url = storage.url(name)
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    return image_url
+
+
+def _thumbnail_urls(image_url):
+    """ThumbnailsMixin.get_thumbnailsと同じ辞書"""
+    sizes = settings.BLOG_THUMBNAIL_SIZES
+    image_format = settings.BLOG_THUMBNAIL_FORMAT
+
+    def thumbnails(name):
+        if not name:
+            return {}
+        return {
+            size: image_url(path)
+            for size, path in thumbnail_names(name, sizes, image_format).items()
+        }
+
+    return thumbnails
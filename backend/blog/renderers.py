@@ -0,0 +1,44 @@
+# blog/renderers.py
+
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import JSONRenderer
+
+
+class CompactJSONRenderer(JSONRenderer):
+    """
+    compact形式のJSON（?format=compact または Accept: application/json; format=compact）
+    記事やコメントは著者・タグをIDで参照し、本体はトップレベルのincludedに一度だけ入れる
+    一覧（配列）は {"results": [...], "included": {...}} の形にする
+    """
+
+    media_type = "application/json; format=compact"
+    format = "compact"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        view = renderer_context.get("view")
+        included = getattr(view, "included", None)
+        if included is not None:
+            representation = included.to_representation(view.get_serializer_context())
+            if isinstance(data, list):
+                data = {"results": data, "included": representation}
+            elif isinstance(data, dict):
+                data = {**data, "included": representation}
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+class CompactContentNegotiation(DefaultContentNegotiation):
+    """
+    ?format=compactならAcceptヘッダーに関係なくcompact形式を選ぶ
+    （media_typeにformat=compactが付くので、通常のネゴシエーションではAcceptにも必要になる）
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        format_query = format_suffix or request.query_params.get(
+            self.settings.URL_FORMAT_OVERRIDE
+        )
+        if format_query == CompactJSONRenderer.format:
+            for renderer in renderers:
+                if isinstance(renderer, CompactJSONRenderer):
+                    return renderer, renderer.media_type
+        return super().select_renderer(request, renderers, format_suffix)
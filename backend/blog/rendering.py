@@ -0,0 +1,75 @@
+# blog/rendering.py
+
+"""
+記事本文（Markdown）のHTML化（Djangoに依存しない：render_descriptionsのワーカーからも使う）
+フロントエンドのreact-markdown + remark-gfmに合わせてCommonMark＋表・打ち消し線で変換し、
+nh3で許可したタグ・属性だけを残す
+"""
+
+import hashlib
+import html
+import re
+
+import nh3
+from markdown_it import MarkdownIt
+
+# 変換方法を変えたら上げる（render_descriptionsで全記事が再変換される）
+RENDERER_VERSION = "1"
+EXCERPT_LENGTH = 150
+
+ALLOWED_TAGS = {
+    "h1", "h2", "h3", "h4", "h5", "h6", "p", "br", "hr",
+    "strong", "em", "del", "s", "code", "pre", "blockquote",
+    "ul", "ol", "li", "a", "img",
+    "table", "thead", "tbody", "tr", "th", "td",
+}
+ALLOWED_ATTRIBUTES = {
+    "a": {"href", "title"},
+    "img": {"src", "alt", "title"},
+    "code": {"class"},
+    "ol": {"start"},
+    "th": {"style"},
+    "td": {"style"},
+}
+ALLOWED_URL_SCHEMES = {"http", "https", "mailto"}
+
+# 生のHTMLは書けない（html=False）ので、タグはエスケープされて本文として表示される
+_markdown = MarkdownIt("commonmark", {"html": False}).enable(["table", "strikethrough"])
+_whitespace = re.compile(r"\s+")
+
+
+def description_hash(description):
+    """本文と変換方法のバージョンから作るハッシュ（変わっていなければ再変換しない）"""
+    return hashlib.sha256(f"{RENDERER_VERSION}:{description}".encode()).hexdigest()
+
+
+def render_markdown(description):
+    """Markdownを安全なHTMLにする（リンクは別タブで開き、rel属性を付ける）"""
+    return nh3.clean(
+        _markdown.render(description),
+        tags=ALLOWED_TAGS,
+        attributes=ALLOWED_ATTRIBUTES,
+        url_schemes=ALLOWED_URL_SCHEMES,
+        link_rel="noopener noreferrer nofollow",
+        set_tag_attribute_values={"a": {"target": "_blank"}},
+    )
+
+
+def make_excerpt(rendered_html, length=EXCERPT_LENGTH):
+    """HTMLからタグを除いたプレーンテキストの抜粋"""
+    text = html.unescape(nh3.clean(rendered_html, tags=set()))
+    text = _whitespace.sub(" ", text).strip()
+    if len(text) > length:
+        text = text[:length].rstrip() + "…"
+    return text
+
+
+def render_description(description):
+    """(HTML, 抜粋, ハッシュ)を返す"""
+    rendered = render_markdown(description)
+    return rendered, make_excerpt(rendered), description_hash(description)
+
+
+def render_batch(items):
+    """[(id, 本文)] → [(id, HTML, 抜粋, ハッシュ)]（プロセスプールのワーカー用）"""
+    return [(post_id, *render_description(description)) for post_id, description in items]
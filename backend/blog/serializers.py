@@ -1,11 +1,48 @@
 # blog/serializers.py
 
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
+from .images import thumbnail_names
 from .models import BlogPost, Tag, Like, Comment
 
 
+class Included:
+    """compact形式でトップレベルのincludedにまとめる関連オブジェクト（種類→ID→オブジェクト）"""
+
+    def __init__(self):
+        self.objects = {}
+
+    def add(self, kind, serializer_class, obj):
+        self.objects.setdefault(kind, {}).setdefault(obj.pk, (serializer_class, obj))
+
+    def to_representation(self, context):
+        """同じオブジェクトは一度だけシリアライズする"""
+        return {
+            kind: {
+                str(pk): serializer_class(obj, context=context).data
+                for pk, (serializer_class, obj) in objects.items()
+            }
+            for kind, objects in self.objects.items()
+        }
+
+
+class IncludedField(serializers.RelatedField):
+    """compact形式用：関連オブジェクトはIDで返し、本体はcontextのincludedに集める"""
+
+    def __init__(self, kind, serializer_class, **kwargs):
+        self.kind = kind
+        self.serializer_class = serializer_class
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        included = self.context.get("included")
+        if included is not None:
+            included.add(self.kind, self.serializer_class, value)
+        return value.pk
+
+
 class UserSerializer(serializers.ModelSerializer):
     """ユーザー情報のシリアライザー"""
 
@@ -56,21 +93,59 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ["created_at"]
 
 
-class BlogPostListSerializer(serializers.ModelSerializer):
+class LikeStateMixin:
+    """いいね数といいね済みかの取得（with_list_dataのアノテーションがあれば使う）"""
+
+    def get_likes_count(self, obj):
+        """いいねの数を取得"""
+        if hasattr(obj, "likes_count"):
+            return obj.likes_count
+        return obj.likes.count()
+
+    def get_is_liked(self, obj):
+        """現在のユーザーがいいねしているかどうかを判定"""
+        request = self.context.get("request")
+        if request and request.user.is_authenticated:
+            if hasattr(obj, "is_liked"):
+                return obj.is_liked
+            return obj.likes.filter(user=request.user).exists()
+        return False
+
+
+class ThumbnailsMixin:
+    """画像のサムネイルのURL（サイズ→URL。アップロード時とreprocess_imagesで作られる）"""
+
+    def get_thumbnails(self, obj):
+        if not obj.image:
+            return {}
+        request = self.context.get("request")
+        names = thumbnail_names(
+            obj.image.name, settings.BLOG_THUMBNAIL_SIZES, settings.BLOG_THUMBNAIL_FORMAT
+        )
+        urls = {}
+        for size, name in names.items():
+            url = obj.image.storage.url(name)
+            urls[size] = request.build_absolute_uri(url) if request is not None else url
+        return urls
+
+
+class BlogPostListSerializer(LikeStateMixin, ThumbnailsMixin, serializers.ModelSerializer):
     """ブログ記事一覧用のシリアライザー（軽量版）"""
 
     author = UserSerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
     likes_count = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
+    thumbnails = serializers.SerializerMethodField()
 
     class Meta:
         model = BlogPost
         fields = [
             "id",
             "title",
-            "description",
+            "description_excerpt",
             "image",
+            "thumbnails",
             "author",
             "tags",
             "is_sold_out",
@@ -81,19 +156,17 @@ class BlogPostListSerializer(serializers.ModelSerializer):
             "is_published",
         ]
 
-    def get_likes_count(self, obj):
-        """いいねの数を取得"""
-        return obj.likes.count()
 
-    def get_is_liked(self, obj):
-        """現在のユーザーがいいねしているかどうかを判定"""
-        request = self.context.get("request")
-        if request and request.user.is_authenticated:
-            return obj.likes.filter(user=request.user).exists()
-        return False
+class FeedPostSerializer(BlogPostListSerializer):
+    """ホームフィード用のシリアライザー（コメント数付き）"""
+
+    comments_count = serializers.IntegerField(read_only=True)
+
+    class Meta(BlogPostListSerializer.Meta):
+        fields = BlogPostListSerializer.Meta.fields + ["comments_count"]
 
 
-class BlogPostDetailSerializer(serializers.ModelSerializer):
+class BlogPostDetailSerializer(LikeStateMixin, ThumbnailsMixin, serializers.ModelSerializer):
     """ブログ記事詳細用のシリアライザー（フル機能版）"""
 
     author = UserSerializer(read_only=True)
@@ -103,6 +176,7 @@ class BlogPostDetailSerializer(serializers.ModelSerializer):
     )
     likes_count = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
+    thumbnails = serializers.SerializerMethodField()
 
     class Meta:
         model = BlogPost
@@ -110,7 +184,10 @@ class BlogPostDetailSerializer(serializers.ModelSerializer):
             "id",
             "title",
             "description",
+            "description_html",
+            "description_excerpt",
             "image",
+            "thumbnails",
             "author",
             "tags",
             "tag_ids",
@@ -124,16 +201,13 @@ class BlogPostDetailSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["created_at", "updated_at", "published_at"]
 
-    def get_likes_count(self, obj):
-        """いいねの数を取得"""
-        return obj.likes.count()
-
-    def get_is_liked(self, obj):
-        """現在のユーザーがいいねしているかどうかを判定"""
+    def validate(self, attrs):
+        """アップロードハンドラーで破棄された画像のエラーを返す"""
         request = self.context.get("request")
-        if request and request.user.is_authenticated:
-            return obj.likes.filter(user=request.user).exists()
-        return False
+        upload_errors = getattr(request, "upload_errors", None)
+        if upload_errors:
+            raise serializers.ValidationError(upload_errors)
+        return attrs
 
     def create(self, validated_data):
         """新規ブログ記事の作成"""
@@ -165,6 +239,25 @@ class BlogPostDetailSerializer(serializers.ModelSerializer):
         return instance
 
 
+class CompactPostFields(serializers.Serializer):
+    """compact形式の記事：著者とタグをIDで参照する"""
+
+    author = IncludedField("users", UserSerializer, read_only=True)
+    tags = IncludedField("tags", TagSerializer, many=True, read_only=True)
+
+
+class CompactBlogPostListSerializer(CompactPostFields, BlogPostListSerializer):
+    pass
+
+
+class CompactFeedPostSerializer(CompactPostFields, FeedPostSerializer):
+    pass
+
+
+class CompactBlogPostDetailSerializer(CompactPostFields, BlogPostDetailSerializer):
+    pass
+
+
 class LikeSerializer(serializers.ModelSerializer):
     """いいねのシリアライザー"""
 
@@ -219,6 +312,28 @@ class CommentSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "created_at", "updated_at"]
 
 
+class CompactCommentReplySerializer(CommentReplySerializer):
+    """compact形式の返信：作成者をIDで参照する"""
+
+    author = IncludedField("users", CommentAuthorSerializer, read_only=True)
+
+
+class CompactCommentSerializer(CommentSerializer):
+    """compact形式のコメント：作成者をIDで参照する"""
+
+    author = IncludedField("users", CommentAuthorSerializer, read_only=True)
+    replies = CompactCommentReplySerializer(many=True, read_only=True)
+
+
+# 通常のシリアライザー→compact形式のシリアライザー
+COMPACT_SERIALIZERS = {
+    BlogPostListSerializer: CompactBlogPostListSerializer,
+    FeedPostSerializer: CompactFeedPostSerializer,
+    BlogPostDetailSerializer: CompactBlogPostDetailSerializer,
+    CommentSerializer: CompactCommentSerializer,
+}
+
+
 class CommentCreateSerializer(serializers.ModelSerializer):
     """コメント作成用シリアライザー"""
 
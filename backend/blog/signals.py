@@ -0,0 +1,138 @@
+# blog/signals.py
+
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import metrics
+from .auth import invalidate_cached_user
+from .events import get_broker
+from .images import render_thumbnails
+from .models import BlogPost, Comment, Like, Tag
+from .tags import invalidate_tag_list
+
+logger = logging.getLogger(__name__)
+
+
+def _publish_on_commit(post_id, event, data):
+    """トランザクション確定後にイベントを発行"""
+    transaction.on_commit(lambda: get_broker().publish(post_id, event, data))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    """コメントの作成・論理削除を通知"""
+    if created:
+        event = "comment_created"
+    elif not instance.is_active:
+        event = "comment_deleted"
+    else:
+        return
+    _publish_on_commit(
+        instance.blog_post_id,
+        event,
+        {"id": instance.id, "parent": instance.parent_id},
+    )
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    """コメントの物理削除を通知"""
+    _publish_on_commit(
+        instance.blog_post_id,
+        "comment_deleted",
+        {"id": instance.id, "parent": instance.parent_id},
+    )
+
+
+def publish_replies_deleted(post_id, parent_id, reply_ids):
+    """update()で論理削除した返信を通知（update()ではpost_saveが送られない）"""
+    for reply_id in reply_ids:
+        _publish_on_commit(
+            post_id, "comment_deleted", {"id": reply_id, "parent": parent_id}
+        )
+
+
+# いいね数は数え直さず増減だけを送る（購読者がいなくてもCOUNTが走るのを避ける）
+@receiver(post_save, sender=Like)
+def like_saved(sender, instance, created, **kwargs):
+    if created:
+        _publish_on_commit(instance.blog_post_id, "likes_changed", {"delta": 1})
+
+
+@receiver(post_delete, sender=Like)
+def like_deleted(sender, instance, **kwargs):
+    _publish_on_commit(instance.blog_post_id, "likes_changed", {"delta": -1})
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, **kwargs):
+    """タグ一覧のキャッシュを破棄"""
+    transaction.on_commit(invalidate_tag_list)
+
+
+@receiver(m2m_changed, sender=BlogPost.tags.through)
+def post_tags_changed(sender, action, **kwargs):
+    """タグごとの記事数（補完の並び順）が変わるのでキャッシュを破棄"""
+    if action in ("post_add", "post_remove", "post_clear"):
+        transaction.on_commit(invalidate_tag_list)
+
+
+@receiver(post_save, sender=BlogPost)
+def post_saved(sender, created, update_fields, **kwargs):
+    """公開状態が変わると補完の記事数が変わる（作成時はタグ付けの通知で破棄される）"""
+    if not created and (update_fields is None or "is_published" in update_fields):
+        transaction.on_commit(invalidate_tag_list)
+
+
+@receiver(post_delete, sender=BlogPost)
+def post_deleted(sender, **kwargs):
+    transaction.on_commit(invalidate_tag_list)
+
+
+# 古い画像の参照はdjango_cleanupが確定後に外す（ContentAddressedStorage.delete）
+@receiver(pre_save, sender=BlogPost)
+def post_image_uploading(sender, instance, **kwargs):
+    """まだ保存されていない（アップロードされたばかりの）画像かを覚えておく"""
+    instance.image_uploaded = bool(instance.image) and not instance.image._committed
+
+
+@receiver(post_save, sender=BlogPost)
+def post_image_saved(sender, instance, **kwargs):
+    """アップロードされた画像のサムネイルを確定後に作る"""
+    if getattr(instance, "image_uploaded", False):
+        instance.image_uploaded = False
+        name = instance.image.name
+        transaction.on_commit(lambda: _render_thumbnails(name))
+
+
+def _render_thumbnails(name):
+    """アップロードされた画像のサムネイルを作る（失敗してもreprocess_imagesで作り直せる）"""
+    try:
+        _, elapsed = render_thumbnails(
+            settings.MEDIA_ROOT,
+            name,
+            [tuple(size) for size in settings.BLOG_THUMBNAIL_SIZES],
+            settings.BLOG_THUMBNAIL_FORMAT,
+            settings.BLOG_THUMBNAIL_QUALITY,
+        )
+    except Exception:
+        logger.exception("サムネイルを作れませんでした: %s", name)
+        return
+    metrics.IMAGE_PROCESSING.observe(elapsed, operation="thumbnails")
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def user_changed(sender, instance, **kwargs):
+    """
+    キャッシュしたユーザー（CachedModelBackend）を破棄
+    確定前に他のリクエストが古い行をキャッシュし直すことがあるので、確定後にも破棄する
+    """
+    invalidate_cached_user(instance.pk)
+    transaction.on_commit(lambda: invalidate_cached_user(instance.pk))
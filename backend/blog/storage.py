@@ -0,0 +1,132 @@
+# blog/storage.py
+
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+from . import metrics
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    内容のハッシュをファイル名にするストレージ
+    同じ画像は一度だけ保存し、ImageBlobで参照数を管理する
+    削除は参照数を減らすだけで、0になったときに実体を消す
+    """
+
+    hash_algorithm = "sha256"
+
+    def get_available_name(self, name, max_length=None):
+        # 実際の名前は_saveで内容から決まるので、空き名の探索は不要
+        return name
+
+    def _save(self, name, content):
+        from .models import ImageBlob
+
+        temp_path, name, size = self.write_temp(name, content)
+        try:
+            with transaction.atomic():
+                blob, created = ImageBlob.objects.select_for_update().get_or_create(
+                    name=name, defaults={"size": size}
+                )
+                self.place(temp_path, name)
+                ImageBlob.objects.filter(pk=blob.pk).update(
+                    ref_count=F("ref_count") + 1
+                )
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return name
+
+    def write_temp(self, name, content):
+        """
+        一時ファイルへ書き出しながらハッシュを計算し、(一時ファイル, 保存名, サイズ)を返す
+        DBには触れないのでスレッドから呼べる（参照の登録はplace/add_referencesで行う）
+        """
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        full_directory = self.path(directory)
+        os.makedirs(full_directory, exist_ok=True)
+
+        digest = hashlib.new(self.hash_algorithm)
+        size = 0
+        temp = tempfile.NamedTemporaryFile(
+            dir=full_directory, prefix=".upload-", delete=False
+        )
+        try:
+            with temp, metrics.IMAGE_PROCESSING.time(operation="store"):
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            os.remove(temp.name)
+            raise
+        hexdigest = digest.hexdigest()
+        name = f"{directory}/{hexdigest[:2]}/{hexdigest}{extension}".lstrip("/")
+        return temp.name, name, size
+
+    def place(self, temp_path, name):
+        """
+        一時ファイルを保存名へ移す（同じ内容が保存済みなら何もしない）
+        ImageBlobの行ロック中に呼ぶこと（deleteによる実体の削除と競合しないように）
+        """
+        full_path = self.path(name)
+        if not os.path.exists(full_path):
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            os.chmod(temp_path, self.file_permissions_mode or 0o644)
+            os.replace(temp_path, full_path)
+
+    def add_references(self, files):
+        """
+        write_tempで書き出したファイルをまとめて登録し、参照数を増やす（一括取り込み用）
+        files: {保存名: (一時ファイル, サイズ, 参照数)}
+        呼び出し側のトランザクション内で実行すること
+        """
+        from .models import ImageBlob
+
+        if not files:
+            return
+        ImageBlob.objects.bulk_create(
+            [ImageBlob(name=name, size=size) for name, (_, size, _) in files.items()],
+            ignore_conflicts=True,
+        )
+        # 名前順にロックしてデッドロックを避ける
+        list(
+            ImageBlob.objects.select_for_update()
+            .filter(name__in=files)
+            .order_by("name")
+            .values_list("pk", flat=True)
+        )
+        by_count = {}
+        for name, (temp_path, _, count) in files.items():
+            self.place(temp_path, name)
+            by_count.setdefault(count, []).append(name)
+        for count, names in by_count.items():
+            ImageBlob.objects.filter(name__in=names).update(
+                ref_count=F("ref_count") + count
+            )
+
+    def delete(self, name):
+        """参照を1つ減らし、参照がなくなったら実体を削除"""
+        from .models import ImageBlob
+
+        if not name:
+            raise ValueError("The name must be given to delete().")
+        with transaction.atomic():
+            blob = ImageBlob.objects.select_for_update().filter(name=name).first()
+            if blob is not None and blob.ref_count > 1:
+                ImageBlob.objects.filter(pk=blob.pk).update(
+                    ref_count=F("ref_count") - 1
+                )
+                return
+            if blob is not None:
+                blob.delete()
+            # 参照管理外のファイル（導入前のアップロード）はそのまま削除
+            super().delete(name)
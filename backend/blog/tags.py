@@ -0,0 +1,125 @@
+# blog/tags.py
+
+import bisect
+import hashlib
+import heapq
+import json
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Q
+
+from .models import Tag
+from .serializers import TagSerializer
+
+# 現在のタグ一覧のバージョン（Tagや記事のタグ付けが変わったら新しくする）
+# TAG_VERSION_CACHE_TIMEOUT秒で期限切れになり、その後は新しいバージョンで読み直す
+TAG_VERSION_CACHE_KEY = "blog:tags:version"
+# バージョンごとのタグ一覧（古いバージョンはタイムアウトで消える）
+TAG_LIST_CACHE_KEY = "blog:tags:{version}"
+TAG_LIST_CACHE_TIMEOUT = 60 * 60
+
+# プロセス内のカタログ（バージョンが変わったときだけ作り直す）
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+class TagCatalog:
+    """
+    あるバージョンのタグ一覧と、前方一致の補完用インデックス
+    補完用には小文字のタグ名でソートした配列を持ち、二分探索で範囲を求める
+    """
+
+    def __init__(self, version, tags, post_counts):
+        self.version = version
+        self.tags = tags
+        # ETagはタグ一覧の内容から作る（記事数だけが変わっても一覧のETagは変わらない）
+        body = json.dumps(tags, cls=DjangoJSONEncoder, sort_keys=True)
+        self.etag = '"%s"' % hashlib.sha256(body.encode()).hexdigest()[:32]
+
+        entries = sorted(
+            (tag["name"].lower(), tag["id"], tag["name"], post_counts.get(tag["id"], 0))
+            for tag in tags
+        )
+        self.keys = [entry[0] for entry in entries]
+        self.entries = entries
+
+    def complete(self, prefix, limit):
+        """prefixで始まるタグを記事数の多い順に最大limit件返す"""
+        prefix = prefix.lower()
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + "\U0010ffff", lo=start)
+        top = heapq.nsmallest(
+            limit, self.entries[start:end], key=lambda entry: (-entry[3], entry[0])
+        )
+        return [
+            {"id": tag_id, "name": name, "post_count": post_count}
+            for _, tag_id, name, post_count in top
+        ]
+
+    def search(self, search):
+        """SearchFilterと同じく、空白区切りの各語を名前に含むタグを返す"""
+        terms = [term.lower() for term in search.replace(",", " ").split()]
+        return [
+            tag
+            for tag in self.tags
+            if all(term in tag["name"].lower() for term in terms)
+        ]
+
+
+def get_tag_version():
+    version = cache.get(TAG_VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(
+            TAG_VERSION_CACHE_KEY, uuid.uuid4().hex, settings.TAG_VERSION_CACHE_TIMEOUT
+        )
+        version = cache.get(TAG_VERSION_CACHE_KEY)
+    return version
+
+
+def load_tag_data():
+    """DBからタグ一覧（シリアライズ済み）とタグごとの公開記事数を読み込む"""
+    tags = Tag.objects.annotate(
+        post_count=Count("blog_posts", filter=Q(blog_posts__is_published=True))
+    )
+    data = [dict(tag) for tag in TagSerializer(tags, many=True).data]
+    post_counts = {tag.id: tag.post_count for tag in tags}
+    return data, post_counts
+
+
+def get_tag_catalog():
+    """現在のバージョンのタグカタログを取得"""
+    global _catalog
+    version = get_tag_version()
+    catalog = _catalog
+    if catalog is not None and catalog.version == version:
+        return catalog
+
+    with _catalog_lock:
+        if _catalog is not None and _catalog.version == version:
+            return _catalog
+        key = TAG_LIST_CACHE_KEY.format(version=version)
+        cached = cache.get(key)
+        if cached is None:
+            cached = load_tag_data()
+            cache.set(key, cached, TAG_LIST_CACHE_TIMEOUT)
+        _catalog = TagCatalog(version, *cached)
+        return _catalog
+
+
+def get_tag_list():
+    """シリアライズ済みのタグ一覧をキャッシュから取得"""
+    return get_tag_catalog().tags
+
+
+def invalidate_tag_list():
+    """
+    新しいバージョンにして、全プロセスのカタログを作り直させる
+    他のワーカーに即時に伝わるのはキャッシュが共有の場合だけ（LocMemCacheでは期限切れまで遅れる）
+    """
+    cache.set(
+        TAG_VERSION_CACHE_KEY, uuid.uuid4().hex, settings.TAG_VERSION_CACHE_TIMEOUT
+    )
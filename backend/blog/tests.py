@@ -1,3 +1,589 @@
-from django.test import TestCase
+# blog/tests.py
 
-# Create your tests here.
+import io
+import shutil
+import tempfile
+import threading
+from importlib import import_module
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import override_settings
+from PIL import Image
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from . import auth
+from .images import thumbnail_name
+from .models import BlogPost, Comment, Like, ImageBlob, Tag
+from .throttling import IPWriteThrottle, SlidingWindowThrottle
+
+
+@override_settings(QUERY_INSPECTOR_ENABLED=True, QUERY_INSPECTOR_RAISE=True)
+class BlogTestCase(APITestCase):
+    """クエリ予算の超過とN+1をQueryBudgetExceededにする（blog.middleware）"""
+
+
+class ProjectionParityTests(BlogTestCase):
+    """
+    blog.projectionsで組み立てた一覧（FAST_LIST_RESPONSES=True）が、
+    シリアライザーで作った一覧と1バイトも違わないことを確認する
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(
+            "alice", "alice@example.com", "password", first_name="Alice", last_name="A"
+        )
+        cls.bob = User.objects.create_user("bob", "bob@example.com", "password")
+        python = Tag.objects.create(name="Python")
+        django = Tag.objects.create(name="Django")
+        Tag.objects.create(name="未使用")
+
+        cls.posts = []
+        for i in range(12):
+            post = BlogPost.objects.create(
+                author=cls.alice if i % 2 else cls.bob,
+                title=f"記事 {i}",
+                description=f"# 見出し{i}\n\n**本文**です。<script>alert(1)</script>",
+                is_sold_out=i % 3 == 0,
+            )
+            if i % 2:
+                post.tags.add(python)
+            if i % 4 == 0:
+                post.tags.add(python, django)
+            cls.posts.append(post)
+        # 画像あり（URLの組み立てを比べる。ファイルは読まない）
+        BlogPost.objects.filter(pk=cls.posts[-1].pk).update(image="posts/sample.jpg")
+        # 下書き（alice本人にだけ見える）
+        BlogPost.objects.create(
+            author=cls.alice,
+            title="下書き",
+            description="下書きです",
+            is_published=False,
+        )
+
+        for post in cls.posts[:5]:
+            Like.objects.create(user=cls.alice, blog_post=post)
+        for post in cls.posts[3:7]:
+            Like.objects.create(user=cls.bob, blog_post=post)
+
+        cls.thread = cls.posts[1]
+        for i in range(3):
+            parent = Comment.objects.create(
+                blog_post=cls.thread, author=cls.bob, content=f"コメント{i}"
+            )
+            for j in range(i + 1):
+                Comment.objects.create(
+                    blog_post=cls.thread,
+                    author=cls.alice,
+                    parent=parent,
+                    content=f"返信{i}-{j}",
+                    # 無効な返信も並ぶが、reply_countには数えない
+                    is_active=j != 1,
+                )
+        Comment.objects.create(
+            blog_post=cls.thread, author=cls.bob, content="削除済み", is_active=False
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def assertSameResponse(self, url, user=None):
+        self.client.force_authenticate(user)
+        responses = []
+        for fast in (False, True):
+            with override_settings(FAST_LIST_RESPONSES=fast):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            responses.append(response.content)
+        self.assertEqual(responses[0], responses[1], url)
+        return responses[0]
+
+    def test_post_list(self):
+        for url in (
+            "/api/posts/",
+            "/api/posts/?page=2",
+            "/api/posts/?ordering=updated_at",
+            "/api/posts/?tag=Python",
+            "/api/posts/?search=記事",
+            "/api/posts/?available=true",
+        ):
+            with self.subTest(url=url):
+                self.assertSameResponse(url)
+                self.assertSameResponse(url, self.alice)
+
+    def test_post_list_includes_likes_and_tags(self):
+        content = self.assertSameResponse("/api/posts/", self.alice).decode()
+        self.assertIn('"is_liked":true', content)
+        self.assertIn('"name":"Django"', content)
+        self.assertIn("/media/posts/sample.jpg", content)
+
+    def test_feed(self):
+        self.assertSameResponse("/api/feed/")
+        content = self.assertSameResponse("/api/feed/", self.alice).decode()
+        self.assertIn("下書き", content)
+
+    def test_comments(self):
+        url = f"/api/posts/{self.thread.pk}/comments/"
+        content = self.assertSameResponse(url).decode()
+        self.assertIn("返信2-2", content)
+        self.assertNotIn("削除済み", content)
+        self.assertSameResponse(url, self.alice)
+
+
+class WriteThrottleTests(BlogTestCase):
+    """書き込みのスライディングウィンドウ制限（blog.throttling）"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("carol", "carol@example.com", "password")
+        cls.post = BlogPost.objects.create(
+            author=cls.user, title="記事", description="本文です"
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def post_comment(self, **extra):
+        return self.client.post(
+            f"/api/posts/{self.post.pk}/comments/",
+            {"content": "コメントです"},
+            format="json",
+            **extra,
+        )
+
+    def test_anonymous_comments_are_limited_per_ip(self):
+        for _ in range(10):
+            self.assertEqual(self.post_comment().status_code, 201)
+        response = self.post_comment()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+        # 読み取りは数えない
+        self.assertEqual(
+            self.client.get(f"/api/posts/{self.post.pk}/comments/").status_code, 200
+        )
+
+    def test_spoofed_forwarded_for_does_not_reset_the_limit(self):
+        statuses = [
+            self.post_comment(HTTP_X_FORWARDED_FOR=f"203.0.113.{i}").status_code
+            for i in range(11)
+        ]
+        self.assertEqual(statuses[:10], [201] * 10)
+        self.assertEqual(statuses[10], 429)
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "NUM_PROXIES": 1})
+    def test_forwarded_for_is_used_behind_a_proxy(self):
+        for _ in range(10):
+            self.post_comment(HTTP_X_FORWARDED_FOR="203.0.113.1")
+        self.assertEqual(
+            self.post_comment(HTTP_X_FORWARDED_FOR="203.0.113.1").status_code, 429
+        )
+        self.assertEqual(
+            self.post_comment(HTTP_X_FORWARDED_FOR="203.0.113.2").status_code, 201
+        )
+
+    def test_concurrent_requests_do_not_exceed_the_limit(self):
+        # 制限N回に対してN+1件を同時に送り、通るのはちょうどN件
+        limit = 10
+        request = APIRequestFactory().post("/", REMOTE_ADDR="198.51.100.7")
+        barrier = threading.Barrier(limit + 1)
+        results = []
+
+        def attempt():
+            throttle = IPWriteThrottle()
+            barrier.wait()
+            results.append(throttle.allow_request(request, None))
+
+        rates = {"write_ip": f"{limit}/min"}
+        # 窓の境目をまたがないよう時刻を固定する（窓の先頭なので直前の窓は数えない）
+        with mock.patch.object(
+            SlidingWindowThrottle, "THROTTLE_RATES", rates
+        ), mock.patch.object(SlidingWindowThrottle, "timer", lambda self: 6000.0):
+            threads = [threading.Thread(target=attempt) for _ in range(limit + 1)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(results.count(True), limit)
+            # 断った1回は数えない（取り消した）ので、次も断られるだけ
+            self.assertFalse(IPWriteThrottle().allow_request(request, None))
+            key = IPWriteThrottle().get_cache_key(request, None)
+            self.assertEqual(cache.get(f"{key}:100"), limit)
+
+    def test_rejected_writes_do_not_use_other_limits(self):
+        rates = {"write_user": "30/min", "write_anon": "2/min", "write_ip": "3/min"}
+        with mock.patch.object(SlidingWindowThrottle, "THROTTLE_RATES", rates):
+            statuses = [self.post_comment().status_code for _ in range(4)]
+            self.assertEqual(statuses, [201, 201, 429, 429])
+            # 匿名の制限で断られた2回はIPの制限に数えない（IPの残りは1回）
+            self.client.force_authenticate(self.user)
+            self.assertEqual(self.post_comment().status_code, 201)
+            self.assertEqual(self.post_comment().status_code, 429)
+
+
+class BulkEndpointTests(BlogTestCase):
+    """posts/bulk/（まとめて取得）とposts/sold_out/（販売状況の一括変更）"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user("dave", "dave@example.com", "password")
+        cls.other = User.objects.create_user("erin", "erin@example.com", "password")
+        cls.posts = [
+            BlogPost.objects.create(
+                author=cls.owner, title=f"記事{i}", description="本文"
+            )
+            for i in range(4)
+        ]
+        cls.others_post = BlogPost.objects.create(
+            author=cls.other, title="他人の記事", description="本文"
+        )
+        cls.others_draft = BlogPost.objects.create(
+            author=cls.other,
+            title="他人の下書き",
+            description="本文",
+            is_published=False,
+        )
+
+    def test_bulk_returns_visible_posts_in_requested_order(self):
+        ids = [self.posts[2].pk, self.others_draft.pk, self.posts[0].pk, 999999]
+        response = self.client.get(f"/api/posts/bulk/?ids={','.join(map(str, ids))}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [post["id"] for post in response.data], [self.posts[2].pk, self.posts[0].pk]
+        )
+
+    def test_bulk_rejects_invalid_ids(self):
+        too_many = ",".join(str(i) for i in range(1, 202))
+        for query in ("", "?ids=", "?ids=1,a", f"?ids={too_many}"):
+            with self.subTest(query=query):
+                self.assertEqual(
+                    self.client.get(f"/api/posts/bulk/{query}").status_code, 400
+                )
+        # 重複を除いて200件ちょうどは通る
+        ids = ",".join(str(i) for i in [*range(1, 201), 1])
+        self.assertEqual(
+            self.client.get(f"/api/posts/bulk/?ids={ids}").status_code, 200
+        )
+
+    def sold_out(self, ids, is_sold_out=True, user=None):
+        self.client.force_authenticate(user or self.owner)
+        return self.client.post(
+            "/api/posts/sold_out/",
+            {"ids": ids, "is_sold_out": is_sold_out},
+            format="json",
+        )
+
+    def test_sold_out_updates_only_own_changed_posts(self):
+        BlogPost.objects.filter(pk=self.posts[1].pk).update(is_sold_out=True)
+        ids = [post.pk for post in self.posts] + [self.others_post.pk]
+        response = self.sold_out(ids)
+        self.assertEqual(response.status_code, 200)
+        # すでに売り切れの記事と他人の記事は返らない
+        self.assertEqual(
+            response.data["updated"],
+            sorted([self.posts[0].pk, self.posts[2].pk, self.posts[3].pk]),
+        )
+        self.assertTrue(
+            all(
+                BlogPost.objects.filter(pk__in=[p.pk for p in self.posts]).values_list(
+                    "is_sold_out", flat=True
+                )
+            )
+        )
+        self.others_post.refresh_from_db()
+        self.assertFalse(self.others_post.is_sold_out)
+
+        response = self.sold_out(ids, False)
+        self.assertEqual(
+            response.data["updated"], sorted(post.pk for post in self.posts)
+        )
+
+    def test_sold_out_validation(self):
+        self.assertEqual(self.sold_out(list(range(1, 202))).status_code, 400)
+        self.assertEqual(self.sold_out([]).status_code, 400)
+        self.assertEqual(self.sold_out(["1"]).status_code, 400)
+        self.assertEqual(self.sold_out([True]).status_code, 400)
+        self.assertEqual(self.sold_out([self.posts[0].pk], "true").status_code, 400)
+        self.client.force_authenticate(None)
+        response = self.client.post(
+            "/api/posts/sold_out/",
+            {"ids": [self.posts[0].pk], "is_sold_out": True},
+            format="json",
+        )
+        self.assertIn(response.status_code, (401, 403))
+
+    def test_set_sold_out_respects_queryset_filters(self):
+        ids = [post.pk for post in self.posts]
+        updated = BlogPost.objects.filter(pk__in=ids[:2]).set_sold_out(
+            self.owner, ids, True
+        )
+        self.assertEqual(updated, sorted(ids[:2]))
+        self.assertEqual(
+            BlogPost.objects.filter(pk__in=ids, is_sold_out=True).count(), 2
+        )
+
+    def test_set_sold_out_without_returning(self):
+        ids = [post.pk for post in self.posts]
+        features = connection.features
+        with mock.patch.object(features, "can_return_columns_from_insert", False):
+            updated = BlogPost.objects.set_sold_out(self.owner, ids, True)
+            self.assertEqual(updated, sorted(ids))
+            self.assertEqual(BlogPost.objects.set_sold_out(self.owner, ids, True), [])
+
+
+class ImageReferenceTests(BlogTestCase):
+    """記事画像の参照数（ContentAddressedStorage・ImageBlob）とサムネイル"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("frank", "frank@example.com", "password")
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.storage = BlogPost._meta.get_field("image").storage
+
+    def upload(self, color):
+        buffer = io.BytesIO()
+        Image.new("RGB", (1200, 900), color).save(buffer, format="PNG")
+        return SimpleUploadedFile(
+            "photo.png", buffer.getvalue(), content_type="image/png"
+        )
+
+    def create_post(self, image):
+        return BlogPost.objects.create(
+            author=self.user, title="画像つき", description="本文", image=image
+        )
+
+    def ref_count(self, name):
+        blob = ImageBlob.objects.filter(name=name).first()
+        return blob.ref_count if blob else 0
+
+    def test_replace_and_delete_release_references(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.create_post(self.upload("red"))
+            second = self.create_post(self.upload("red"))
+        name = first.image.name
+        # 同じ内容は1つのファイルを共有する
+        self.assertEqual(second.image.name, name)
+        self.assertEqual(self.ref_count(name), 2)
+        self.assertTrue(self.storage.exists(name))
+
+        post = BlogPost.objects.get(pk=first.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            post.image = self.upload("blue")
+            post.save()
+        self.assertEqual(self.ref_count(name), 1)
+        self.assertEqual(self.ref_count(post.image.name), 1)
+        self.assertTrue(self.storage.exists(name))
+
+        # タイトルだけの変更では参照数は変わらない
+        post = BlogPost.objects.get(pk=first.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            post.title = "タイトル変更"
+            post.save()
+        self.assertEqual(self.ref_count(post.image.name), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            BlogPost.objects.filter(pk=second.pk).delete()
+        self.assertEqual(self.ref_count(name), 0)
+        self.assertFalse(self.storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post.delete()
+        self.assertEqual(self.ref_count(post.image.name), 0)
+        self.assertFalse(self.storage.exists(post.image.name))
+
+    def test_references_are_kept_until_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = self.create_post(self.upload("green"))
+        name = post.image.name
+        # 確定前（ロールバックされうる間）は古い画像を消さない
+        with self.captureOnCommitCallbacks() as callbacks:
+            post.delete()
+        self.assertEqual(self.ref_count(name), 1)
+        self.assertTrue(self.storage.exists(name))
+        for callback in callbacks:
+            callback()
+        self.assertFalse(self.storage.exists(name))
+
+    def test_thumbnails_are_rendered_and_exposed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = self.create_post(self.upload("red"))
+        for size in settings.BLOG_THUMBNAIL_SIZES:
+            path = thumbnail_name(post.image.name, size, settings.BLOG_THUMBNAIL_FORMAT)
+            self.assertTrue(self.storage.exists(path), path)
+
+        response = self.client.get(f"/api/posts/{post.pk}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted(response.data["thumbnails"]),
+            sorted(
+                f"{width}x{height}" for width, height in settings.BLOG_THUMBNAIL_SIZES
+            ),
+        )
+        self.assertTrue(response.data["thumbnails"]["400x400"].endswith(".webp"))
+        for fast in (False, True):
+            with override_settings(FAST_LIST_RESPONSES=fast):
+                listed = self.client.get("/api/posts/").data["results"][0]
+            self.assertEqual(listed["thumbnails"], response.data["thumbnails"])
+
+
+class LikedPostsTests(BlogTestCase):
+    """posts/liked_posts/（いいねした記事の一覧）"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("grace", "grace@example.com", "password")
+        cls.other = User.objects.create_user("heidi", "heidi@example.com", "password")
+        cls.posts = [
+            BlogPost.objects.create(
+                author=cls.other, title=f"記事{i}", description="本文"
+            )
+            for i in range(3)
+        ]
+        cls.own_draft = BlogPost.objects.create(
+            author=cls.user,
+            title="自分の下書き",
+            description="本文",
+            is_published=False,
+        )
+        for post in [*cls.posts, cls.own_draft]:
+            Like.objects.create(user=cls.user, blog_post=post)
+
+    def test_count_matches_visible_posts(self):
+        # いいねした後で非公開になった他人の記事は数えない
+        BlogPost.objects.filter(pk=self.posts[1].pk).update(is_published=False)
+        self.client.force_authenticate(self.user)
+        response = self.client.get("/api/posts/liked_posts/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 3)
+        self.assertEqual(
+            [post["id"] for post in response.data["results"]],
+            [self.own_draft.pk, self.posts[2].pk, self.posts[0].pk],
+        )
+
+
+class SessionEngineTests(BlogTestCase):
+    """ログアウト（flush）したセッションが他のワーカーで使えないこと"""
+
+    def session(self, engine, worker_cache, session_key=None):
+        store = import_module(engine).SessionStore(session_key)
+        # cached_dbはワーカーごとのキャッシュを使う
+        if hasattr(store, "_cache"):
+            store._cache = worker_cache
+        return store
+
+    def assert_flush_is_shared(self, engine, first, second):
+        login = self.session(engine, first)
+        login["_auth_user_id"] = "1"
+        login.save()
+        key = login.session_key
+        # もう1つのワーカーが読み込む（cached_dbならそのワーカーのキャッシュに載る）
+        self.assertEqual(self.session(engine, second, key)["_auth_user_id"], "1")
+
+        self.session(engine, first, key).flush()
+        self.assertNotIn("_auth_user_id", self.session(engine, second, key).load())
+
+    def test_flushed_session_is_rejected_by_other_workers(self):
+        workers = [LocMemCache(f"session-worker-{i}", {}) for i in range(2)]
+        self.assert_flush_is_shared(settings.SESSION_ENGINE, *workers)
+
+    def test_cached_sessions_need_a_shared_cache(self):
+        if not settings.REDIS_URL:
+            self.assertEqual(
+                settings.SESSION_ENGINE, "django.contrib.sessions.backends.db"
+            )
+        shared = LocMemCache("session-shared", {})
+        self.assert_flush_is_shared(
+            "django.contrib.sessions.backends.cached_db", shared, shared
+        )
+
+
+class SignedTokenTests(BlogTestCase):
+    """Authorization: Bearer の署名付きトークン（blog.auth）"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("ivan", "ivan@example.com", "password")
+
+    def setUp(self):
+        cache.clear()
+
+    def current_user(self, token):
+        return self.client.get("/api/auth/user/", HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def assertRejected(self, response, detail):
+        # 先頭のSessionAuthenticationがWWW-Authenticateを返さないので403になる
+        self.assertIn(response.status_code, (401, 403))
+        self.assertEqual(response.data["detail"], detail)
+
+    def test_token_from_login(self):
+        response = self.client.post(
+            "/api/auth/login/",
+            {"username": "ivan", "password": "password"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        # セッションCookieではなくトークンで認証させる
+        self.client.cookies.clear()
+        token = response.data["token"]
+        response = self.current_user(token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["username"], "ivan")
+
+    def test_expired_token_is_rejected(self):
+        token, expires_at = auth.issue_token(self.user)
+        with mock.patch.object(auth.time, "time", return_value=expires_at - 1):
+            self.assertEqual(self.current_user(token).status_code, 200)
+        with mock.patch.object(auth.time, "time", return_value=expires_at):
+            response = self.current_user(token)
+        self.assertRejected(response, "トークンの有効期限が切れています")
+
+    def test_tampered_token_is_rejected(self):
+        token, _ = auth.issue_token(self.user)
+        other, _ = auth.issue_token(User.objects.create_user("judy", password="x"))
+        payload, signature = token.rsplit(":", 1)
+        tampered = [
+            payload + ":" + signature[:-1] + ("A" if signature[-1] != "A" else "B"),
+            # 別のユーザーのクレームに署名だけ付け替える
+            other.rsplit(":", 1)[0] + ":" + signature,
+            "not-a-token",
+        ]
+        for value in tampered:
+            with self.subTest(token=value):
+                self.assertRejected(self.current_user(value), "トークンが不正です")
+
+    def test_logout_revokes_token(self):
+        token, _ = auth.issue_token(self.user)
+        response = self.client.post(
+            "/api/auth/logout/", HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertRejected(self.current_user(token), "トークンは失効しています")
+        # 他のトークンは使える
+        self.assertEqual(
+            self.current_user(auth.issue_token(self.user)[0]).status_code, 200
+        )
+
+    def test_inactive_user_is_rejected(self):
+        token, _ = auth.issue_token(self.user)
+        self.assertEqual(self.current_user(token).status_code, 200)
+        # キャッシュしたユーザーは保存時に破棄される
+        self.user.is_active = False
+        self.user.save()
+        self.assertRejected(self.current_user(token), "ユーザーが無効です")
+
+    def test_password_change_invalidates_token(self):
+        token, _ = auth.issue_token(self.user)
+        self.user.set_password("new-password")
+        self.user.save()
+        self.assertRejected(self.current_user(token), "トークンは失効しています")
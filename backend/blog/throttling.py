@@ -0,0 +1,136 @@
+# blog/throttling.py
+
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle, SimpleRateThrottle
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """
+    スライディングウィンドウで書き込みの頻度を制限する（読み取りは数えない）
+    直前の窓の回数を経過した割合で按分して今の窓の回数に足し、制限と比べる
+    DRF標準のように時刻の列を保存せず、キーごとに整数2つをincrで数えるので、
+    Redisなどの共有キャッシュでもワーカー間で原子的に数えられる
+    先に数えてからincrの戻り値で判定し、断るときは数えた1回をdecrで取り消す
+    （読んでから数えると、同時のリクエストが同じ回数を読んで制限を超えて通る）
+    レートはREST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]のscopeで指定する
+    """
+
+    counted_key = None
+
+    def allow_request(self, request, view):
+        if request.method in SAFE_METHODS or self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        now = self.timer()
+        window, elapsed = divmod(now, self.duration)
+        progress = elapsed / self.duration
+        current_key = f"{self.key}:{int(window)}"
+        previous_key = f"{self.key}:{int(window) - 1}"
+        current = self.increment(current_key)
+        self.counted_key = current_key
+        previous = self.cache.get(previous_key, 0)
+
+        if previous * (1 - progress) + current > self.num_requests:
+            self.rollback()
+            self.wait_seconds = self.compute_wait(previous, current - 1, progress)
+            return False
+        return True
+
+    def increment(self, key):
+        """keyの回数を1増やして増やした後の回数を返す"""
+        # 次の窓で「直前の窓」として読むので、2窓分残す
+        timeout = self.duration * 2
+        while True:
+            if self.cache.add(key, 1, timeout):
+                return 1
+            try:
+                return self.cache.incr(key)
+            except ValueError:
+                # addとincrの間に期限切れになった：addからやり直す
+                continue
+
+    def rollback(self):
+        """数えた1回を取り消す（断ったとき・他の制限で断られたとき）"""
+        if self.counted_key is None:
+            return
+        try:
+            self.cache.decr(self.counted_key)
+        except ValueError:
+            # 期限切れで既に消えている
+            pass
+        self.counted_key = None
+
+    def compute_wait(self, previous, current, progress):
+        """もう1回許可されるまでの秒数（直前の窓の按分が減るのを待つ）"""
+        allowed = self.num_requests - 1 - current
+        if allowed < 0 or not previous:
+            # 今の窓だけで使い切っている：今の窓が直前の窓になるまで待つ
+            return (1 - progress) * self.duration
+        return max((1 - allowed / previous - progress) * self.duration, 0)
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class UserWriteThrottle(SlidingWindowThrottle):
+    """ログインユーザーごとの制限"""
+
+    scope = "write_user"
+
+    def get_cache_key(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return None
+        return self.cache_format % {"scope": self.scope, "ident": request.user.pk}
+
+
+class AnonWriteThrottle(SlidingWindowThrottle):
+    """未ログインの書き込み（匿名コメント）のIPごとの制限（ユーザーより厳しくする）"""
+
+    scope = "write_anon"
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return self.cache_format % {"scope": self.scope, "ident": self.get_ident(request)}
+
+
+class IPWriteThrottle(SlidingWindowThrottle):
+    """
+    ログインの有無を問わないIPごとの制限
+    1つのIPから複数アカウントで書き込む場合にも効く（NATの利用者を考えて緩めにする）
+    """
+
+    scope = "write_ip"
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {"scope": self.scope, "ident": self.get_ident(request)}
+
+
+class WriteThrottle(BaseThrottle):
+    """
+    書き込みの制限をまとめてかける（どれかで断られたら、他の制限で数えた分も取り消す）
+    DRFは断られた後も残りの制限を数えるため、別々に並べると断られた書き込みで枠が減る
+    """
+
+    throttle_classes = [UserWriteThrottle, AnonWriteThrottle, IPWriteThrottle]
+
+    def allow_request(self, request, view):
+        throttles = [throttle_class() for throttle_class in self.throttle_classes]
+        self.waits = [
+            throttle.wait() for throttle in throttles if not throttle.allow_request(request, view)
+        ]
+        if not self.waits:
+            return True
+        for throttle in throttles:
+            throttle.rollback()
+        return False
+
+    def wait(self):
+        return max(self.waits, default=None)
+
+
+# いいね・コメント・返信に付ける
+WRITE_THROTTLE_CLASSES = [WriteThrottle]
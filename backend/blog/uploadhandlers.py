@@ -0,0 +1,109 @@
+# blog/uploadhandlers.py
+
+import io
+
+from django.conf import settings
+from django.core.files.uploadhandler import SkipFile, TemporaryFileUploadHandler
+from PIL import Image
+
+from . import metrics
+from .images import HEIF_BRANDS
+
+# 検査対象のフィールド名（BlogPost.image）
+IMAGE_FIELDS = {"image"}
+# ヘッダー解析のために保持する最大バイト数（EXIFやICCプロファイルが大きいJPEG向け）
+HEADER_LIMIT = 256 * 1024
+# Pillowで寸法を読むフォーマット（HEIFはヘッダーだけでは開けないので種類のみ判定）
+PILLOW_FORMATS = ["JPEG", "PNG", "GIF", "WEBP"]
+
+
+def sniff_image_type(header):
+    """先頭バイトから画像の種類を判定（不明ならNone）"""
+    if header.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    if header[4:8] == b"ftyp" and header[8:12] in HEIF_BRANDS:
+        return "heif"
+    return None
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """
+    画像アップロード用のハンドラー
+    最初のチャンクで形式と寸法を検査し、不正なファイルはその時点で破棄する
+    それ以外は一時ファイルへ書き出し、メモリに全体を保持しない
+    エラーはrequest.upload_errorsに記録し、シリアライザーで返す
+    """
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.header = b""
+        self.received = 0
+        self.checked = field_name not in IMAGE_FIELDS
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.field_name in IMAGE_FIELDS:
+            self.received += len(raw_data)
+            if self.received > settings.IMAGE_UPLOAD_MAX_SIZE:
+                max_mb = settings.IMAGE_UPLOAD_MAX_SIZE // (1024 * 1024)
+                self.reject(f"画像サイズは{max_mb}MB以下にしてください。")
+        if not self.checked:
+            self.header += raw_data[: HEADER_LIMIT - len(self.header)]
+            with metrics.IMAGE_PROCESSING.time(operation="upload_inspect"):
+                self.inspect()
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if not self.checked:
+            # ヘッダー上限に届かない小さなファイルで、画像として読めなかった
+            self.file.close()
+            self.record_error("画像ファイルを読み込めません。")
+            return None
+        return super().file_complete(file_size)
+
+    def inspect(self):
+        """ヘッダーを検査し、判定できたらchecked=Trueにする"""
+        image_type = sniff_image_type(self.header)
+        if image_type is None:
+            if len(self.header) >= 16:
+                self.reject("対応していない画像形式です。")
+            return
+        if image_type == "heif":
+            # 寸法はPillowでの変換時に検査される
+            self.checked = True
+            return
+
+        max_dimension = settings.IMAGE_UPLOAD_MAX_DIMENSION
+        dimension_error = f"画像の縦横は{max_dimension}px以下にしてください。"
+        try:
+            with Image.open(io.BytesIO(self.header), formats=PILLOW_FORMATS) as img:
+                width, height = img.size
+        except Image.DecompressionBombError:
+            # 画素数がPillowの上限を超える（OSErrorではないので別に捕まえる）
+            self.reject(dimension_error)
+        except (OSError, SyntaxError, ValueError, EOFError):
+            if len(self.header) >= HEADER_LIMIT:
+                self.reject("画像ファイルを読み込めません。")
+            return
+
+        if width > max_dimension or height > max_dimension:
+            self.reject(dimension_error)
+        self.checked = True
+        self.header = b""
+
+    def record_error(self, message):
+        if not hasattr(self.request, "upload_errors"):
+            self.request.upload_errors = {}
+        self.request.upload_errors[self.field_name] = message
+
+    def reject(self, message):
+        """エラーを記録して一時ファイルを削除し、このファイルの残りを読み捨てる"""
+        self.record_error(message)
+        # 一時ファイルは閉じると削除される
+        self.file.close()
+        raise SkipFile(message)
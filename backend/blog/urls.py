@@ -17,6 +17,7 @@ urlpatterns = [
     path('auth/login/', views.login_view, name='login'),
     path('auth/logout/', views.logout_view, name='logout'),
     path('auth/user/', views.current_user_view, name='current_user'),
+    path('feed/', views.FeedView.as_view(), name='feed'),
     # コメント関連のURL
     path(
         'posts/<int:post_id>/comments/',
@@ -33,6 +34,11 @@ urlpatterns = [
         views.comment_count,
         name='comment-count'
     ),
+    path(
+        'posts/<int:post_id>/events/',
+        views.post_events,
+        name='post-events'
+    ),
     path(
         'comments/<int:comment_id>/reply/',
         views.create_reply,
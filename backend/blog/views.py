@@ -1,17 +1,30 @@
 # blog/views.py
 
 from rest_framework import viewsets, status, filters, generics, permissions
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import (
+    action,
+    api_view,
+    permission_classes,
+    throttle_classes,
+)
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.pagination import CursorPagination
+from rest_framework.settings import api_settings
 from rest_framework.permissions import (
     IsAuthenticatedOrReadOnly,
     IsAuthenticated,
     AllowAny,
 )
+from django.conf import settings
 from django.shortcuts import get_object_or_404
+from django.http import Http404, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.db.models import Count, Q
 from django.contrib.auth import authenticate, login, logout
+from .auth import SignedTokenAuthentication, issue_token, revoke_token
 from .models import BlogPost, Tag, Like, Comment
+from . import events
 from .serializers import (
     BlogPostListSerializer,
     BlogPostDetailSerializer,
@@ -22,11 +35,60 @@ from .serializers import (
     CommentSerializer,
     CommentCreateSerializer,
     CommentUpdateSerializer,
+    FeedPostSerializer,
+    COMPACT_SERIALIZERS,
+    Included,
+)
+from .projections import (
+    comment_list_data,
+    comment_list_values,
+    post_list_data,
+    post_list_values,
 )
+from .renderers import CompactContentNegotiation, CompactJSONRenderer
+from .signals import publish_replies_deleted
+from .tags import get_tag_catalog, get_tag_list
+from .throttling import WRITE_THROTTLE_CLASSES
 from PIL import Image
 import os
 
 
+class CompactFormatMixin:
+    """
+    compact形式（?format=compact）に対応するビュー
+    シリアライザーをcompact版に差し替え、著者・タグをself.includedに集める
+    """
+
+    # Acceptにformat=compactが付いたときだけ選ばれるよう先頭に置く
+    renderer_classes = [CompactJSONRenderer, *api_settings.DEFAULT_RENDERER_CLASSES]
+    content_negotiation_class = CompactContentNegotiation
+
+    def is_compact(self):
+        renderer = getattr(self.request, "accepted_renderer", None)
+        return isinstance(renderer, CompactJSONRenderer)
+
+    def use_projection(self):
+        """一覧をblog.projectionsで組み立てるか（compact形式はシリアライザーで作る）"""
+        return settings.FAST_LIST_RESPONSES and not self.is_compact()
+
+    def get_serializer(self, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        if self.is_compact():
+            serializer_class = COMPACT_SERIALIZERS.get(
+                serializer_class, serializer_class
+            )
+        kwargs.setdefault("context", self.get_serializer_context())
+        return serializer_class(*args, **kwargs)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.is_compact():
+            if not hasattr(self, "included"):
+                self.included = Included()
+            context["included"] = self.included
+        return context
+
+
 @api_view(["POST"])
 @permission_classes([AllowAny])
 def signup_view(request):
@@ -61,8 +123,15 @@ def login_view(request):
     user = authenticate(request, username=username, password=password)
     if user:
         login(request, user)
+        # Cookieを使わないクライアント向けのトークン（Authorization: Bearer）
+        token, expires_at = issue_token(user)
         return Response(
-            {"user": UserSerializer(user).data, "detail": "ログインに成功しました"}
+            {
+                "user": UserSerializer(user).data,
+                "detail": "ログインに成功しました",
+                "token": token,
+                "token_expires_at": expires_at,
+            }
         )
     else:
         return Response(
@@ -74,7 +143,9 @@ def login_view(request):
 @api_view(["POST"])
 @permission_classes([AllowAny])
 def logout_view(request):
-    """ログアウトAPI"""
+    """ログアウトAPI（トークンで認証していればそのトークンも失効させる）"""
+    if isinstance(request.successful_authenticator, SignedTokenAuthentication):
+        revoke_token(request.auth)
     logout(request)
     return Response({"detail": "ログアウトしました"})
 
@@ -95,9 +166,44 @@ class TagViewSet(viewsets.ModelViewSet):
     filter_backends = [filters.SearchFilter]
     search_fields = ["name"]
     pagination_class = None
+    query_budget = 3
+    # 補完で返す件数の上限
+    autocomplete_max_limit = 50
+
+    def list(self, request, *args, **kwargs):
+        """タグ一覧（キャッシュしたカタログから返し、ETagで未変更なら304）"""
+        catalog = get_tag_catalog()
+        search = request.query_params.get("search", "")
+        if search:
+            return Response(catalog.search(search))
+
+        not_modified = get_conditional_response(request, etag=catalog.etag)
+        if not_modified is not None:
+            return not_modified
+        response = Response(catalog.tags)
+        response["ETag"] = catalog.etag
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    @action(detail=False, methods=["get"])
+    def autocomplete(self, request):
+        """
+        タグ名の前方一致補完（?q=プレフィックス&limit=件数）
+        記事数の多い順に返す。DBは参照せず、プロセス内のインデックスを使う
+        """
+        try:
+            limit = int(request.query_params.get("limit", 10))
+        except ValueError:
+            return Response(
+                {"detail": "limitは数値で指定してください"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        limit = max(1, min(limit, self.autocomplete_max_limit))
+        prefix = request.query_params.get("q", "").strip()
+        return Response(get_tag_catalog().complete(prefix, limit))
 
 
-class BlogPostViewSet(viewsets.ModelViewSet):
+class BlogPostViewSet(CompactFormatMixin, viewsets.ModelViewSet):
     """ブログ記事のCRUD操作といいね機能を提供するビューセット"""
 
     queryset = BlogPost.objects.all()
@@ -106,6 +212,18 @@ class BlogPostViewSet(viewsets.ModelViewSet):
     search_fields = ["title", "description", "author__username"]
     ordering_fields = ["created_at", "updated_at"]
     ordering = ["-created_at"]
+    # QueryInspectionMiddlewareで検査するアクションごとのクエリ数の上限
+    query_budgets = {
+        "list": 8,
+        "retrieve": 8,
+        "my_posts": 8,
+        "liked_posts": 8,
+        "like": 8,
+        "bulk": 6,
+        "sold_out": 4,
+    }
+    # bulkで一度に取得できる記事数の上限
+    bulk_max_ids = 200
 
     def get_queryset(self):
         """クエリセットを取得（フィルタリング機能付き）"""
@@ -121,18 +239,19 @@ class BlogPostViewSet(viewsets.ModelViewSet):
         if author:
             queryset = queryset.filter(author__username=author)
 
-        # 公開状態でフィルタリング
-        if not self.request.user.is_authenticated:
-            # 未認証ユーザーは公開記事のみ
-            queryset = queryset.filter(is_published=True)
-        else:
-            # 認証済みユーザーは、公開記事と自分の下書きのみ
-            from django.db.models import Q
+        # 販売状況でフィルタリング（trueなら部分インデックスで購入できる記事のみ）
+        available = self.request.query_params.get("available", "").lower()
+        if available == "true":
+            queryset = queryset.available()
+        elif available == "false":
+            queryset = queryset.filter(is_sold_out=True)
+        elif available:
+            raise ValidationError({"available": "trueかfalseで指定してください"})
 
-            queryset = queryset.filter(
-                Q(is_published=True) | Q(author=self.request.user, is_published=False)
-            )
+        # 公開状態でフィルタリング（公開記事と自分の下書きのみ）
+        queryset = queryset.visible_to(self.request.user)
 
+        if self.request.user.is_authenticated:
             # is_publishedパラメータが指定されている場合の追加フィルタ
             is_published = self.request.query_params.get("is_published", None)
             if is_published is not None:
@@ -144,21 +263,33 @@ class BlogPostViewSet(viewsets.ModelViewSet):
                         author=self.request.user, is_published=False
                     )
 
-        print(f"User: {self.request.user}, Final queryset count: {queryset.count()}")
         return queryset.distinct()
 
     def get_serializer_class(self):
         """アクションに応じて適切なシリアライザーを選択"""
-        if self.action == "list":
+        if self.action in ("list", "bulk", "my_posts", "liked_posts"):
             return BlogPostListSerializer
         return BlogPostDetailSerializer
 
+    def list(self, request, *args, **kwargs):
+        """記事一覧（著者・タグ・いいね数をまとめて取得）"""
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.use_projection():
+            page = self.paginate_queryset(post_list_values(queryset, request.user))
+            return self.get_paginated_response(post_list_data(page, request))
+        page = self.paginate_queryset(queryset.with_list_data(request.user))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     def perform_create(self, serializer):
         """記事作成時に著者を自動設定"""
         serializer.save(author=self.request.user)
 
     @action(
-        detail=True, methods=["post", "delete"], permission_classes=[IsAuthenticated]
+        detail=True,
+        methods=["post", "delete"],
+        permission_classes=[IsAuthenticated],
+        throttle_classes=WRITE_THROTTLE_CLASSES,
     )
     def like(self, request, pk=None):
         """いいね機能"""
@@ -192,13 +323,81 @@ class BlogPostViewSet(viewsets.ModelViewSet):
                         "detail": "いいねを解除しました",
                         "likes_count": blog_post.get_likes_count(),
                     },
-                    status=status.HTTP_204_NO_CONTENT,
+                    status=status.HTTP_200_OK,
                 )
             except Like.DoesNotExist:
                 return Response(
                     {"detail": "いいねしていません"}, status=status.HTTP_400_BAD_REQUEST
                 )
 
+    @action(detail=False, methods=["get"])
+    def bulk(self, request):
+        """
+        複数の記事をIDでまとめて取得（?ids=1,2,3）
+        get_queryset()と同じ公開範囲で、指定した順に返す（見つからないIDは省く）
+        """
+        try:
+            ids = [
+                int(value)
+                for value in request.query_params.get("ids", "").split(",")
+                if value.strip()
+            ]
+        except ValueError:
+            return Response(
+                {"detail": "idsは数値をカンマ区切りで指定してください"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        ids = list(dict.fromkeys(ids))  # 重複を除く（順序は維持）
+        if not ids:
+            return Response(
+                {"detail": "idsを指定してください"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(ids) > self.bulk_max_ids:
+            return Response(
+                {"detail": f"idsは{self.bulk_max_ids}件以下にしてください"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        queryset = self.get_queryset().filter(id__in=ids).with_list_data(request.user)
+        posts = {post.id: post for post in queryset}
+        serializer = self.get_serializer(
+            [posts[post_id] for post_id in ids if post_id in posts], many=True
+        )
+        return Response(serializer.data)
+
+    @action(detail=False, methods=["post"], permission_classes=[IsAuthenticated])
+    def sold_out(self, request):
+        """
+        自分の記事の販売状況をまとめて変更
+        {"ids": [1, 2, 3], "is_sold_out": true} を受け取り、変更した記事のIDを返す
+        他人の記事や、すでに同じ状態の記事は変更されない
+        """
+        ids = request.data.get("ids")
+        is_sold_out = request.data.get("is_sold_out")
+        if (
+            not isinstance(ids, list)
+            or not ids
+            or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids)
+        ):
+            return Response(
+                {"detail": "idsは数値の配列で指定してください"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not isinstance(is_sold_out, bool):
+            return Response(
+                {"detail": "is_sold_outはtrueかfalseで指定してください"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > self.bulk_max_ids:
+            return Response(
+                {"detail": f"idsは{self.bulk_max_ids}件以下にしてください"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        updated = BlogPost.objects.set_sold_out(request.user, ids, is_sold_out)
+        return Response({"updated": updated, "is_sold_out": is_sold_out})
+
     @action(detail=False, methods=["get"])
     def my_posts(self, request):
         """自分の投稿した記事一覧を取得"""
@@ -207,9 +406,15 @@ class BlogPostViewSet(viewsets.ModelViewSet):
                 {"detail": "ログインが必要です"}, status=status.HTTP_401_UNAUTHORIZED
             )
 
-        queryset = self.get_queryset().filter(author=request.user)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        # 自分の記事は下書きも含めて(author, -created_at)のインデックスで取得
+        queryset = BlogPost.objects.filter(author=request.user).order_by("-created_at")
+        is_published = request.query_params.get("is_published", None)
+        if is_published is not None:
+            queryset = queryset.filter(is_published=is_published.lower() == "true")
+
+        page = self.paginate_queryset(queryset.with_list_data(request.user))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     @action(detail=False, methods=["get"])
     def liked_posts(self, request):
@@ -219,12 +424,27 @@ class BlogPostViewSet(viewsets.ModelViewSet):
                 {"detail": "ログインが必要です"}, status=status.HTTP_401_UNAUTHORIZED
             )
 
-        queryset = self.get_queryset().filter(likes__user=request.user)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        # いいねした順に記事IDを取得し、そのページの記事だけをまとめて読み込む
+        # 非公開になった他人の記事はIDの段階で除く（countとページの件数を一致させる）
+        post_ids = (
+            Like.objects.filter(user=request.user)
+            .filter(Q(blog_post__is_published=True) | Q(blog_post__author=request.user))
+            .order_by("-created_at")
+            .values_list("blog_post_id", flat=True)
+        )
+        page = self.paginate_queryset(post_ids)
+        posts = BlogPost.objects.filter(id__in=page).with_list_data(request.user)
+        posts = {post.id: post for post in posts}
+        serializer = self.get_serializer(
+            [posts[post_id] for post_id in page if post_id in posts], many=True
+        )
+        return self.get_paginated_response(serializer.data)
 
     @action(
-        detail=True, methods=["post", "delete"], permission_classes=[IsAuthenticated]
+        detail=True,
+        methods=["post", "delete"],
+        permission_classes=[IsAuthenticated],
+        throttle_classes=WRITE_THROTTLE_CLASSES,
     )
     def like(self, request, pk=None):
         """
@@ -262,7 +482,7 @@ class BlogPostViewSet(viewsets.ModelViewSet):
                         "detail": "いいねを解除しました",
                         "likes_count": blog_post.get_likes_count(),
                     },
-                    status=status.HTTP_204_NO_CONTENT,
+                    status=status.HTTP_200_OK,
                 )
             except Like.DoesNotExist:
                 return Response(
@@ -270,11 +490,60 @@ class BlogPostViewSet(viewsets.ModelViewSet):
                 )
 
 
-class CommentListCreateView(generics.ListCreateAPIView):
+class FeedPagination(CursorPagination):
+    """ホームフィード用のカーソルページネーション（件数のCOUNTクエリが不要）"""
+
+    page_size = 9
+    ordering = "-created_at"
+
+
+class FeedView(CompactFormatMixin, generics.GenericAPIView):
+    """
+    ホーム画面用のフィード
+    ユーザー情報・タグ一覧・記事（いいね数・いいね済み・コメント数付き）を1リクエストで返す
+    """
+
+    serializer_class = FeedPostSerializer
+    pagination_class = FeedPagination
+    permission_classes = [AllowAny]
+    query_budget = 6
+
+    def get_queryset(self):
+        user = self.request.user
+        return (
+            BlogPost.objects.visible_to(user).with_list_data(user).with_comments_count()
+        )
+
+    def get(self, request):
+        user = request.user
+        if self.use_projection():
+            queryset = post_list_values(
+                BlogPost.objects.visible_to(user), user, comments_count=True
+            )
+            posts = post_list_data(
+                self.paginate_queryset(queryset), request, comments_count=True
+            )
+        else:
+            page = self.paginate_queryset(self.get_queryset())
+            posts = self.get_serializer(page, many=True).data
+        return Response(
+            {
+                "user": UserSerializer(user).data if user.is_authenticated else None,
+                "tags": get_tag_list(),
+                "posts": posts,
+                "next": self.paginator.get_next_link(),
+                "previous": self.paginator.get_previous_link(),
+            }
+        )
+
+
+class CommentListCreateView(CompactFormatMixin, generics.ListCreateAPIView):
     """投稿に対するコメント一覧取得・作成"""
 
     serializer_class = CommentSerializer
     permission_classes = [permissions.AllowAny]  # 一時的に認証なしに変更
+    throttle_classes = WRITE_THROTTLE_CLASSES  # 作成（POST）だけを数える
+    query_budget = 6
 
     def get_queryset(self):
         post_id = self.kwargs.get("post_id")
@@ -297,6 +566,13 @@ class CommentListCreateView(generics.ListCreateAPIView):
             return CommentCreateSerializer
         return CommentSerializer
 
+    def list(self, request, *args, **kwargs):
+        if not self.use_projection():
+            return super().list(request, *args, **kwargs)
+        queryset = comment_list_values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(comment_list_data(page))
+
     def create(self, request, *args, **kwargs):
         post_id = self.kwargs.get("post_id")
         blog_post = get_object_or_404(BlogPost, id=post_id)
@@ -350,8 +626,12 @@ class CommentDetailView(generics.RetrieveUpdateDestroyAPIView):
         instance.is_active = False
         instance.save()
 
-        # 返信も非アクティブにする
-        instance.replies.update(is_active=False)
+        # 返信も非アクティブにする（update()ではシグナルが送られないので、通知もここで行う）
+        reply_ids = list(
+            instance.replies.filter(is_active=True).values_list("id", flat=True)
+        )
+        Comment.objects.filter(id__in=reply_ids).update(is_active=False)
+        publish_replies_deleted(instance.blog_post_id, instance.id, reply_ids)
 
 
 class IsCommentAuthor(permissions.BasePermission):
@@ -370,8 +650,26 @@ def comment_count(request, post_id):
     return Response({"count": count})
 
 
+async def post_events(request, post_id):
+    """
+    投稿のコメント・いいねの更新をServer-Sent Eventsで配信
+    ASGIで動かすこと（WSGIでは接続ごとにワーカーを占有する）
+    """
+    if not await BlogPost.objects.filter(id=post_id, is_published=True).aexists():
+        raise Http404
+
+    response = StreamingHttpResponse(
+        events.stream(post_id), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    # nginxなどのプロキシでバッファリングさせない
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 @api_view(["POST"])
 @permission_classes([permissions.AllowAny])  # 一時的に認証なしに変更
+@throttle_classes(WRITE_THROTTLE_CLASSES)
 def create_reply(request, comment_id):
     """特定のコメントに返信を作成"""
     parent_comment = get_object_or_404(Comment, id=comment_id, is_active=True)
@@ -3,6 +3,10 @@ ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Server-Sent Events (``/api/posts/<id>/events/``) are async streaming
+responses and should be served through this entry point (e.g. uvicorn or
+daphne) so that idle subscribers don't each hold a worker thread.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -3,7 +3,6 @@
 import os
 from pathlib import Path
 from decouple import config
-import pillow_heif
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -31,16 +30,47 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "blog.middleware.MetricsMiddleware",  # Prometheus用のメトリクス記録
+    "blog.middleware.LoadSheddingMiddleware",  # 過負荷時に503を返す
+    "blog.middleware.CompressionMiddleware",  # zstd・br・gzipでのレスポンス圧縮
     "django.middleware.security.SecurityMiddleware",
+    "blog.middleware.QueryInspectionMiddleware",  # N+1検出（開発・CI用）
     "django.contrib.sessions.middleware.SessionMiddleware",  # セッションミドルウェア
     "corsheaders.middleware.CorsMiddleware",  # CORS設定（CommonMiddlewareの前）
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
+    "blog.auth.LegacySessionBackendMiddleware",  # 導入前のセッションのバックエンドを付け替え
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "blog.middleware.ProfilingMiddleware",  # オンデマンド・サンプリングでのプロファイル
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# 過負荷時の503（blog.middleware.LoadSheddingMiddleware）
+# 処理中のリクエスト数はプロセスごとに数える（gunicornならgthreadなどスレッドで並行に処理する場合に効く）
+# 書き込み（POSTなど）は処理中の書き込み数か、最近のクエリ1件あたりの平均時間（秒）が
+# しきい値を超えたら断る。読み取りは全体の上限だけで断る
+LOAD_SHED_ENABLED = config("LOAD_SHED_ENABLED", default=True, cast=bool)
+LOAD_SHED_MAX_IN_FLIGHT = config("LOAD_SHED_MAX_IN_FLIGHT", default=64, cast=int)
+LOAD_SHED_MAX_IN_FLIGHT_WRITES = config("LOAD_SHED_MAX_IN_FLIGHT_WRITES", default=16, cast=int)
+LOAD_SHED_DB_LATENCY = config("LOAD_SHED_DB_LATENCY", default=0.1, cast=float)
+LOAD_SHED_RETRY_AFTER = 5  # 秒
+LOAD_SHED_EXEMPT_PATHS = ["/metrics"]
+
+# クエリ検査（blog.middleware.QueryInspectionMiddleware）
+# 同じ形のクエリがREPEAT_THRESHOLD回を超えるか、ビューの予算を超えたら警告する
+# テストではQUERY_INSPECTOR_RAISE=Trueにして例外にする
+QUERY_INSPECTOR_ENABLED = config("QUERY_INSPECTOR_ENABLED", default=DEBUG, cast=bool)
+QUERY_INSPECTOR_REPEAT_THRESHOLD = 5
+QUERY_INSPECTOR_RAISE = config("QUERY_INSPECTOR_RAISE", default=False, cast=bool)
+
+# リクエストのプロファイル（blog.middleware.ProfilingMiddleware）
+# 既定は無効（空）。保存先を指定すると有効になり、結果はmanage.py profile_reportで集計する
+PROFILE_DIR = config("PROFILE_DIR", default="")
+PROFILE_SAMPLE_RATE = config("PROFILE_SAMPLE_RATE", default=0.001, cast=float)
+PROFILE_MAX_FILES = 200  # ビューごとに残すファイル数（古いものから削除）
+PROFILE_TOKEN_MAX_AGE = 60 * 60  # X-Profileトークンの有効期限（秒）
+
 ROOT_URLCONF = "config.urls"
 
 TEMPLATES = [
@@ -80,6 +110,50 @@ DATABASES = {
     }
 }
 
+# キャッシュ（ヒット率をメトリクスに記録する）
+# REDIS_URLを設定すると全ワーカーで共有するRedisを使う（redisパッケージが必要）
+# 未設定ならプロセスごとのLocMemCache
+REDIS_URL = config("REDIS_URL", default="")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "blog.cache.InstrumentedRedisCache",
+            "LOCATION": REDIS_URL,
+            "METRICS_NAME": "default",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "blog.cache.InstrumentedLocMemCache",
+            "METRICS_NAME": "default",
+        }
+    }
+
+# セッションはキャッシュが共有のときだけキャッシュから読む（書き込みはDBにも行う）
+# プロセスごとのキャッシュでは、あるワーカーでログアウト（flush）しても
+# 他のワーカーにキャッシュされたセッションが有効なまま残るので、DBだけを使う
+if REDIS_URL:
+    SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+else:
+    SESSION_ENGINE = "django.contrib.sessions.backends.db"
+
+# セッションのユーザーを短時間キャッシュする（blog.auth.CachedModelBackend）
+# 導入前にModelBackendでログインしたセッションはLegacySessionBackendMiddlewareで付け替える
+AUTHENTICATION_BACKENDS = ["blog.auth.CachedModelBackend"]
+# ユーザーの保存時に破棄するが、キャッシュがプロセスごと（LocMemCache）の場合は
+# 他のワーカーへの反映（無効化・パスワード変更など）はこの秒数まで遅れる（REDIS_URLで共有する）
+USER_CACHE_TIMEOUT = 30
+
+# タグ一覧のバージョン（blog.tags）の有効期限（秒）
+# 複数ワーカーでタグの追加などを即時に反映するにはCACHESを共有のキャッシュにする
+# （プロセスごとのLocMemCacheでは、他のワーカーへの反映はこの秒数まで遅れる）
+TAG_VERSION_CACHE_TIMEOUT = config("TAG_VERSION_CACHE_TIMEOUT", default=30, cast=int)
+
+# /metrics（Prometheus）の認証トークン（Authorization: Bearer）。空なら/metricsは403を返す
+# gunicornの複数ワーカーで集計する場合は環境変数PROMETHEUS_MULTIPROC_DIRを設定する
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -110,6 +184,12 @@ STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# 本番でのメディア配信方法（blog.media.serve_media）
+# "x-accel": nginxのX-Accel-Redirect / "x-sendfile": X-Sendfile / "sendfile": Django内で配信
+MEDIA_SERVE_MODE = config("MEDIA_SERVE_MODE", default="sendfile")
+# nginxでinternal指定したlocationのプレフィックス（x-accel用）
+MEDIA_ACCEL_PREFIX = config("MEDIA_ACCEL_PREFIX", default="/protected-media/")
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -162,10 +242,50 @@ REST_FRAMEWORK = {
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework.authentication.SessionAuthentication",
+        # Authorization: Bearer（login_viewで発行する署名付きトークン）
+        "blog.auth.SignedTokenAuthentication",
         "rest_framework.authentication.BasicAuthentication",
     ],
+    # いいね・コメント・返信の書き込み（blog.throttling、スライディングウィンドウ）
+    # 回数はキャッシュ（CACHESのdefault）に置くので、複数ワーカーで合算するには共有のキャッシュにする
+    "DEFAULT_THROTTLE_RATES": {
+        "write_user": "30/min",
+        "write_anon": "10/min",
+        "write_ip": "120/min",
+    },
+    # 前段のプロキシの数。IPごとの制限はX-Forwarded-Forの右からこの数番目のアドレスで数える
+    # 0ならREMOTE_ADDR（X-Forwarded-Forはクライアントが自由に付けられるので見ない）
+    # nginxなど1段のプロキシの後ろで動かすなら1にする
+    "NUM_PROXIES": config("NUM_PROXIES", default=0, cast=int),
 }
 
-pillow_heif.register_heif_opener()
+# 署名付きトークンの有効期限（秒）。失効リストはキャッシュに置くので、
+# 複数ワーカーでログアウトを即時に反映するにはCACHESを共有のキャッシュにする
+AUTH_TOKEN_MAX_AGE = config("AUTH_TOKEN_MAX_AGE", default=60 * 60 * 12, cast=int)
+
+# 読み取り専用の一覧APIをシリアライザーを通さずに組み立てる（blog.projections）
+# 出力は同じ（list_benchmarkコマンドで一致とCPU時間を確認してから有効にする）
+FAST_LIST_RESPONSES = config("FAST_LIST_RESPONSES", default=False, cast=bool)
+
+# レスポンス圧縮（blog.middleware.CompressionMiddleware）
+# zstdはzstandard、brはbrotliパッケージがあれば使う（なければgzipのみ）
+COMPRESSION_ENCODINGS = ["zstd", "br", "gzip"]
+COMPRESSION_MIN_SIZE = 1024  # bytes
+COMPRESSION_LEVELS = {"gzip": 6, "br": 5, "zstd": 3}
+
+# リアルタイム配信（SSE）のバックエンド
+# "local": プロセス内のみ / "postgres": LISTEN/NOTIFYで複数ワーカー間に中継
+BLOG_EVENTS_BACKEND = config("BLOG_EVENTS_BACKEND", default="local")
 
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
+
+# アップロードは先頭チャンクで画像を検査し、常に一時ファイルへ書き出す
+# （メモリ上に保持しないのでFILE_UPLOAD_MAX_MEMORY_SIZEはファイルには適用されない）
+FILE_UPLOAD_HANDLERS = ["blog.uploadhandlers.ImageUploadHandler"]
+IMAGE_UPLOAD_MAX_SIZE = 20 * 1024 * 1024  # 20MB
+IMAGE_UPLOAD_MAX_DIMENSION = 10000  # px
+
+# サムネイル設定（変更したらreprocess_imagesで再生成する）
+BLOG_THUMBNAIL_SIZES = [(400, 400), (800, 800)]
+BLOG_THUMBNAIL_FORMAT = "WEBP"
+BLOG_THUMBNAIL_QUALITY = 80
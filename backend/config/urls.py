@@ -1,16 +1,24 @@
 # config/urls.py
 
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from blog.media import serve_media
+from blog.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('blog.urls')),
     path('api-auth/', include('rest_framework.urls')),  # DRFの認証ビュー
+    path('metrics', metrics_view, name='metrics'),  # Prometheus
 ]
 
 # 開発環境でメディアファイルを配信
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+else:
+    # 本番ではプロキシへの委譲（X-Accel-Redirect/X-Sendfile）またはsendfileで配信
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % settings.MEDIA_URL.lstrip('/'), serve_media),
+    ]
@@ -26,7 +26,7 @@ import { useAuth } from "@/contexts/AuthContext";
 import { Loading } from "@/components/ui/Loading";
 import { Button } from "@/components/ui/Button";
 import { Header } from "@/components/layout/Header";
-import { Markdown } from "@/components/ui/Markdown";
+import { Markdown, MarkdownHtml } from "@/components/ui/Markdown";
 import toast from "react-hot-toast";
 import { useState } from "react";
 import { ImageModal } from "@/components/ui/ImageModal";
@@ -210,7 +210,11 @@ export default function BlogPostDetailPage() {
 
             {/* 本文 */}
             <div className="mb-8">
-              <Markdown content={post.description} />
+              {post.description_html !== undefined ? (
+                <MarkdownHtml html={post.description_html} />
+              ) : (
+                <Markdown content={post.description ?? ""} />
+              )}
             </div>
 
             {/* アクションボタン */}
@@ -9,6 +9,8 @@ import { useMyPosts, useLikedPosts } from "@/hooks/useBlogPosts";
 import { BlogPostCard } from "@/components/blog/BlogPostCard";
 import { Header } from "@/components/layout/Header";
 import { Loading } from "@/components/ui/Loading";
+import { Button } from "@/components/ui/Button";
+import { PaginatedResponse, BlogPost } from "@/types";
 import {
   UserCircleIcon,
   DocumentTextIcon,
@@ -16,6 +18,42 @@ import {
   DocumentDuplicateIcon,
 } from "@heroicons/react/24/outline";
 
+// タブごとのページ送り
+function Pagination({
+  data,
+  page,
+  onChange,
+}: {
+  data?: PaginatedResponse<BlogPost>;
+  page: number;
+  onChange: (page: number) => void;
+}) {
+  if (!data || (!data.next && !data.previous)) {
+    return null;
+  }
+  return (
+    <div className="flex justify-center gap-4 mt-8">
+      <Button
+        variant="secondary"
+        disabled={!data.previous}
+        onClick={() => onChange(page - 1)}
+      >
+        前のページ
+      </Button>
+      <span className="flex items-center px-4 py-2 text-gray-700">
+        ページ {page}
+      </span>
+      <Button
+        variant="secondary"
+        disabled={!data.next}
+        onClick={() => onChange(page + 1)}
+      >
+        次のページ
+      </Button>
+    </div>
+  );
+}
+
 export default function ProfilePage() {
   const router = useRouter();
   const { user, isLoading: isAuthLoading } = useAuth();
@@ -23,8 +61,20 @@ export default function ProfilePage() {
     "my-posts" | "liked-posts" | "drafts"
   >("my-posts");
 
-  const { data: myPosts, isLoading: isLoadingMyPosts } = useMyPosts();
-  const { data: likedPosts, isLoading: isLoadingLikedPosts } = useLikedPosts();
+  const [publishedPage, setPublishedPage] = useState(1);
+  const [draftsPage, setDraftsPage] = useState(1);
+  const [likedPage, setLikedPage] = useState(1);
+
+  // 一覧はサーバー側でページ分割されるので、公開・下書きも別々に取得する
+  const { data: publishedPosts, isLoading: isLoadingPublishedPosts } =
+    useMyPosts({ page: publishedPage, is_published: true });
+  const { data: draftPosts, isLoading: isLoadingDraftPosts } = useMyPosts({
+    page: draftsPage,
+    is_published: false,
+  });
+  const { data: likedPosts, isLoading: isLoadingLikedPosts } = useLikedPosts({
+    page: likedPage,
+  });
 
   // 認証チェック
   if (isAuthLoading) {
@@ -47,21 +97,21 @@ export default function ProfilePage() {
       label: "自分の投稿",
       shortLabel: "投稿", // 短縮版追加
       icon: DocumentTextIcon,
-      count: myPosts?.filter((post) => post.is_published).length || 0,
+      count: publishedPosts?.count || 0,
     },
     {
       id: "drafts" as const,
       label: "下書き",
       shortLabel: "下書",
       icon: DocumentDuplicateIcon,
-      count: myPosts?.filter((post) => !post.is_published).length || 0,
+      count: draftPosts?.count || 0,
     },
     {
       id: "liked-posts" as const,
       label: "いいねした記事",
       shortLabel: "いいね",
       icon: HeartIcon,
-      count: likedPosts?.length || 0,
+      count: likedPosts?.count || 0,
     },
   ];
 
@@ -115,9 +165,9 @@ export default function ProfilePage() {
         {/* コンテンツ */}
         {activeTab === "my-posts" && (
           <div>
-            {isLoadingMyPosts ? (
+            {isLoadingPublishedPosts ? (
               <Loading />
-            ) : myPosts?.filter((post) => post.is_published).length === 0 ? (
+            ) : publishedPosts?.results.length === 0 ? (
               <div className="text-center py-12">
                 <DocumentTextIcon className="mx-auto h-12 w-12 text-gray-400" />
                 <p className="mt-2 text-gray-500">
@@ -125,34 +175,44 @@ export default function ProfilePage() {
                 </p>
               </div>
             ) : (
-              <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
-                {myPosts
-                  ?.filter((post) => post.is_published)
-                  .map((post) => (
+              <>
+                <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
+                  {publishedPosts?.results.map((post) => (
                     <BlogPostCard key={post.id} post={post} />
                   ))}
-              </div>
+                </div>
+                <Pagination
+                  data={publishedPosts}
+                  page={publishedPage}
+                  onChange={setPublishedPage}
+                />
+              </>
             )}
           </div>
         )}
 
         {activeTab === "drafts" && (
           <div>
-            {isLoadingMyPosts ? (
+            {isLoadingDraftPosts ? (
               <Loading />
-            ) : myPosts?.filter((post) => !post.is_published).length === 0 ? (
+            ) : draftPosts?.results.length === 0 ? (
               <div className="text-center py-12">
                 <DocumentDuplicateIcon className="mx-auto h-12 w-12 text-gray-400" />
                 <p className="mt-2 text-gray-500">下書きはありません</p>
               </div>
             ) : (
-              <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
-                {myPosts
-                  ?.filter((post) => !post.is_published)
-                  .map((post) => (
+              <>
+                <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
+                  {draftPosts?.results.map((post) => (
                     <BlogPostCard key={post.id} post={post} />
                   ))}
-              </div>
+                </div>
+                <Pagination
+                  data={draftPosts}
+                  page={draftsPage}
+                  onChange={setDraftsPage}
+                />
+              </>
             )}
           </div>
         )}
@@ -161,7 +221,7 @@ export default function ProfilePage() {
           <div>
             {isLoadingLikedPosts ? (
               <Loading />
-            ) : likedPosts?.length === 0 ? (
+            ) : likedPosts?.results.length === 0 ? (
               <div className="text-center py-12">
                 <HeartIcon className="mx-auto h-12 w-12 text-gray-400" />
                 <p className="mt-2 text-gray-500">
@@ -169,11 +229,18 @@ export default function ProfilePage() {
                 </p>
               </div>
             ) : (
-              <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
-                {likedPosts?.map((post) => (
-                  <BlogPostCard key={post.id} post={post} />
-                ))}
-              </div>
+              <>
+                <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
+                  {likedPosts?.results.map((post) => (
+                    <BlogPostCard key={post.id} post={post} />
+                  ))}
+                </div>
+                <Pagination
+                  data={likedPosts}
+                  page={likedPage}
+                  onChange={setLikedPage}
+                />
+              </>
             )}
           </div>
         )}
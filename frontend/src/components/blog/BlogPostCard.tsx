@@ -53,7 +53,8 @@ export function BlogPostCard({ post }: BlogPostCardProps) {
         {post.image && (
           <div className="relative h-48 w-full">
             <Image
-              src={post.image}
+              // カードは縮小版で足りる（WebPのサムネイル。なければ元画像）
+              src={post.thumbnails?.["800x800"] ?? post.image}
               alt={post.title}
               fill
               className="object-cover"
@@ -106,10 +107,9 @@ export function BlogPostCard({ post }: BlogPostCardProps) {
             {post.title}
           </h2>
 
-          {/* 説明（Markdownをプレーンテキストに変換） */}
+          {/* 説明（サーバーで作ったプレーンテキストの抜粋） */}
           <p className="text-gray-600 mb-4 line-clamp-3 flex-grow">
-            {post.description.replace(/[#*`_~\[\]()]/g, "").substring(0, 150)}
-            ...
+            {post.description_excerpt}
           </p>
 
           {/* タグ */}
@@ -125,3 +125,18 @@ export function Markdown({ content, className = "" }: MarkdownProps) {
     </div>
   );
 }
+
+interface MarkdownHtmlProps {
+  html: string;
+  className?: string;
+}
+
+// サーバーで変換・サニタイズ済みのHTMLを表示（スタイルはglobals.cssの.markdown-body）
+export function MarkdownHtml({ html, className = "" }: MarkdownHtmlProps) {
+  return (
+    <div
+      className={`prose prose-lg max-w-none markdown-body ${className}`}
+      dangerouslySetInnerHTML={{ __html: html }}
+    />
+  );
+}
@@ -110,19 +110,22 @@ export const useLikeBlogPost = () => {
 };
 
 // 自分の投稿を取得するフック
-export const useMyPosts = () => {
+export const useMyPosts = (params?: {
+  page?: number;
+  is_published?: boolean;
+}) => {
   return useQuery({
-    queryKey: ["myPosts"],
-    queryFn: fetchMyPosts,
+    queryKey: ["myPosts", params],
+    queryFn: () => fetchMyPosts(params),
     retry: false, // 認証エラーの場合はリトライしない
   });
 };
 
 // いいねした投稿を取得するフック
-export const useLikedPosts = () => {
+export const useLikedPosts = (params?: { page?: number }) => {
   return useQuery({
-    queryKey: ["likedPosts"],
-    queryFn: fetchLikedPosts,
+    queryKey: ["likedPosts", params],
+    queryFn: () => fetchLikedPosts(params),
     retry: false, // 認証エラーの場合はリトライしない
   });
 };
@@ -132,14 +132,19 @@ export const unlikeBlogPost = async (id: number): Promise<any> => {
 };
 
 // 自分の投稿を取得
-export const fetchMyPosts = async (): Promise<BlogPost[]> => {
-  const response = await api.get("/posts/my_posts/");
+export const fetchMyPosts = async (params?: {
+  page?: number;
+  is_published?: boolean;
+}): Promise<PaginatedResponse<BlogPost>> => {
+  const response = await api.get("/posts/my_posts/", { params });
   return response.data;
 };
 
-// いいねした投稿を取得
-export const fetchLikedPosts = async (): Promise<BlogPost[]> => {
-  const response = await api.get("/posts/liked_posts/");
+// いいねした投稿を取得（いいねした順）
+export const fetchLikedPosts = async (params?: {
+  page?: number;
+}): Promise<PaginatedResponse<BlogPost>> => {
+  const response = await api.get("/posts/liked_posts/", { params });
   return response.data;
 };
 
@@ -18,8 +18,11 @@ export interface Tag {
 export interface BlogPost {
   id: number;
   title: string;
-  description: string;
+  description?: string; // 詳細のみ（編集用のMarkdown）
+  description_html?: string; // 詳細のみ（サーバーで変換・サニタイズ済み）
+  description_excerpt: string; // プレーンテキストの抜粋
   image: string | null;
+  thumbnails: Record<string, string>; // "幅x高さ" → URL（画像がなければ空）
   author: User;
   tags: Tag[];
   is_sold_out: boolean; // 追加